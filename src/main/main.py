@@ -7,9 +7,15 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QD
 from PyQt6.QtCore import Qt, QSize, QSettings
 from PyQt6.QtGui import QIcon, QFont, QColor, QTextOption, QShortcut, QKeySequence
 
-from widgets.ToolTabs import CodeEditor, FileManagerTab, TerminalTab, WebBrowserTab, GitWidget
+from widgets.ToolTabs import CodeEditor, MarkdownEditor, FileManagerTab, TerminalTab, WebBrowserTab, GitWidget
 from widgets.AIChat import  ChatAssistant
 from widgets.RyteCord import CollaborationWidget
+from widgets.SymbolIndex import ProjectSymbolIndex
+from widgets.ProjectSearch import ProjectSearchPanel
+from widgets.QuickOpen import ProjectFileList, QuickOpenPalette
+from widgets.SplitView import EditorSplitter, split_view, close_view, neighbour_view
+from widgets.TabRecords import EditorTabs
+from widgets.FileLoader import ASYNC_SIZE, NEWLINE_NAMES, read_text
 
 import platform
 import time
@@ -265,6 +271,34 @@ class SettingsDialog(QDialog):
         autosave_group.setLayout(autosave_layout)
         layout.addWidget(autosave_group)
         
+        # Project search settings
+        search_group = QGroupBox("Поиск по проекту")
+        search_layout = QFormLayout()
+        
+        self.search_index = QComboBox()
+        self.search_index.addItem("Автоматически", "auto")
+        self.search_index.addItem("Триграммный индекс", "index")
+        self.search_index.addItem("Только сканирование", "scan")
+        
+        search_layout.addRow("Индекс:", self.search_index)
+        
+        search_group.setLayout(search_layout)
+        layout.addWidget(search_group)
+
+        # Tab settings
+        tabs_group = QGroupBox("Вкладки")
+        tabs_layout = QFormLayout()
+
+        self.loaded_tabs = QSpinBox()
+        self.loaded_tabs.setRange(1, 500)
+        self.loaded_tabs.setToolTip("Сохранённые файлы сверх этого числа выгружаются "
+                                    "из памяти, начиная с давно открытых")
+
+        tabs_layout.addRow("Загруженных редакторов:", self.loaded_tabs)
+
+        tabs_group.setLayout(tabs_layout)
+        layout.addWidget(tabs_group)
+        
         layout.addStretch()
         self.settings_stack.addWidget(page)
 
@@ -287,6 +321,9 @@ class SettingsDialog(QDialog):
         # Load file settings
         self.autosave_enabled.setChecked(self.settings.value("files/autosave_enabled", False, type=bool))
         self.autosave_interval.setValue(int(self.settings.value("files/autosave_interval", 5)))
+        self.search_index.setCurrentIndex(
+            max(0, self.search_index.findData(self.settings.value("files/search_index", "auto"))))
+        self.loaded_tabs.setValue(int(self.settings.value("files/loaded_tabs", EditorTabs.LOADED_TABS)))
 
     def apply_settings(self):
         # Save editor settings
@@ -307,6 +344,8 @@ class SettingsDialog(QDialog):
         # Save file settings
         self.settings.setValue("files/autosave_enabled", self.autosave_enabled.isChecked())
         self.settings.setValue("files/autosave_interval", self.autosave_interval.value())
+        self.settings.setValue("files/search_index", self.search_index.currentData())
+        self.settings.setValue("files/loaded_tabs", self.loaded_tabs.value())
         
         # Apply settings to editor
         self.apply_editor_settings()
@@ -314,6 +353,10 @@ class SettingsDialog(QDialog):
         self.apply_appearance_settings()
         
         self.settings.sync()
+        if hasattr(self.parent, 'search_view'):
+            self.parent.search_view.apply_index_mode()
+        if hasattr(self.parent, 'file_tabs'):
+            self.parent.file_tabs.apply_limit()
 
     def apply_editor_settings(self):
         if hasattr(self.parent, 'code_editor'):
@@ -506,6 +549,27 @@ class Editor(QMainWindow):
                     initialize_project_structure(self.current_project, dialog.project_group.checkedButton().layout().itemAt(1).layout().itemAt(0).widget().text())
 
         self.setup_ui()
+
+        # Индекс символов проекта для автодополнения; при повторном открытии
+        # переиндексируются только изменённые файлы
+        self.symbol_index = ProjectSymbolIndex.open(self.current_project)
+        self.symbol_index.listeners.append(self.show_index_progress)
+        self.symbol_index.refresh()
+
+        # Список файлов для быстрого открытия (Ctrl+P), обновляется наблюдателем
+        self.project_files = ProjectFileList(self.current_project)
+        self.project_files.start()
+        self.quick_open_palette = None
+
+        # Вид разделённой вкладки, где последним был фокус
+        self.last_view = None
+        QApplication.instance().focusChanged.connect(self.track_focus)
+
+    def show_index_progress(self, done, total):
+        if done < total:
+            self.status_bar.showMessage(f"Indexing symbols: {done}/{total}")
+        else:
+            self.status_bar.showMessage(f"Indexed {total} files", 3000)
         
     def setup_ui(self):
         self.setWindowTitle("RytonStudio IDE - " + os.path.basename(self.current_project))
@@ -540,7 +604,7 @@ class Editor(QMainWindow):
         self.file_manager = FileManagerTab(self.current_project)
         self.extensions_view = QWidget()
         self.debug_view = QWidget()
-        self.search_view = QWidget()
+        self.search_view = ProjectSearchPanel(self.current_project)
         self.git_view = GitWidget(self.current_project)
         self.test_view = QWidget()
         self.github_view = WebBrowserTab("https://github.com")
@@ -571,7 +635,7 @@ class Editor(QMainWindow):
             ("/usr/local/share/ryton-studio/icons/directory.svg", "Files", lambda: self.sidebar_stack.setCurrentWidget(self.file_manager)),
 #            ("icons/extensions.svg", "Extensions", lambda: self.sidebar_stack.setCurrentWidget(self.extensions_view)),
 #            ("icons/debug.svg", "Debug", lambda: self.sidebar_stack.setCurrentWidget(self.debug_view)),
-#            ("icons/search.svg", "Search", lambda: self.sidebar_stack.setCurrentWidget(self.search_view)),
+            ("/usr/local/share/ryton-studio/icons/search.svg", "Search", self.find_in_files),
             ("/usr/local/share/ryton-studio/icons/git.svg", "Git", lambda: self.sidebar_stack.setCurrentWidget(self.git_view)),
 #            ("icons/collab.svg", "AI Assistant", lambda: self.sidebar_stack.setCurrentWidget(self.chat_assistant)),
             ("/usr/local/share/ryton-studio/icons/chat.svg", "RyteCord Chat", lambda: self.sidebar_stack.setCurrentWidget(self.collab_widget))
@@ -614,6 +678,11 @@ class Editor(QMainWindow):
         # Add initial code editor tab
         self.code_editor = CodeEditor()
         self.editor_tabs.addTab(self.code_editor, "untitled")
+
+        # Вкладки файлов создают редактор при первом переключении
+        self.file_tabs = EditorTabs(self.editor_tabs, self.editor_page)
+        self.file_tabs.load_failed.connect(
+            lambda path, error: self.status_bar.showMessage(f"Error opening file: {error}"))
         
         right_container.addWidget(self.editor_tabs)
         
@@ -777,29 +846,97 @@ class Editor(QMainWindow):
         QShortcut(QKeySequence("Ctrl+N"), self, self.new_file)
         QShortcut(QKeySequence("Ctrl+O"), self, self.open_file)
 
+    def track_focus(self, old, new):
+        if isinstance(new, CodeEditor):
+            self.last_view = new
+
+    def current_editor(self):
+        """Редактор текущей вкладки; у разделённой - вид, где был фокус"""
+        widget = self.editor_tabs.currentWidget()
+        if widget is None or isinstance(widget, CodeEditor):
+            return widget
+        views = widget.findChildren(CodeEditor)
+        if self.last_view in views:
+            return self.last_view
+        return views[0] if views else None
+
+    def tab_editor(self, index):
+        """Основной редактор вкладки (у разделённой - не копия вида)"""
+        widget = self.editor_tabs.widget(index)
+        if widget is None or isinstance(widget, CodeEditor):
+            return widget
+        for editor in widget.findChildren(CodeEditor):
+            if editor.source is None:
+                return editor
+        return None
+
+    def split_editor(self, orientation):
+        """Делит вкладку: рядом с текущим видом - ещё один вид того же документа"""
+        editor = self.current_editor()
+        if editor is None:
+            return
+        index = self.editor_tabs.currentIndex()
+        if self.editor_tabs.widget(index) is editor:
+            # Первое разделение: страницей вкладки становится разделитель
+            title = self.editor_tabs.tabText(index)
+            splitter = EditorSplitter(orientation)
+            self.editor_tabs.removeTab(index)
+            splitter.addWidget(editor)
+            self.editor_tabs.insertTab(index, splitter, title)
+            self.editor_tabs.setCurrentIndex(index)
+            editor.show()
+        elif not isinstance(editor.parentWidget(), QSplitter):
+            return
+        split_view(editor, orientation)
+
     def split_vertical(self):
-        # Реализация вертикального разделения окна
-        pass
+        # Виды рядом, как :vsplit
+        self.split_editor(Qt.Orientation.Horizontal)
 
     def split_horizontal(self):
-        # Реализация горизонтального разделения окна
-        pass
+        # Виды друг под другом, как :split
+        self.split_editor(Qt.Orientation.Vertical)
 
     def focus_split(self, direction):
-        # Переключение между разделенными окнами
-        pass
+        editor = self.current_editor()
+        page = self.editor_tabs.currentWidget()
+        if editor is None or page is editor:
+            return
+        view = neighbour_view(editor, page, direction)
+        if view is not None:
+            view.setFocus()
+
+    def close_split(self):
+        """Закрывает текущий вид разделённой вкладки; основной вид
+        закрывается вместе с вкладкой"""
+        editor = self.current_editor()
+        if editor is None or editor.source is None:
+            return
+        primary = editor.source
+        index = self.editor_tabs.currentIndex()
+        page = self.editor_tabs.widget(index)
+        close_view(editor)
+        if isinstance(page, EditorSplitter) and page.count() == 1 and page.widget(0) is primary:
+            title = self.editor_tabs.tabText(index)
+            self.editor_tabs.removeTab(index)
+            self.editor_tabs.insertTab(index, primary, title)
+            self.editor_tabs.setCurrentIndex(index)
+            page.deleteLater()
+        primary.setFocus()
 
     def show_command_palette(self):
         # Показать командную палитру
         pass
 
     def fold_code(self):
-        # Свернуть блок кода
-        pass
+        editor = self.current_editor()
+        if editor is not None:
+            editor.fold_code()
 
     def unfold_code(self):
-        # Развернуть блок кода
-        pass
+        editor = self.current_editor()
+        if editor is not None:
+            editor.unfold_code()
 
     def goto_line(self):
         # Переход к строке
@@ -810,11 +947,14 @@ class Editor(QMainWindow):
 
     def quick_open(self):
         # Быстрое открытие файла
-        pass
+        if self.quick_open_palette is None:
+            self.quick_open_palette = QuickOpenPalette(self.project_files, self)
+        self.quick_open_palette.popup()
 
     def find_in_files(self):
         # Поиск по всем файлам
-        pass
+        self.sidebar_stack.setCurrentWidget(self.search_view)
+        self.search_view.focus_input()
 
     def trigger_suggestions(self):
         # Вызов автодополнения
@@ -837,7 +977,7 @@ class Editor(QMainWindow):
 
     def save_file(self):
         print(self)
-        current_editor = self.editor_tabs.currentWidget()
+        current_editor = self.current_editor()
         if current_editor:
             file_path, _ = QFileDialog.getSaveFileName(
                 self,
@@ -845,18 +985,18 @@ class Editor(QMainWindow):
                 self.current_project,
                 "Ryton files (*.ry);;Python files (*.py);;All Files (*.*)"
             )
-            if file_path:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(current_editor.toPlainText())
+            if file_path and current_editor.write_file(file_path):
                 # Обновляем имя вкладки
                 self.editor_tabs.setTabText(
                     self.editor_tabs.currentIndex(), 
                     os.path.basename(file_path)
                 )
                 self.status_bar.showMessage(f"Saved: {file_path}", 3000)
+                self.symbol_index.refresh()
+                self.search_view.file_saved(file_path)
 
     def run_code(self):
-        current_editor = self.editor_tabs.currentWidget()
+        current_editor = self.current_editor()
         if current_editor:
             code = current_editor.toPlainText()
             self.terminal.terminal.execute_command(f"/home/rejzi/projects/CLI/RytonLang/dist/ryton_launcher.dist/ryton_launcher.bin {self.current_project}src/main.ry")
@@ -869,35 +1009,88 @@ class Editor(QMainWindow):
 
     def close_tab(self, index):
         if self.editor_tabs.count() > 1:
-            self.editor_tabs.removeTab(index)
+            self.file_tabs.close(index)
+
+    def editor_page(self, file_path, content=None):
+        """(редактор, страница вкладки) файла; content None - прочитать с
+        диска, большие файлы дочитываются в фоне"""
+        large = content is None and os.path.getsize(file_path) > ASYNC_SIZE
+        lossy = False
+        if content is None and not large:
+            content, encoding, newline, lossy = read_text(file_path)
+        else:
+            encoding, newline = 'utf-8', '\n'
+
+        if file_path.endswith('.md'):
+            new_editor = MarkdownEditor(file_path)  # Используем специальный редактор для MD
+        else:
+            new_editor = CodeEditor(file_path)
+
+        if large:
+            loader = new_editor.load_text(file_path)
+            loader.loaded.connect(lambda *_: self.show_opened(file_path, new_editor))
+        else:
+            new_editor.encoding = encoding
+            new_editor.newline = newline
+            new_editor.lossy = lossy
+            new_editor.setPlainText(content)
+            new_editor.document().setModified(False)
+        return new_editor, new_editor.set_file_type(file_path)
 
     def load_file(self, file_path):
         try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-                
-            if file_path.endswith('.md'):
-                new_editor = MarkdownEditor()  # Используем специальный редактор для MD
-            else:
-                new_editor = CodeEditor()
-                
-            new_editor.setPlainText(content)
-            editor_widget = new_editor.set_file_type(file_path)
-            
-            # Добавляем вкладку с правильным виджетом
-            self.editor_tabs.addTab(editor_widget, os.path.basename(file_path))
-            self.editor_tabs.setCurrentWidget(editor_widget)
-            self.current_file = file_path
-            self.status_bar.showMessage(f"Opened: {file_path}")
-            
+            index = self.file_tabs.open(file_path)
+            if self.editor_tabs.currentIndex() == index:
+                self.current_file = file_path
+                editor = self.current_editor()
+                if editor is not None and (editor.source or editor).loader is None:
+                    self.show_opened(file_path, editor)
+                else:
+                    self.status_bar.showMessage(f"Opening: {file_path}")
         except Exception as e:
             print(f"Loading error: {str(e)}")  # Добавим вывод ошибки в консоль
             self.status_bar.showMessage(f"Error opening file: {str(e)}")
 
+    def show_opened(self, file_path, editor):
+        message = f"Opened: {file_path} ({editor.encoding}, {NEWLINE_NAMES[editor.newline]})"
+        if editor.lossy:
+            message += " - часть байтов не декодирована и заменена на �"
+        self.status_bar.showMessage(message)
+
+    def open_editors(self):
+        """{путь: CodeEditor} файлов, открытых во вкладках"""
+        editors = {}
+        for index in range(self.editor_tabs.count()):
+            editor = self.tab_editor(index)
+            if editor is not None and editor.file_path:
+                editors[editor.file_path] = editor
+        return editors
+
+    def open_path(self, file_path):
+        """Переключается на вкладку файла или открывает его; CodeEditor или None"""
+        self.load_file(file_path)
+        editor = self.current_editor()
+        if editor is None or editor.file_path != file_path:
+            return None
+        return editor
+
+    def open_location(self, file_path, line, column=0):
+        """Открывает файл (или его вкладку) и ставит курсор на line:column"""
+        editor = self.open_path(file_path)
+        if editor is not None:
+            editor.goto_position(line, column)
+
     def open_settings(self):
         settings_dialog = SettingsDialog(self)
         settings_dialog.exec()
 
+    def closeEvent(self, event):
+        self.symbol_index.close()
+        # Панель поиска останавливает и триграммный индекс
+        self.search_view.shutdown()
+        self.project_files.stop()
+        super().closeEvent(event)
+
     def setup_status_bar(self):
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
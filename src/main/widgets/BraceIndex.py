@@ -0,0 +1,134 @@
+from widgets.Lexer import BRACE_PAIRS, CLOSING_BRACES
+
+class BraceIndex:
+    """Индекс скобок документа: {} () [] из токенов 'brace', так что
+    скобки в строках и комментариях не учитываются.
+
+    Для каждого блока хранится кортеж (колонка, скобка), None - блок
+    изменился и его скобки нужно взять заново. Карта пар и диапазоны
+    сворачивания собираются одним проходом со стеками, дальше поиск
+    парной скобки и диапазона - обращение к словарю. Правка внутри строки,
+    не меняющая последовательность её скобок (обычный набор текста),
+    только сдвигает колонки в карте; иначе карта собирается заново при
+    первом запросе.
+
+    block_braces(номер блока) во всех методах отдаёт скобки блока из его
+    токенов; вызывается только для изменившихся блоков.
+    """
+    # Больше стольких изменённых блоков разом - карта собирается заново
+    PATCH_LIMIT = 64
+
+    def __init__(self, count=1):
+        self.blocks = [None] * count
+        self.partners = None
+        self.ranges = None
+        # Блоки, изменившиеся без сдвига номеров: {номер: прежние скобки}
+        self.pending = {}
+        # Начальные блоки свёрнутых диапазонов
+        self.folded = set()
+
+    def reset(self):
+        self.partners = None
+        self.ranges = None
+        self.pending.clear()
+
+    def changed(self, first, old_last, last, count):
+        """Блоки first..old_last заменились блоками first..last"""
+        if first == old_last == last and len(self.blocks) == count:
+            self.invalidate(first, last)
+            return
+        self.blocks[first:old_last + 1] = [None] * (last - first + 1)
+        shift = last - old_last
+        self.folded = {number + shift if number > old_last else number
+                       for number in self.folded if not first < number <= old_last}
+        if len(self.blocks) != count:
+            self.blocks = [None] * count
+            self.folded.clear()
+        self.reset()
+
+    def invalidate(self, first, last):
+        """Токены блоков first..last изменились, номера блоков прежние"""
+        blocks = self.blocks
+        first = max(0, first)
+        last = min(last, len(blocks) - 1)
+        if self.partners is not None and last - first < self.PATCH_LIMIT:
+            for number in range(first, last + 1):
+                if number not in self.pending:
+                    if blocks[number] is None:
+                        self.reset()
+                        break
+                    self.pending[number] = blocks[number]
+        else:
+            self.reset()
+        for number in range(first, last + 1):
+            blocks[number] = None
+
+    def refresh(self, block_braces):
+        if self.partners is None:
+            self.build(block_braces)
+            return
+        pending, self.pending = self.pending, {}
+        partners = self.partners
+        for number, old in pending.items():
+            new = self.blocks[number] = block_braces(number)
+            if [char for _, char in old] != [char for _, char in new]:
+                self.build(block_braces)
+                return
+            moved = {(number, old_column): (number, new_column)
+                     for (old_column, _), (new_column, _) in zip(old, new) if old_column != new_column}
+            popped = [(key, partners.pop(key)) for key in moved if key in partners]
+            for key, value in popped:
+                partners[moved[key]] = moved.get(value, value)
+                if value not in moved:
+                    partners[value] = moved[key]
+
+    def build(self, block_braces):
+        blocks = self.blocks
+        partners = {}
+        ranges = {}
+        stacks = {opening: [] for opening in BRACE_PAIRS}
+        for number in range(len(blocks)):
+            braces = blocks[number]
+            if braces is None:
+                braces = blocks[number] = block_braces(number)
+            for column, char in braces:
+                if char in BRACE_PAIRS:
+                    stacks[char].append((number, column))
+                    continue
+                stack = stacks[CLOSING_BRACES[char]]
+                if not stack:
+                    continue
+                opening = stack.pop()
+                partners[opening] = (number, column)
+                partners[number, column] = opening
+                # Сворачивать есть что, если между скобками есть строки;
+                # из пар, открытых в одном блоке, берётся самая длинная
+                start = opening[0]
+                if number - start > 1 and ranges.get(start, 0) < number:
+                    ranges[start] = number
+        self.partners = partners
+        self.ranges = ranges
+        self.pending.clear()
+
+    def braces_of(self, number, block_braces):
+        """Скобки блока: ((колонка, скобка), ...)"""
+        if self.partners is None or self.pending:
+            self.refresh(block_braces)
+        return self.blocks[number]
+
+    def partner(self, number, column, block_braces):
+        """(блок, колонка) парной скобки или None"""
+        if self.partners is None or self.pending:
+            self.refresh(block_braces)
+        return self.partners.get((number, column))
+
+    def fold_ranges(self, block_braces):
+        """{блок с открывающей скобкой: блок с закрывающей}"""
+        if self.partners is None or self.pending:
+            self.refresh(block_braces)
+        return self.ranges
+
+    def enclosing(self, number, block_braces):
+        """Диапазоны (начало, конец), содержащие блок, от внешнего к внутреннему"""
+        return sorted((start, end) for start, end in self.fold_ranges(block_braces).items()
+                      if start <= number <= end)
@@ -0,0 +1,200 @@
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+
+from concurrent.futures.process import BrokenProcessPool
+from collections import defaultdict, deque
+from array import array
+import zlib
+import os
+
+from widgets.Lexer import get_lexer
+from widgets.SymbolIndex import SOURCE_LANGUAGES, scan_sources
+from widgets.ProjectSearch import get_executor
+
+# Минимальная длина клона в токенах (k-грамма) и окно winnowing: клон
+# длиной от MIN_TOKENS + WINDOW - 1 токенов находится гарантированно
+MIN_TOKENS = 40
+WINDOW = 10
+
+BASE = 1000003
+MODULUS = (1 << 61) - 1
+
+def token_hash(text):
+    # Детерминированный хэш: встроенный hash() в процессах пула другой
+    return zlib.crc32(text.encode('utf-8', 'surrogatepass'))
+
+def winnow(hashes, k=MIN_TOKENS, window=WINDOW):
+    """Отпечатки последовательности хэшей токенов: [(хэш k-граммы, номер
+    первого токена), ...]. Хэши k-грамм считаются скользящим полиномом,
+    из каждого окна берётся самый правый минимум (winnowing)."""
+    if len(hashes) < k:
+        return []
+    power = pow(BASE, k - 1, MODULUS)
+    current = 0
+    for value in hashes[:k]:
+        current = (current * BASE + value) % MODULUS
+    grams = [current]
+    for index in range(k, len(hashes)):
+        current = ((current - hashes[index - k] * power) * BASE + hashes[index]) % MODULUS
+        grams.append(current)
+
+    fingerprints = []
+    candidates = deque()
+    last = -1
+    for index, value in enumerate(grams):
+        while candidates and grams[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(index)
+        if candidates[0] <= index - window:
+            candidates.popleft()
+        if index >= window - 1 and candidates[0] != last:
+            last = candidates[0]
+            fingerprints.append((grams[last], last))
+    if not fingerprints and grams:
+        fingerprints.append((min(grams), grams.index(min(grams))))
+    return fingerprints
+
+def token_stream(text, lexer):
+    """(хэши токенов, номера их строк) без комментариев"""
+    hashes = []
+    lines = array('I')
+    state = lexer.NORMAL
+    for number, line in enumerate(text.splitlines()):
+        tokens, state = lexer.lex(line, state)
+        for start, length, kind in tokens:
+            if kind == 'comment':
+                continue
+            hashes.append(token_hash(line[start:start + length]))
+            lines.append(number)
+    return hashes, lines
+
+def file_fingerprints(path):
+    """(path, отпечатки, номера строк токенов); выполняется в пуле"""
+    lexer = get_lexer(SOURCE_LANGUAGES[os.path.splitext(path)[1].lower()])
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError:
+        return path, [], array('I')
+    hashes, lines = token_stream(text, lexer)
+    return path, winnow(hashes), lines
+
+def files_fingerprints(paths):
+    return [file_fingerprints(path) for path in paths]
+
+def clone_groups(files, k=MIN_TOKENS):
+    """Группы клонов по отпечаткам файлов [(ключ, отпечатки, строки токенов)].
+
+    Общие отпечатки отмечают повторяющиеся k-граммы; пересекающиеся
+    k-граммы одного файла сливаются в участки, а участки с общими
+    отпечатками - в группы (система непересекающихся множеств).
+    Результат: [[(ключ, первая строка, последняя строка), ...], ...],
+    крупные группы первыми. Время линейно от числа отпечатков.
+    """
+    occurrences = defaultdict(list)
+    for number, (_, fingerprints, _) in enumerate(files):
+        for value, index in fingerprints:
+            occurrences[value].append((number, index))
+    shared = {value for value, places in occurrences.items() if len(places) > 1}
+    if not shared:
+        return []
+
+    # Участки: [номер файла, первый токен, конец]
+    regions = []
+    region_of = {}
+    for number, (_, fingerprints, _) in enumerate(files):
+        current = None
+        for value, index in fingerprints:
+            if value not in shared:
+                continue
+            if current is not None and index <= regions[current][2]:
+                regions[current][2] = max(regions[current][2], index + k)
+            else:
+                current = len(regions)
+                regions.append([number, index, index + k])
+            region_of[number, index] = current
+
+    parent = list(range(len(regions)))
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for value in shared:
+        places = occurrences[value]
+        first = find(region_of[places[0]])
+        for place in places[1:]:
+            other = find(region_of[place])
+            if other != first:
+                parent[other] = first
+
+    grouped = defaultdict(list)
+    for region in range(len(regions)):
+        grouped[find(region)].append(region)
+
+    groups = []
+    for members in grouped.values():
+        if len(members) < 2:
+            continue
+        group = []
+        for region in members:
+            number, start, end = regions[region]
+            key, _, lines = files[number]
+            group.append((key, lines[start], lines[min(end, len(lines)) - 1]))
+        group.sort(key=lambda place: (str(place[0]), place[1]))
+        groups.append(group)
+    groups.sort(key=lambda group: -max(last - first for _, first, last in group))
+    return groups
+
+class CloneDetector(QThread):
+    """Поиск клонов по всем исходникам проекта в фоне: отпечатки файлов
+    считаются в пуле процессов, группировка - в этом потоке"""
+    # [[(path, первая строка, последняя строка), ...], ...]
+    clones_found = pyqtSignal(list)
+
+    CHUNK = 32
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+
+    def run(self):
+        paths = sorted(scan_sources(self.root))
+        try:
+            executor = get_executor()
+            futures = [executor.submit(files_fingerprints, paths[start:start + self.CHUNK])
+                       for start in range(0, len(paths), self.CHUNK)]
+            files = [result for future in futures for result in future.result()]
+        except (OSError, BrokenProcessPool):
+            files = [file_fingerprints(path) for path in paths]
+        self.clones_found.emit(clone_groups(files))
+
+class ClonesDialog(QDialog):
+    """Список групп клонов; двойной щелчок открывает место в редакторе"""
+    def __init__(self, root, groups, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Повторяющийся код")
+        self.resize(700, 500)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Найдено групп: {len(groups)}"))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        for group in groups:
+            size = max(last - first for _, first, last in group) + 1
+            item = QTreeWidgetItem([f"{size} строк, {len(group)} мест"])
+            for path, first, last in group:
+                child = QTreeWidgetItem([f"{os.path.relpath(path, root)}:{first + 1}-{last + 1}"])
+                child.setData(0, Qt.ItemDataRole.UserRole, (path, first))
+                item.addChild(child)
+            self.tree.addTopLevelItem(item)
+        self.tree.itemActivated.connect(self.open_item)
+        layout.addWidget(self.tree)
+
+    def open_item(self, item):
+        location = item.data(0, Qt.ItemDataRole.UserRole)
+        window = self.parentWidget().window() if self.parentWidget() else None
+        if location and hasattr(window, 'open_location'):
+            window.open_location(location[0], location[1], 0)
@@ -0,0 +1,206 @@
+import heapq
+
+def char_bit(char):
+    """Бит символа в маске набора символов слова"""
+    if 'a' <= char <= 'z':
+        return 1 << (ord(char) - 97)
+    if '0' <= char <= '9':
+        return 1 << (ord(char) - 22)
+    if char == '_':
+        return 1 << 36
+    return 1 << (37 + ord(char) % 27)
+
+def char_mask(text):
+    mask = 0
+    for char in text:
+        mask |= char_bit(char)
+    return mask
+
+class CompletionIndex:
+    """Индекс слов для нечёткого автодополнения.
+
+    Слова раскладываются по префиксному дереву глубины DEPTH: узел хранит
+    номера всех слов с этим префиксом, упорядоченные по длине при первом
+    запросе. Точные префиксы всегда выше нечётких совпадений, поэтому если их
+    набралось limit, ответ - начало упорядоченного списка узла. Иначе
+    проверяются слова с той же первой буквой на совпадение как
+    подпоследовательности. Кандидаты отсекаются маской набора символов,
+    а сама проверка идёт по битовым маскам позиций символов слова. Из оценённых слов heap оставляет limit
+    лучших, полная сортировка не нужна. Продолжение предыдущего запроса
+    (набор очередной буквы) ищет только среди прошлых совпадений.
+
+    Удалённые слова только помечаются; когда их становится больше половины,
+    индекс перестраивается.
+    """
+    DEPTH = 3
+
+    PREFIX_BONUS = 100
+    BOUNDARY_BONUS = 8
+    CONSECUTIVE_BONUS = 5
+
+    def __init__(self, words=()):
+        self.words = []
+        self.lowered = []
+        self.masks = []
+        self.positions = []
+        self.alive = []
+        self.removed = 0
+        self.ids = {}
+        self.trie = {}
+        self.last_query = None
+        self.update(words)
+
+    def __len__(self):
+        return len(self.words) - self.removed
+
+    def __contains__(self, word):
+        index = self.ids.get(word)
+        return index is not None and self.alive[index]
+
+    def add(self, word):
+        if not word:
+            return
+        index = self.ids.get(word)
+        if index is not None:
+            if not self.alive[index]:
+                self.alive[index] = True
+                self.removed -= 1
+                self.last_query = None
+            return
+        index = len(self.words)
+        lowered = word.lower()
+        self.ids[word] = index
+        self.words.append(word)
+        self.lowered.append(lowered)
+        self.masks.append(char_mask(lowered))
+        self.positions.append(None)
+        self.alive.append(True)
+
+        node = self.trie
+        for char in lowered[:self.DEPTH]:
+            node = node.setdefault(char, [{}, [], True])
+            node[1].append(index)
+            node[2] = False
+            node = node[0]
+        self.last_query = None
+
+    def update(self, words):
+        for word in words:
+            self.add(word)
+
+    def discard(self, word):
+        index = self.ids.get(word)
+        if index is None or not self.alive[index]:
+            return
+        self.alive[index] = False
+        self.removed += 1
+        self.last_query = None
+        if self.removed > len(self.words) // 2:
+            words = [word for word, alive in zip(self.words, self.alive) if alive]
+            self.__init__(words)
+
+    def clear(self):
+        self.__init__()
+
+    def node_ids(self, prefix):
+        """Номера слов, начинающихся с prefix[:DEPTH], короткие первыми"""
+        node = None
+        children = self.trie
+        for char in prefix[:self.DEPTH]:
+            node = children.get(char)
+            if node is None:
+                return []
+            children = node[0]
+        if not node[2]:
+            words = self.words
+            node[1].sort(key=lambda index: (len(words[index]), words[index]))
+            node[2] = True
+        return node[1]
+
+    def char_positions(self, index):
+        """{символ: битовая маска позиций символа в слове}, строится лениво"""
+        positions = self.positions[index]
+        if positions is None:
+            positions = {}
+            for position, char in enumerate(self.lowered[index]):
+                positions[char] = positions.get(char, 0) | (1 << position)
+            self.positions[index] = positions
+        return positions
+
+    def top(self, candidates, pattern, limit):
+        """Оценивает кандидатов и оставляет limit лучших.
+
+        Возвращает (лучшие номера от лучшего к худшему, все совпавшие номера).
+        Слово совпадает, если pattern (в нижнем регистре) - его
+        подпоследовательность; символы ищутся жадно по маскам позиций.
+        """
+        heap = []
+        matched = []
+        words = self.words
+        lowered = self.lowered
+        alive = self.alive
+        char_positions = self.char_positions
+        consecutive_bonus = self.CONSECUTIVE_BONUS
+        boundary_bonus = self.BOUNDARY_BONUS
+
+        for index in candidates:
+            if not alive[index]:
+                continue
+            positions = char_positions(index)
+            word = words[index]
+            lower = lowered[index]
+
+            score = 0
+            previous = -1
+            for char in pattern:
+                found = positions.get(char, 0) >> (previous + 1)
+                if not found:
+                    break
+                position = previous + (found & -found).bit_length()
+                if position == previous + 1:
+                    score += consecutive_bonus
+                if (position == 0 or lower[position - 1] == '_' or
+                        (word[position].isupper() and not word[position - 1].isupper())):
+                    score += boundary_bonus
+                previous = position
+            else:
+                matched.append(index)
+                if lower.startswith(pattern):
+                    score += self.PREFIX_BONUS
+                # Короткие слова выше длинных при прочих равных
+                item = (score - len(word) / 64, -index)
+                if len(heap) < limit:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        heap.sort(reverse=True)
+        return [-index for _, index in heap], matched
+
+    def search(self, pattern, limit=50):
+        """Не более limit лучших слов для pattern, от лучшего к худшему"""
+        pattern = pattern.lower()
+        if not pattern:
+            return []
+
+        # Точные префиксы оцениваются выше любых нечётких совпадений
+        prefixed = []
+        lowered = self.lowered
+        alive = self.alive
+        for index in self.node_ids(pattern):
+            if lowered[index].startswith(pattern) and alive[index]:
+                prefixed.append(index)
+                if len(prefixed) == limit:
+                    return [self.words[index] for index in prefixed]
+
+        if self.last_query and pattern.startswith(self.last_query[0]):
+            candidates = self.last_query[1]
+        else:
+            mask = char_mask(pattern)
+            masks = self.masks
+            candidates = [index for index in self.node_ids(pattern[0])
+                          if masks[index] & mask == mask]
+
+        result, matched = self.top(candidates, pattern, limit)
+        self.last_query = (pattern, matched)
+        return [self.words[index] for index in result]
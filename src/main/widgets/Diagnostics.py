@@ -0,0 +1,204 @@
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from collections import OrderedDict
+import threading
+
+from widgets.CloneDetection import clone_groups, winnow, token_hash
+
+# Диагностика - кортеж (строка, колонка, длина, важность, сообщение);
+# важность: 'error', 'warning' или 'info'
+
+MAX_FUNCTION_LINES = 20
+MAX_CONDITION_OPERATORS = 2
+
+def document_tokens(lines, tokenize):
+    """[(строка, колонка, текст токена, вид), ...] всего текста"""
+    tokens = []
+    state = 0
+    for number, line in enumerate(lines):
+        spans, state = tokenize(line, state)
+        for start, length, kind in spans:
+            tokens.append((number, start, line[start:start + length], kind))
+    return tokens
+
+def check_function_length(tokens, function_keywords):
+    """Слишком длинные функции. Один проход со стеком скобок: тело
+    функции - первая '{' после её имени"""
+    diagnostics = []
+    pending = None
+    stack = []
+    for index, (line, column, value, kind) in enumerate(tokens):
+        if kind == 'keyword' and value in function_keywords:
+            if index + 1 < len(tokens) and tokens[index + 1][3] == 'identifier':
+                pending = tokens[index + 1]
+        elif kind == 'brace':
+            if value == '{':
+                stack.append((pending, line))
+                pending = None
+            elif value == '}' and stack:
+                function, start = stack.pop()
+                if function is not None and line - start > MAX_FUNCTION_LINES:
+                    name_line, name_column, name, _ = function
+                    diagnostics.append((
+                        name_line, name_column, len(name), 'warning',
+                        f"Функция '{name}' слишком длинная ({line - start} строк). "
+                        f"Рекомендуется разбить на части."))
+    return diagnostics
+
+def check_complex_conditions(tokens):
+    """Условия с большим числом and/or. Условие кончается на '{', на ';'
+    или с концом строки, если не осталось открытых круглых скобок
+    (if-выражение, как в Zig, не тянет за собой следующие строки)"""
+    diagnostics = []
+    count = len(tokens)
+    for index, (line, column, value, kind) in enumerate(tokens):
+        if kind != 'keyword' or value != 'if':
+            continue
+        condition = []
+        depth = 0
+        current = line
+        for part_index in range(index + 1, count):
+            part_line, _, part, part_kind = tokens[part_index]
+            if part == ';' or (part_kind == 'brace' and part == '{'):
+                break
+            if part_line != current:
+                if depth <= 0:
+                    break
+                current = part_line
+            if part_kind == 'brace':
+                if part == '(':
+                    depth += 1
+                elif part == ')':
+                    depth -= 1
+            condition.append(part)
+        if sum(1 for part in condition if part in ('and', 'or')) > MAX_CONDITION_OPERATORS:
+            diagnostics.append((line, column, len(value), 'info',
+                                f"Сложное условие. Рекомендуется упростить: {' '.join(condition)}"))
+    return diagnostics
+
+def check_code_duplication(tokens, lines):
+    """Группы клонов (см. CloneDetection); отмечается первая строка
+    каждого участка"""
+    hashes = []
+    numbers = []
+    for line, _, value, kind in tokens:
+        if kind != 'comment':
+            hashes.append(token_hash(value))
+            numbers.append(line)
+    diagnostics = []
+    for group in clone_groups([(None, winnow(hashes), numbers)]):
+        places = ", ".join(f"{first + 1}-{last + 1}" for _, first, last in group)
+        for _, first, _ in group:
+            text = lines[first]
+            indent = len(text) - len(text.lstrip())
+            diagnostics.append((first, indent, len(text) - indent, 'info',
+                                f"Обнаружен повторяющийся код в строках {places}"))
+    return diagnostics
+
+def analyze(text, tokenize, function_keywords):
+    """Все диагностики текста, по порядку строк"""
+    lines = text.split('\n')
+    tokens = document_tokens(lines, tokenize)
+    diagnostics = check_function_length(tokens, function_keywords)
+    diagnostics += check_complex_conditions(tokens)
+    diagnostics += check_code_duplication(tokens, lines)
+    diagnostics.sort()
+    return diagnostics
+
+class DiagnosticsWorker(QThread):
+    """Анализ одного снимка текста; Qt-объекты документа не трогает"""
+    # версия документа, [диагностика, ...]
+    analyzed = pyqtSignal(int, list)
+
+    def __init__(self, service, text, version):
+        super().__init__()
+        self.service = service
+        self.text = text
+        self.version = version
+
+    def run(self):
+        self.analyzed.emit(self.version, self.service.cached_analysis(self.text))
+
+class DiagnosticsService(QObject):
+    """Фоновая диагностика документа редактора.
+
+    Каждое изменение документа увеличивает версию; анализ запускается
+    через DELAY мс после последней правки, не больше одного одновременно,
+    и результат принимается, только если версия с тех пор не менялась.
+    Результаты кэшируются по тексту (CACHE_SIZE последних), так что
+    отмена правки не запускает анализ заново. Читатели (контекстное меню,
+    подчёркивания, поле номеров строк) берут готовое из diagnostics.
+    """
+    diagnostics_changed = pyqtSignal()
+
+    DELAY = 500
+    CACHE_SIZE = 8
+
+    # Работающие анализы всех редакторов: поток не должен быть удалён
+    # вместе с закрытым редактором, пока не доработает
+    running = set()
+
+    def __init__(self, document, highlighter):
+        super().__init__()
+        self.document = document
+        self.tokenize = highlighter.tokenize
+        self.function_keywords = {word for word, kind in highlighter.lexer.defining.items()
+                                  if kind == 'function'}
+        self.version = 0
+        self.analyzed_version = -1
+        self.diagnostics = []
+        self.worker = None
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_analysis)
+        document.contentsChanged.connect(self.document_changed)
+
+    def document_changed(self):
+        self.version += 1
+        self.timer.start(self.DELAY)
+
+    def run_analysis(self):
+        if self.analyzed_version == self.version:
+            return
+        if self.worker is not None:
+            # Дождёмся текущего анализа, потом возьмём свежий снимок
+            return
+        worker = DiagnosticsWorker(self, self.document.toPlainText(), self.version)
+        worker.analyzed.connect(self.accept_results)
+        worker.finished.connect(self.worker_finished)
+        worker.finished.connect(lambda: DiagnosticsService.running.discard(worker))
+        DiagnosticsService.running.add(worker)
+        self.worker = worker
+        worker.start()
+
+    def worker_finished(self):
+        self.worker = None
+        if self.analyzed_version != self.version and not self.timer.isActive():
+            self.run_analysis()
+
+    def accept_results(self, version, diagnostics):
+        if version != self.version:
+            return
+        self.analyzed_version = version
+        self.diagnostics = diagnostics
+        self.diagnostics_changed.emit()
+
+    def cached_analysis(self, text):
+        with self.lock:
+            diagnostics = self.cache.get(text)
+            if diagnostics is not None:
+                self.cache.move_to_end(text)
+                return diagnostics
+        diagnostics = analyze(text, self.tokenize, self.function_keywords)
+        with self.lock:
+            self.cache[text] = diagnostics
+            while len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return diagnostics
+
+    def messages(self):
+        """Тексты текущих диагностик без повторов"""
+        return list(dict.fromkeys(message for _, _, _, _, message in self.diagnostics))
@@ -0,0 +1,237 @@
+from PyQt6.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar, QToolButton
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+import threading
+import codecs
+import os
+
+# По стольким первым байтам определяются кодировка и перевод строк
+PREFIX_SIZE = 64 * 1024
+# Файлы больше этого читаются в фоне порциями (см. DocumentLoader)
+ASYNC_SIZE = 2 * 1024 * 1024
+# Кодировка файлов без BOM, которые не декодируются как UTF-8
+FALLBACK_ENCODING = 'cp1251'
+
+# UTF-32 LE начинается с той же пары байт, что UTF-16 LE, - проверяется первым
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+NEWLINE_NAMES = {'\n': 'LF', '\r\n': 'CRLF', '\r': 'CR'}
+
+# Декодирование с заменой неизвестных байтов, которое запоминает (в своём
+# потоке), что замена была: такой текст нельзя молча записать обратно
+_decoding = threading.local()
+
+def _replace_lossy(error):
+    _decoding.lossy = True
+    return codecs.replace_errors(error)
+
+codecs.register_error('ryton-lossy', _replace_lossy)
+
+def detect_encoding(prefix):
+    """Кодировка по началу файла: BOM, иначе UTF-8, если начало им
+    декодируется (последний символ может быть обрезан), иначе FALLBACK_ENCODING"""
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8'
+
+def detect_newline(text):
+    """Самый частый перевод строки в тексте: '\\n', '\\r\\n' или '\\r'"""
+    crlf = text.count('\r\n')
+    counts = {'\r\n': crlf, '\r': text.count('\r') - crlf, '\n': text.count('\n') - crlf}
+    newline = max(counts, key=counts.get)
+    return newline if counts[newline] else '\n'
+
+def read_text(path):
+    """(текст, кодировка, перевод строки, были ли замены) небольшого файла.
+    Переводы строк приводятся к '\\n', неизвестные байты заменяются на
+    U+FFFD, а не ломают открытие."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    encoding = detect_encoding(data[:PREFIX_SIZE])
+    _decoding.lossy = False
+    text = data.decode(encoding, 'ryton-lossy')
+    newline = detect_newline(text[:PREFIX_SIZE])
+    return text.replace('\r\n', '\n').replace('\r', '\n'), encoding, newline, _decoding.lossy
+
+def encode_text(text, encoding, newline):
+    """Байты файла для записи - обратное read_text. UnicodeEncodeError
+    (текст не представим в кодировке) возникает до записи на диск"""
+    if newline != '\n':
+        text = text.replace('\n', newline)
+    return text.encode(encoding)
+
+class FileLoader(QThread):
+    """Читает файл порциями по CHUNK_SIZE символов; Qt-объекты документа
+    не трогает. Порция - примерно столько, сколько GUI-поток вставляет
+    за кадр-другой; вперёд читается не больше SLOTS порций: следующая
+    ждёт, пока GUI-поток не вставит предыдущую (chunk_done)."""
+    # кодировка, перевод строки
+    detected = pyqtSignal(str, str)
+    # текст порции, прочитано байт, всего байт
+    chunk_read = pyqtSignal(str, int, int)
+    # были ли заменены недекодируемые байты
+    completed = pyqtSignal(bool)
+    failed = pyqtSignal(str)
+
+    CHUNK_SIZE = 256 * 1024
+    SLOTS = 2
+
+    # Работающие чтения всех редакторов: поток не должен быть удалён
+    # вместе с закрытым редактором, пока не доработает
+    running = set()
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.slots = threading.Semaphore(self.SLOTS)
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.slots.release()
+
+    def chunk_done(self):
+        self.slots.release()
+
+    def run(self):
+        try:
+            total = os.path.getsize(self.path)
+            with open(self.path, 'rb') as raw:
+                prefix = raw.read(PREFIX_SIZE)
+            encoding = detect_encoding(prefix)
+            self.detected.emit(encoding, detect_newline(prefix.decode(encoding, 'replace')))
+            _decoding.lossy = False
+            # Текстовый режим сам склеивает \r\n на границе порций
+            with open(self.path, 'r', encoding=encoding, errors='ryton-lossy') as f:
+                while not self.cancelled:
+                    text = f.read(self.CHUNK_SIZE)
+                    if not text:
+                        break
+                    self.slots.acquire()
+                    if self.cancelled:
+                        return
+                    self.chunk_read.emit(text, f.buffer.tell(), total)
+        except OSError as error:
+            self.failed.emit(str(error))
+            return
+        if not self.cancelled:
+            self.completed.emit(_decoding.lossy)
+
+class LoadProgress(QWidget):
+    """Индикатор загрузки в правом верхнем углу редактора с кнопкой отмены"""
+    def __init__(self, editor, loader):
+        super().__init__(editor)
+        self.editor = editor
+        self.setAutoFillBackground(True)
+        self.setStyleSheet("""
+            QWidget { background-color: #252526; color: #d4d4d4; }
+            QProgressBar { border: 1px solid #3c3c3c; text-align: center; max-height: 12px; }
+            QProgressBar::chunk { background-color: #094771; }
+            QToolButton { border: none; padding: 2px 4px; }
+        """)
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(6, 4, 6, 4)
+        layout.addWidget(QLabel("Загрузка"))
+        self.bar = QProgressBar()
+        self.bar.setRange(0, 100)
+        self.bar.setMinimumWidth(160)
+        layout.addWidget(self.bar)
+        cancel = QToolButton()
+        cancel.setText("✕")
+        cancel.setToolTip("Отменить открытие")
+        cancel.clicked.connect(loader.cancel)
+        layout.addWidget(cancel)
+
+    def set_progress(self, done, total):
+        self.bar.setValue(100 * done // total if total else 100)
+
+    def reposition(self):
+        self.adjustSize()
+        viewport = self.editor.viewport().geometry()
+        self.move(viewport.right() - self.width() - 16, viewport.top())
+
+class DocumentLoader(QObject):
+    """Асинхронное открытие файла в редактор.
+
+    FileLoader читает файл в фоне, а порции дописываются в конец
+    документа по мере чтения, так что начало файла видно и прокручивается
+    сразу. Редактор на это время в режиме загрузки (begin_loading /
+    finish_loading): только чтение, без истории отмены и без подсветки
+    в GUI-потоке.
+    """
+    # кодировка, перевод строки, были ли замены (см. read_text)
+    loaded = pyqtSignal(str, str, bool)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, editor, path):
+        super().__init__(editor)
+        self.editor = editor
+        self.path = path
+        self.encoding = None
+        self.newline = '\n'
+        self.progress = LoadProgress(editor, self)
+
+        worker = FileLoader(path)
+        worker.detected.connect(self.accept_detected)
+        worker.chunk_read.connect(self.append_chunk)
+        worker.completed.connect(self.complete)
+        worker.failed.connect(self.fail)
+        worker.finished.connect(lambda: FileLoader.running.discard(worker))
+        # Закрытая во время загрузки вкладка не должна держать поток
+        editor.destroyed.connect(worker.cancel)
+        self.worker = worker
+
+    def start(self):
+        self.editor.begin_loading()
+        self.progress.reposition()
+        self.progress.show()
+        FileLoader.running.add(self.worker)
+        self.worker.start()
+
+    def accept_detected(self, encoding, newline):
+        self.encoding = encoding
+        self.newline = newline
+
+    def append_chunk(self, text, done, total):
+        if self.worker is None:
+            return
+        self.editor.append_text(text)
+        self.progress.set_progress(done, total)
+        self.worker.chunk_done()
+
+    def stop(self):
+        self.worker = None
+        self.progress.hide()
+        self.progress.deleteLater()
+        self.editor.finish_loading()
+        self.editor.loader = None
+
+    def complete(self, lossy):
+        if self.worker is None:
+            return
+        self.editor.encoding = self.encoding
+        self.editor.newline = self.newline
+        self.editor.lossy = lossy
+        self.stop()
+        self.loaded.emit(self.encoding, self.newline, lossy)
+
+    def cancel(self):
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self.stop()
+        self.cancelled.emit()
+
+    def fail(self, message):
+        if self.worker is None:
+            return
+        self.stop()
+        self.failed.emit(message)
@@ -0,0 +1,464 @@
+from PyQt6.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QLineEdit, QToolButton,
+                             QLabel, QTextEdit)
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QTextCursor, QTextCharFormat, QColor
+
+from bisect import bisect_left, bisect_right
+import re
+
+# Символы вне BMP занимают в QTextDocument две позиции (UTF-16)
+ASTRAL = re.compile('[\U00010000-\U0010ffff]')
+
+def compile_pattern(pattern, regex=False, whole_word=False, case_sensitive=False):
+    """Собирает регулярное выражение поиска; ^ и $ в нём - границы строк,
+    а не всего документа. Ошибка синтаксиса - re.error"""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if regex:
+        flags |= re.MULTILINE
+    else:
+        pattern = re.escape(pattern)
+    if whole_word:
+        pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+    return re.compile(pattern, flags)
+
+def apply_edits(document, edits):
+    """Применяет правки [(start, end, text), ...] в позициях документа.
+
+    Все правки идут курсором внутри одного beginEditBlock/endEditBlock:
+    отмена возвращает их одним шагом, а раскладка и подсветка
+    пересчитываются только для затронутых блоков. Правки не должны
+    пересекаться; применяются с конца, чтобы позиции не сдвигались.
+    """
+    if not edits:
+        return 0
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    for start, end, text in sorted(edits, reverse=True):
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text)
+    cursor.endEditBlock()
+    return len(edits)
+
+def minimal_edit(old, new, start):
+    """Сужает замену old -> new (old начинается с индекса start) до
+    отличающейся середины; None, если менять нечего"""
+    if old == new:
+        return None
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return start + prefix, start + len(old) - suffix, new[prefix:len(new) - suffix]
+
+class DocumentSearch:
+    """Поиск по тексту документа.
+
+    Текст берётся одним toPlainText() и кэшируется до следующей правки
+    документа, сам поиск делает re в C. Поиск без учёта регистра по
+    обычной строке идёт по закэшированной копии текста в нижнем регистре:
+    re с IGNORECASE на порядок медленнее. Совпадения хранятся как
+    отсортированные позиции документа, поэтому совпадения видимой области
+    и ближайшее к курсору находятся бисекцией.
+    """
+    def __init__(self, document):
+        self.document = document
+        self.text = None
+        self.lowered = None
+        self.astral = []
+        self.query = None
+        self.starts = []
+        self.ends = []
+        document.contentsChanged.connect(self.invalidate)
+
+    def invalidate(self):
+        self.text = None
+        self.lowered = None
+
+    def stale(self):
+        """Текст изменился после последнего поиска"""
+        return self.text is None
+
+    def snapshot(self):
+        if self.text is None:
+            self.text = self.document.toPlainText()
+            # Индексы строки Python -> позиции Qt: +1 за каждый предыдущий
+            # символ вне BMP
+            self.astral = [match.start() for match in ASTRAL.finditer(self.text)] \
+                if not self.text.isascii() else []
+        return self.text
+
+    def lowered_text(self):
+        """Текст в нижнем регистре или None, если lower() меняет длину
+        (тогда позиции не совпали бы с документом)"""
+        if self.lowered is None:
+            text = self.snapshot()
+            lowered = text.lower()
+            self.lowered = lowered if len(lowered) == len(text) else False
+        return self.lowered or None
+
+    def to_position(self, index):
+        if not self.astral:
+            return index
+        return index + bisect_left(self.astral, index)
+
+    def to_index(self, position):
+        if not self.astral:
+            return position
+        # Обратное отображение: сдвиг равен числу символов вне BMP до позиции
+        low, high = 0, len(self.astral)
+        while low < high:
+            middle = (low + high) // 2
+            if self.astral[middle] + middle < position:
+                low = middle + 1
+            else:
+                high = middle
+        return position - low
+
+    def search(self, pattern, regex=False, whole_word=False, case_sensitive=False):
+        """Находит все совпадения; возвращает их число.
+        Ошибка в регулярном выражении - re.error"""
+        self.query = (pattern, regex, whole_word, case_sensitive)
+        text = self.snapshot()
+        if not regex and not case_sensitive:
+            lowered = self.lowered_text()
+            if lowered is not None:
+                text = lowered
+                pattern = pattern.lower()
+                case_sensitive = True
+        compiled = compile_pattern(pattern, regex, whole_word, case_sensitive)
+
+        spans = [match.span() for match in compiled.finditer(text)]
+        if regex:
+            spans = [span for span in spans if span[0] != span[1]]
+        if self.astral:
+            to_position = self.to_position
+            spans = [(to_position(start), to_position(end)) for start, end in spans]
+        self.starts = [start for start, _ in spans]
+        self.ends = [end for _, end in spans]
+        return len(spans)
+
+    def replacements(self, replacement, first=0, last=None):
+        """Правки для замены совпадений последнего запроса, начинающихся
+        в позициях first..last: [(start, end, text), ...] в позициях документа.
+
+        В режиме регулярных выражений replacement может ссылаться на группы
+        (\\1, \\g<name>). Каждая замена сужена до реально меняющихся символов.
+        """
+        if self.query is None:
+            return []
+        pattern, regex, whole_word, case_sensitive = self.query
+        compiled = compile_pattern(pattern, regex, whole_word, case_sensitive)
+        text = self.snapshot()
+        end_index = len(text) if last is None else self.to_index(last)
+
+        edits = []
+        to_position = self.to_position
+        for match in compiled.finditer(text, self.to_index(first)):
+            start, end = match.span()
+            if start > end_index:
+                break
+            if start == end:
+                continue
+            new = match.expand(replacement) if regex else replacement
+            edit = minimal_edit(match.group(), new, start)
+            if edit is not None:
+                edits.append((to_position(edit[0]), to_position(edit[1]), edit[2]))
+        return edits
+
+    def clear(self):
+        self.query = None
+        self.starts = []
+        self.ends = []
+
+    def count(self):
+        return len(self.starts)
+
+    def in_range(self, first, last):
+        """Номера совпадений, пересекающих позиции first..last"""
+        return range(bisect_right(self.ends, first), bisect_left(self.starts, last))
+
+    def next_after(self, position):
+        if not self.starts:
+            return None
+        index = bisect_left(self.starts, position)
+        return index if index < len(self.starts) else 0
+
+    def previous_before(self, position):
+        if not self.starts:
+            return None
+        index = bisect_left(self.starts, position) - 1
+        return index if index >= 0 else len(self.starts) - 1
+
+class FindBar(QWidget):
+    """Панель поиска и замены в правом верхнем углу редактора.
+
+    Поиск запускается по мере ввода (с короткой задержкой) и после правок
+    документа; ExtraSelection создаются только для совпадений около видимой
+    области и пересобираются при прокрутке.
+    """
+    DELAY = 120
+    # Сколько экранов текста выше и ниже видимой области подсвечивать заранее
+    MARGIN_SCREENS = 1
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.engine = DocumentSearch(editor.document())
+        self.current = None
+
+        self.match_format = QTextCharFormat()
+        self.match_format.setBackground(QColor("#666666"))
+        self.match_format.setForeground(QColor("#FFFFFF"))
+        self.current_format = QTextCharFormat()
+        self.current_format.setBackground(QColor("#A8701A"))
+        self.current_format.setForeground(QColor("#FFFFFF"))
+
+        self.setAutoFillBackground(True)
+        self.setStyleSheet("""
+            QWidget { background-color: #252526; color: #d4d4d4; }
+            QLineEdit { border: 1px solid #3c3c3c; padding: 2px 4px; }
+            QToolButton { border: none; padding: 2px 4px; }
+            QToolButton:checked { background-color: #094771; }
+        """)
+
+        rows = QVBoxLayout(self)
+        rows.setContentsMargins(6, 4, 6, 4)
+        rows.setSpacing(2)
+        layout = QHBoxLayout()
+        layout.setSpacing(2)
+        rows.addLayout(layout)
+
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("Find")
+        self.input.setMinimumWidth(200)
+        self.input.textChanged.connect(self.schedule_search)
+        self.input.returnPressed.connect(self.find_next)
+        self.input.installEventFilter(self)
+        layout.addWidget(self.input)
+
+        self.case_button = self.add_toggle(layout, "Aa", "Match case")
+        self.word_button = self.add_toggle(layout, "W", "Whole word")
+        self.regex_button = self.add_toggle(layout, ".*", "Regular expression")
+
+        self.count_label = QLabel("No results")
+        self.count_label.setMinimumWidth(80)
+        layout.addWidget(self.count_label)
+
+        for text, tooltip, slot in (("↑", "Previous match (Shift+Enter)", self.find_previous),
+                                    ("↓", "Next match (Enter)", self.find_next),
+                                    ("✕", "Close (Esc)", self.close_bar)):
+            button = QToolButton()
+            button.setText(text)
+            button.setToolTip(tooltip)
+            button.clicked.connect(slot)
+            layout.addWidget(button)
+
+        # Строка замены, видна после Ctrl+H
+        self.replace_row = QWidget()
+        replace_layout = QHBoxLayout(self.replace_row)
+        replace_layout.setContentsMargins(0, 0, 0, 0)
+        replace_layout.setSpacing(2)
+        self.replace_input = QLineEdit()
+        self.replace_input.setPlaceholderText("Replace")
+        self.replace_input.setMinimumWidth(200)
+        self.replace_input.returnPressed.connect(self.replace_current)
+        self.replace_input.installEventFilter(self)
+        replace_layout.addWidget(self.replace_input)
+        for text, tooltip, slot in (("Replace", "Replace (Enter)", self.replace_current),
+                                    ("All", "Replace all", self.replace_all)):
+            button = QToolButton()
+            button.setText(text)
+            button.setToolTip(tooltip)
+            button.clicked.connect(slot)
+            replace_layout.addWidget(button)
+        replace_layout.addStretch()
+        rows.addWidget(self.replace_row)
+        self.replace_row.hide()
+
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
+        editor.document().contentsChanged.connect(self.document_changed)
+        editor.verticalScrollBar().valueChanged.connect(self.update_selections)
+        editor.horizontalScrollBar().valueChanged.connect(self.update_selections)
+        self.hide()
+
+    def add_toggle(self, layout, text, tooltip):
+        button = QToolButton()
+        button.setText(text)
+        button.setToolTip(tooltip)
+        button.setCheckable(True)
+        button.toggled.connect(self.schedule_search)
+        layout.addWidget(button)
+        return button
+
+    def open_bar(self, replace=False):
+        self.replace_row.setVisible(replace)
+        selected = self.editor.textCursor().selectedText()
+        if selected and ' ' not in selected:
+            self.input.setText(selected)
+        self.show()
+        self.reposition()
+        self.input.setFocus()
+        self.input.selectAll()
+        self.schedule_search()
+
+    def close_bar(self):
+        self.hide()
+        self.search_timer.stop()
+        self.engine.clear()
+        self.current = None
+        self.editor.search_selections = []
+        self.editor.refresh_extra_selections()
+        self.editor.setFocus()
+
+    def reposition(self):
+        self.adjustSize()
+        viewport = self.editor.viewport().geometry()
+        self.move(viewport.right() - self.width() - 16, viewport.top())
+
+    def eventFilter(self, obj, event):
+        if isinstance(obj, QLineEdit) and event.type() == event.Type.KeyPress:
+            if event.key() == Qt.Key.Key_Escape:
+                self.close_bar()
+                return True
+            if (obj is self.input and event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and
+                    event.modifiers() & Qt.KeyboardModifier.ShiftModifier):
+                self.find_previous()
+                return True
+        return super().eventFilter(obj, event)
+
+    def schedule_search(self):
+        if self.isVisible():
+            self.search_timer.start(self.DELAY)
+
+    def document_changed(self):
+        # Позиции совпадений устарели - ищем заново после паузы в наборе
+        if self.isVisible() and self.input.text():
+            self.search_timer.start(self.DELAY * 2)
+
+    def run_search(self):
+        pattern = self.input.text()
+        self.current = None
+        if not pattern:
+            self.engine.clear()
+            self.count_label.setText("No results")
+            self.update_selections()
+            return
+        try:
+            self.engine.search(pattern, self.regex_button.isChecked(),
+                               self.word_button.isChecked(), self.case_button.isChecked())
+        except re.error:
+            self.engine.clear()
+            self.count_label.setText("Invalid regex")
+            self.update_selections()
+            return
+
+        self.current = self.engine.next_after(self.editor.textCursor().selectionStart())
+        self.update_count()
+        self.update_selections()
+
+    def update_count(self):
+        count = self.engine.count()
+        if not count:
+            self.count_label.setText("No results")
+        elif self.current is None:
+            self.count_label.setText(f"{count} results")
+        else:
+            self.count_label.setText(f"{self.current + 1} of {count}")
+
+    def find_next(self):
+        self.step(self.engine.next_after(self.editor.textCursor().selectionEnd()))
+
+    def find_previous(self):
+        self.step(self.engine.previous_before(self.editor.textCursor().selectionStart()))
+
+    def step(self, index):
+        if self.search_timer.isActive() or self.engine.stale():
+            self.search_timer.stop()
+            self.run_search()
+            index = self.current
+        if index is None:
+            return
+        self.current = index
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(self.engine.starts[index])
+        cursor.setPosition(self.engine.ends[index], QTextCursor.MoveMode.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+        self.update_count()
+        self.update_selections()
+
+    def replace_current(self):
+        """Заменяет выделенное совпадение и переходит к следующему"""
+        if self.search_timer.isActive() or self.engine.stale():
+            self.search_timer.stop()
+            self.run_search()
+        cursor = self.editor.textCursor()
+        start = cursor.selectionStart()
+        if (self.current is not None and self.engine.starts[self.current] == start and
+                self.engine.ends[self.current] == cursor.selectionEnd()):
+            try:
+                edits = self.engine.replacements(self.replace_input.text(), start, start)
+            except (re.error, IndexError) as error:
+                self.count_label.setText(str(error))
+                return
+            apply_edits(self.editor.document(), edits[:1])
+            self.run_search()
+        self.find_next()
+
+    def replace_all(self):
+        if self.search_timer.isActive() or self.engine.stale():
+            self.search_timer.stop()
+            self.run_search()
+        try:
+            edits = self.engine.replacements(self.replace_input.text())
+        except (re.error, IndexError) as error:
+            self.count_label.setText(str(error))
+            return
+        count = self.engine.count()
+        apply_edits(self.editor.document(), edits)
+        self.run_search()
+        self.count_label.setText(f"Replaced {count}")
+
+    def visible_range(self):
+        """Позиции документа видимой области с запасом MARGIN_SCREENS экранов"""
+        editor = self.editor
+        viewport = editor.viewport()
+        height = viewport.height()
+        top = editor.cursorForPosition(viewport.rect().topLeft()).block()
+        bottom = editor.cursorForPosition(viewport.rect().bottomRight()).block()
+        line_height = max(1, editor.fontMetrics().height())
+        margin = self.MARGIN_SCREENS * (height // line_height + 1)
+
+        document = editor.document()
+        first = document.findBlockByNumber(max(0, top.blockNumber() - margin))
+        last = document.findBlockByNumber(min(document.blockCount() - 1,
+                                              bottom.blockNumber() + margin))
+        return first.position(), last.position() + last.length()
+
+    def update_selections(self):
+        if self.engine.stale() and self.engine.count():
+            # Позиции устарели; поиск уже запланирован document_changed
+            return
+        selections = []
+        if self.isVisible() and self.engine.count():
+            first, last = self.visible_range()
+            document = self.editor.document()
+            for index in self.engine.in_range(first, last):
+                selection = QTextEdit.ExtraSelection()
+                selection.format = self.current_format if index == self.current else self.match_format
+                cursor = QTextCursor(document)
+                cursor.setPosition(self.engine.starts[index])
+                cursor.setPosition(self.engine.ends[index], QTextCursor.MoveMode.KeepAnchor)
+                selection.cursor = cursor
+                selections.append(selection)
+        if selections or self.editor.search_selections:
+            self.editor.search_selections = selections
+            self.editor.refresh_extra_selections()
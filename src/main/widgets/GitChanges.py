@@ -0,0 +1,247 @@
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from difflib import SequenceMatcher
+import threading
+import os
+
+from git import Repo
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+
+# Ханк - [начало, конец) строк буфера и [начало, конец) строк в HEAD,
+# которые им заменены; строки вне ханков совпадают со строками HEAD
+
+def diff_hunks(old, new, old_offset=0, new_offset=0):
+    """Ханки между строками old (HEAD) и new (буфер). Общие начало и
+    конец отрезаются сразу, так что одна правка в большом файле
+    сравнивает только изменённую середину."""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    old = old[prefix:len(old) - suffix]
+    new = new[prefix:len(new) - suffix]
+    old_offset += prefix
+    new_offset += prefix
+    if not old or not new:
+        if not old and not new:
+            return []
+        return [[new_offset, new_offset + len(new), old_offset, old_offset + len(old)]]
+    return [[new_offset + j1, new_offset + j2, old_offset + i1, old_offset + i2]
+            for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new).get_opcodes()
+            if tag != 'equal']
+
+class LineDiff:
+    """Построчный diff буфера с HEAD, который правки обновляют по месту.
+
+    Правка строк буфера сравнивает заново только свой участок вместе с
+    ханками, которых она касается; строки HEAD для участка берутся через
+    сдвиг соседних неизменённых строк, а ханки ниже просто сдвигаются.
+    """
+    def __init__(self, head, hunks):
+        self.head = head
+        self.hunks = hunks
+
+    def offset(self, index):
+        """Сдвиг номеров HEAD относительно буфера перед ханком index"""
+        if index == 0:
+            return 0
+        hunk = self.hunks[index - 1]
+        return hunk[3] - hunk[1]
+
+    def edit(self, first, old_last, last, lines):
+        """Строки буфера first..old_last заменились строками first..last;
+        lines(start, end) - текущие строки буфера [start, end)"""
+        hunks = self.hunks
+        low, high = first, old_last + 1
+        start = 0
+        while start < len(hunks) and hunks[start][1] < low:
+            start += 1
+        end = start
+        while end < len(hunks) and hunks[end][0] <= high:
+            low = min(low, hunks[end][0])
+            high = max(high, hunks[end][1])
+            end += 1
+        old_low = low + self.offset(start)
+        old_high = high + self.offset(end)
+
+        shift = last - old_last
+        for hunk in hunks[end:]:
+            hunk[0] += shift
+            hunk[1] += shift
+        hunks[start:end] = diff_hunks(self.head[old_low:old_high], lines(low, high + shift),
+                                      old_low, low)
+
+    def markers(self):
+        """{номер строки: 'added' | 'modified' | 'deleted'}; удалённые
+        строки отмечаются на строке перед ними"""
+        markers = {}
+        for new_start, new_end, old_start, old_end in self.hunks:
+            if new_start == new_end:
+                markers.setdefault(max(new_start - 1, 0), 'deleted')
+                continue
+            kind = 'added' if old_start == old_end else 'modified'
+            for number in range(new_start, new_end):
+                markers[number] = kind
+        return markers
+
+_lock = threading.Lock()
+_repositories = {}
+_blobs = {}
+
+def head_lines(path):
+    """(sha коммита HEAD, строки файла в HEAD) или (None, None), если файл
+    не в репозитории или не закоммичен. Тексты кэшируются по пути, пока
+    HEAD не сдвинется."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with _lock:
+        if directory not in _repositories:
+            try:
+                _repositories[directory] = Repo(directory, search_parent_directories=True)
+            except (InvalidGitRepositoryError, NoSuchPathError):
+                _repositories[directory] = None
+        repo = _repositories[directory]
+        if repo is None or repo.working_tree_dir is None:
+            return None, None
+        try:
+            sha = repo.head.commit.hexsha
+        except ValueError:
+            # Ещё нет ни одного коммита
+            return None, None
+        cached = _blobs.get(path)
+        if cached is not None and cached[0] == sha:
+            return cached
+        relative = os.path.relpath(os.path.abspath(path), repo.working_tree_dir)
+        try:
+            blob = repo.head.commit.tree / relative.replace(os.sep, '/')
+            data = blob.data_stream.read()
+        except KeyError:
+            return None, None
+        lines = data.decode('utf-8', 'replace').replace('\r\n', '\n').split('\n')
+        _blobs[path] = (sha, lines)
+        return sha, lines
+
+class ChangesWorker(QThread):
+    """Полный diff снимка буфера с HEAD; Qt-объекты документа не трогает"""
+    # sha HEAD (None - файл не в HEAD), строки HEAD, ханки
+    diffed = pyqtSignal(object, object, object)
+
+    def __init__(self, path, text):
+        super().__init__()
+        self.path = path
+        self.text = text
+
+    def run(self):
+        sha, head = head_lines(self.path)
+        hunks = diff_hunks(head, self.text.split('\n')) if head is not None else None
+        self.diffed.emit(sha, head, hunks)
+
+class LineChanges(QObject):
+    """Изменения строк открытого файла относительно HEAD.
+
+    Полный diff (открытие файла, новый HEAD, крупные замены) считается в
+    фоне; обычная правка обновляет LineDiff сразу, сравнивая только
+    затронутый участок, так что метки успевают к следующему кадру. Правки,
+    пришедшие во время полного diff, копятся одним участком и
+    применяются к его результату.
+    """
+    changes_changed = pyqtSignal()
+
+    # Правка больше стольких строк пересчитывается полным diff в фоне
+    FULL_DIFF_LINES = 5000
+
+    # Работающие потоки всех редакторов: поток не должен быть удалён
+    # вместе с закрытым редактором, пока не доработает
+    running = set()
+
+    def __init__(self, document, path):
+        super().__init__()
+        self.document = document
+        self.path = path
+        self.diff = None
+        self.markers = {}
+        self.count = document.blockCount()
+        self.worker = None
+        # Правки во время полного diff: [первая, последняя в снимке, последняя сейчас]
+        self.pending = None
+        # Снимок текущего полного diff устарел целиком (новый HEAD)
+        self.stale = False
+        document.contentsChange.connect(self.document_changed)
+
+    def lines(self, start, end):
+        lines = []
+        block = self.document.findBlockByNumber(start)
+        while block.isValid() and len(lines) < end - start:
+            lines.append(block.text())
+            block = block.next()
+        return lines
+
+    def document_changed(self, position, removed, added):
+        document = self.document
+        first = document.findBlock(position).blockNumber()
+        end = document.findBlock(position + added)
+        last = end.blockNumber() if end.isValid() else document.blockCount() - 1
+        old_last = last - (document.blockCount() - self.count)
+        self.count = document.blockCount()
+
+        if self.worker is not None:
+            self.add_pending(first, old_last, last)
+        elif self.diff is None:
+            # Файла нет в HEAD или он ещё не сравнивался (см. refresh)
+            return
+        elif max(last, old_last) - first > self.FULL_DIFF_LINES:
+            self.refresh()
+        else:
+            self.diff.edit(first, old_last, last, self.lines)
+            self.publish()
+
+    def add_pending(self, first, old_last, last):
+        if self.pending is None:
+            self.pending = [first, old_last, last]
+            return
+        low, snapshot_last, current_last = self.pending
+        shift = last - old_last
+        if old_last > current_last:
+            snapshot_last += old_last - current_last
+        current_last = current_last + shift if current_last > old_last else last
+        self.pending = [min(low, first), snapshot_last, current_last]
+
+    def refresh(self):
+        """Полный diff с текущим HEAD (после коммита, переключения ветки)"""
+        if self.worker is not None:
+            # Дождёмся текущего diff, потом возьмём свежий снимок
+            self.stale = True
+            return
+        self.pending = None
+        self.stale = False
+        worker = ChangesWorker(self.path, self.document.toPlainText())
+        worker.diffed.connect(self.accept_diff)
+        worker.finished.connect(self.worker_finished)
+        worker.finished.connect(lambda: LineChanges.running.discard(worker))
+        LineChanges.running.add(worker)
+        self.worker = worker
+        worker.start()
+
+    def worker_finished(self):
+        self.worker = None
+        if self.stale:
+            self.refresh()
+
+    def accept_diff(self, sha, head, hunks):
+        if self.stale:
+            return
+        self.diff = LineDiff(head, hunks) if head is not None else None
+        pending, self.pending = self.pending, None
+        if pending is not None and self.diff is not None:
+            first, snapshot_last, current_last = pending
+            if max(snapshot_last, current_last) - first > self.FULL_DIFF_LINES:
+                self.stale = True
+                return
+            self.diff.edit(first, snapshot_last, current_last, self.lines)
+        self.publish()
+
+    def publish(self):
+        self.markers = self.diff.markers() if self.diff is not None else {}
+        self.changes_changed.emit()
@@ -0,0 +1,267 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import Qt, QSize, QPoint
+from PyQt6.QtGui import QPainter, QPixmap, QColor
+
+BACKGROUND = "#2F2F2F"
+FOREGROUND = "#7F7F7F"
+
+class GutterLayer:
+    """Колонка поля слева от текста.
+
+    prepare() вызывается один раз за отрисовку и берёт данные у
+    редактора; marker(номер блока) - состояние строки в этом слое:
+    строка перерисовывается, только если состояние какого-то слоя
+    изменилось. paint рисует строку в колонке слоя.
+    """
+    def __init__(self, editor):
+        self.editor = editor
+
+    def width(self):
+        return 0
+
+    def prepare(self):
+        pass
+
+    def marker(self, number):
+        return None
+
+    def paint(self, painter, x, top, height, number, marker):
+        pass
+
+    def clicked(self, number):
+        pass
+
+class DiagnosticsLayer(GutterLayer):
+    """Полоса важности диагностики строки (см. CodeEditor.diagnostic_markers)"""
+    WIDTH = 3
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.markers = {}
+        self.key = None
+
+    def width(self):
+        return self.WIDTH
+
+    def prepare(self):
+        # Курсоры выделений сдвигаются правками - пересчёт при новой
+        # диагностике или новой ревизии документа, а не на каждой отрисовке
+        selections = self.editor.diagnostic_selections
+        key = (id(selections), self.editor.document().revision())
+        if key != self.key:
+            self.key = key
+            self.markers = self.editor.diagnostic_markers() if selections else {}
+
+    def marker(self, number):
+        return self.markers.get(number)
+
+    def paint(self, painter, x, top, height, number, marker):
+        if marker is not None:
+            painter.fillRect(x, top, self.WIDTH, height, QColor(self.editor.DIAGNOSTIC_COLORS[marker]))
+
+class ChangesLayer(GutterLayer):
+    """Изменения строки относительно HEAD: editor.line_changes
+    {номер блока: 'added' | 'modified' | 'deleted'}"""
+    WIDTH = 3
+    COLORS = {'added': "#587c0c", 'modified': "#0c7d9d", 'deleted': "#94151b"}
+
+    def width(self):
+        return self.WIDTH
+
+    def marker(self, number):
+        return self.editor.line_changes.get(number)
+
+    def paint(self, painter, x, top, height, number, marker):
+        if marker == 'deleted':
+            # Удалённые после этой строки - треугольник у её нижнего края
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(self.COLORS[marker]))
+            painter.drawPolygon([QPoint(x, top + height - 6), QPoint(x + self.WIDTH, top + height - 3),
+                                 QPoint(x, top + height)])
+        elif marker is not None:
+            painter.fillRect(x, top, self.WIDTH, height, QColor(self.COLORS[marker]))
+
+class LineNumbersLayer(GutterLayer):
+    """Номера строк из заранее нарисованных цифр"""
+    PADDING = 8
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.glyphs = []
+        self.glyph_key = None
+        self.advance = 0
+        self.column = 0
+
+    def width(self):
+        digits = len(str(self.editor.blockCount()))
+        return self.PADDING + self.editor.fontMetrics().horizontalAdvance('5') * digits
+
+    def prepare(self):
+        self.column = self.width()
+        # Цифры рисуются один раз на шрифт и масштаб экрана
+        ratio = self.editor.devicePixelRatioF()
+        font = self.editor.font()
+        key = (font.toString(), ratio)
+        if key == self.glyph_key:
+            return
+        self.glyph_key = key
+        metrics = self.editor.fontMetrics()
+        self.advance = metrics.horizontalAdvance('5')
+        self.glyphs = []
+        for digit in "0123456789":
+            glyph = QPixmap(round(self.advance * ratio), round(metrics.height() * ratio))
+            glyph.setDevicePixelRatio(ratio)
+            glyph.fill(Qt.GlobalColor.transparent)
+            painter = QPainter(glyph)
+            painter.setFont(font)
+            painter.setPen(QColor(FOREGROUND))
+            painter.drawText(0, metrics.ascent(), digit)
+            painter.end()
+            self.glyphs.append(glyph)
+
+    def paint(self, painter, x, top, height, number, marker):
+        right = x + self.column - self.PADDING // 2
+        for digit in reversed(str(number + 1)):
+            right -= self.advance
+            painter.drawPixmap(right, top, self.glyphs[ord(digit) - 48])
+
+class FoldLayer(GutterLayer):
+    """Метки сворачивания блоков скобок (см. BraceIndex)"""
+    WIDTH = 12
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.ranges = {}
+
+    def width(self):
+        return self.WIDTH
+
+    def prepare(self):
+        if self.editor.loading():
+            # Индекс скобок соберётся из готовых токенов после загрузки
+            self.ranges = {}
+            return
+        self.ranges = self.editor.braces.fold_ranges(self.editor.block_braces)
+
+    def marker(self, number):
+        if number not in self.ranges:
+            return None
+        return 'folded' if number in self.editor.braces.folded else 'open'
+
+    def paint(self, painter, x, top, height, number, marker):
+        if marker is not None:
+            painter.setPen(QColor(FOREGROUND))
+            painter.drawText(x, top, self.WIDTH, height, Qt.AlignmentFlag.AlignCenter,
+                             "▸" if marker == 'folded' else "▾")
+
+    def clicked(self, number):
+        self.editor.toggle_fold(number)
+
+class Gutter(QWidget):
+    """Поле слева от текста редактора: слои диагностики, изменений,
+    номеров строк и сворачивания.
+
+    Строки рисуются в запасной pixmap; для каждой запоминается состояние
+    её слоёв, и при отрисовке перерисовываются только строки, у которых
+    оно изменилось (или новые). Прокрутка сдвигает уже нарисованное
+    (scroll_rows), так что рисовать приходится только открывшиеся строки.
+    """
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.layers = [DiagnosticsLayer(editor), ChangesLayer(editor),
+                       LineNumbersLayer(editor), FoldLayer(editor)]
+        self.backing = None
+        # верх строки в pixmap -> состояние, с которым она нарисована
+        self.rows = {}
+
+    def total_width(self):
+        return sum(layer.width() for layer in self.layers)
+
+    def sizeHint(self):
+        return QSize(self.total_width(), 0)
+
+    def scroll_rows(self, dy):
+        """Содержимое редактора прокрутилось на dy пикселей"""
+        if self.backing is not None:
+            ratio = self.backing.devicePixelRatio()
+            self.backing.scroll(0, round(dy * ratio), self.backing.rect())
+            self.rows = {top + dy: key for top, key in self.rows.items()}
+        self.update()
+
+    def visible_rows(self):
+        """[(верх, высота, номер блока), ...] видимых строк"""
+        editor = self.editor
+        block = editor.firstVisibleBlock()
+        top = round(editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top())
+        height = self.height()
+        folded = editor.braces.folded
+        rows = []
+        while block.isValid() and top < height:
+            number = block.blockNumber()
+            bottom = top + round(editor.blockBoundingRect(block).height())
+            if block.isVisible():
+                rows.append((top, bottom - top, number))
+            top = bottom
+            following = block.next()
+            if number in folded and following.isValid() and not following.isVisible():
+                # Скрытые строки не имеют высоты - сразу к закрывающей скобке
+                end = editor.braces.fold_ranges(editor.block_braces).get(number)
+                if end is not None:
+                    following = editor.document().findBlockByNumber(end)
+            block = following
+        return rows
+
+    def paintEvent(self, event):
+        ratio = self.devicePixelRatioF()
+        size = self.size() * ratio
+        if self.backing is None or self.backing.size() != size or self.backing.devicePixelRatio() != ratio:
+            self.backing = QPixmap(size)
+            self.backing.setDevicePixelRatio(ratio)
+            self.backing.fill(QColor(BACKGROUND))
+            self.rows = {}
+
+        layers = self.layers
+        for layer in layers:
+            layer.prepare()
+        widths = [layer.width() for layer in layers]
+        width = self.width()
+        background = QColor(BACKGROUND)
+
+        painter = QPainter(self.backing)
+        drawn = {}
+        covered = 0
+        for top, height, number in self.visible_rows():
+            if top > covered:
+                drawn[covered] = ('gap', top - covered)
+            markers = tuple(layer.marker(number) for layer in layers)
+            drawn[top] = (number, height, markers)
+            covered = top + height
+        if covered < self.height():
+            drawn[covered] = ('gap', self.height() - covered)
+
+        for top, key in drawn.items():
+            if self.rows.get(top) == key:
+                continue
+            height = key[1]
+            painter.fillRect(0, top, width, height, background)
+            if key[0] == 'gap':
+                continue
+            number, _, markers = key
+            x = 0
+            for layer, layer_width, marker in zip(layers, widths, markers):
+                layer.paint(painter, x, top, height, number, marker)
+                x += layer_width
+        painter.end()
+        self.rows = drawn
+
+        QPainter(self).drawPixmap(0, 0, self.backing)
+
+    def mousePressEvent(self, event):
+        block = self.editor.cursorForPosition(QPoint(0, int(event.position().y()))).block()
+        x = 0
+        for layer in self.layers:
+            x += layer.width()
+            if event.position().x() < x:
+                layer.clicked(block.blockNumber())
+                return
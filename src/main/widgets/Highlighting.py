@@ -0,0 +1,146 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from collections import OrderedDict
+import threading
+import queue
+import sys
+
+class TokenCache:
+    """Общий для всех редакторов LRU-кэш токенов строк.
+
+    Ключ - (язык, входное состояние, текст строки), значение - готовые
+    (spans, end_state). Одинаковые строки (скобки, импорты, шаблонный код)
+    лексируются один раз на процесс. Объём ограничен max_bytes; доступ
+    защищён блокировкой, так как кэшем пользуется и TokenizeWorker.
+    """
+    _instance = None
+
+    # Примерная цена одного span'а и служебных структур записи, байт
+    SPAN_COST = 72
+    ENTRY_COST = 160
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def tokenize(self, language, lex, text, state):
+        key = (language, state, text)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        spans, end_state = lex(text, state)
+        result = (tuple(spans), end_state)
+        cost = sys.getsizeof(text) + self.ENTRY_COST + self.SPAN_COST * len(spans)
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = result
+                self.size += cost
+                while self.size > self.max_bytes and self.entries:
+                    (_, _, old_text), (old_spans, _) = self.entries.popitem(last=False)
+                    self.size -= (sys.getsizeof(old_text) + self.ENTRY_COST +
+                                  self.SPAN_COST * len(old_spans))
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+class TokenizeWorker(QThread):
+    """Фоновая токенизация документа: сначала видимые строки, затем весь текст.
+
+    Работает только с функцией tokenize(text, state) и списком строк, Qt-объекты
+    документа из потока не трогает. Результаты уходят в GUI-поток пачками.
+    """
+    # generation, номер первой строки, [(text, state, spans, end_state), ...]
+    results_ready = pyqtSignal(int, int, list)
+    tokenized = pyqtSignal(int)
+
+    CHUNK = 2000
+
+    def __init__(self, tokenize, lines, generation):
+        super().__init__()
+        self.tokenize = tokenize
+        self.lines = lines
+        self.generation = generation
+        self.priority = queue.SimpleQueue()
+        self.position = 0
+        self.cancelled = False
+
+    def prioritize(self, first, last):
+        """Просит обработать строки first..last раньше остальных"""
+        self.priority.put((first, last))
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        state = 0
+        count = len(self.lines)
+
+        while self.position < count:
+            self.run_priority()
+            if self.cancelled:
+                return
+
+            first = self.position
+            last = min(first + self.CHUNK, count)
+            batch = []
+            for text in self.lines[first:last]:
+                spans, end_state = self.tokenize(text, state)
+                batch.append((text, state, spans, end_state))
+                state = end_state
+            self.position = last
+            self.results_ready.emit(self.generation, first, batch)
+
+        self.tokenized.emit(self.generation)
+
+    def run_priority(self):
+        while not self.cancelled:
+            try:
+                first, last = self.priority.get_nowait()
+            except queue.Empty:
+                return
+
+            # Уже пройденные строки посчитаны с точным состоянием
+            first = max(first, self.position)
+            last = min(last, len(self.lines))
+            if first >= last:
+                continue
+
+            # Состояние на входе в видимую область ещё неизвестно - берём
+            # обычное, последовательный проход потом его уточнит
+            state = 0
+            batch = []
+            for text in self.lines[first:last]:
+                spans, end_state = self.tokenize(text, state)
+                batch.append((text, state, spans, end_state))
+                state = end_state
+            self.results_ready.emit(self.generation, first, batch)
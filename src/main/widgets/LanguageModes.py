@@ -0,0 +1,49 @@
+import os
+
+class LanguageMode:
+    """Языковой режим редактора: подсветка, сниппеты, словарь автодополнения
+    и маркер строчного комментария.
+
+    Режим хранит только классы, поэтому регистрация ничего не стоит:
+    грамматика компилируется при создании первого подсветчика этого языка
+    (см. widgets.Lexer.get_lexer) и дальше переиспользуется всем процессом.
+    """
+    def __init__(self, name, extensions, highlighter=None, snippets=None,
+                 keywords=(), comment=None):
+        self.name = name
+        self.extensions = [extension.lower() for extension in extensions]
+        self.highlighter = highlighter
+        self.snippets = snippets
+        self.keywords = list(keywords)
+        self.comment = comment
+
+    def create_highlighter(self, document):
+        if self.highlighter is None:
+            return None
+        return self.highlighter(document)
+
+    def create_snippets(self):
+        if self.snippets is None:
+            return None
+        return self.snippets()
+
+_modes = {}
+_by_extension = {}
+
+def register_mode(mode):
+    _modes[mode.name] = mode
+    for extension in mode.extensions:
+        _by_extension[extension] = mode
+
+def get_mode(name):
+    return _modes[name]
+
+def mode_for_path(file_path, default='ryton'):
+    """Режим для файла по расширению; новые безымянные файлы - Ryton"""
+    if not file_path:
+        return _modes[default]
+    extension = os.path.splitext(file_path)[1].lower()
+    return _by_extension.get(extension, _modes['plain'])
+
+# Обычный текст: без подсветки, сниппетов и комментариев
+register_mode(LanguageMode('plain', []))
@@ -0,0 +1,164 @@
+import re
+
+# Описания языков. Грамматика компилируется в Lexer при первом обращении.
+RYTON = {
+    'keywords': ['init', 'infinit', 'repeat', 'void', 'func', 'pack', 'if',
+                 'else', 'elif', 'while', 'for', 'in', 'return', 'true',
+                 'false', 'none', 'noop', 'private'],
+    'phrases': ['module import'],
+    'builtins': ['debug', 'error', 'or', 'not', 'and', 'print', 'input',
+                 'Main', 'Sub', 'this'],
+    'types': [],
+    'line_comment': '//',
+    # (открытие, закрытие, вид токена) - конструкции, которые могут
+    # продолжаться на следующих строках
+    'multiline': [('</', '/>', 'comment'),
+                  ('"""', '"""', 'string'),
+                  ("'''", "'''", 'string')],
+    # ключевое слово -> вид определения для следующего за ним имени
+    'definitions': {'func': 'function', 'pack': 'pack'},
+}
+
+ZIG = {
+    'keywords': ['const', 'var', 'extern', 'packed', 'export', 'pub', 'noalias',
+                 'inline', 'comptime', 'nakedcc', 'stdcallcc', 'volatile', 'align',
+                 'linksection', 'struct', 'enum', 'union', 'break', 'return',
+                 'continue', 'asm', 'defer', 'errdefer', 'unreachable', 'try', 'catch',
+                 'async', 'await', 'suspend', 'resume', 'cancel', 'if', 'else', 'switch',
+                 'and', 'or', 'orelse', 'while', 'for', 'fn', 'usingnamespace', 'test'],
+    'phrases': [],
+    'builtins': [],
+    'types': ['bool', 'f16', 'f32', 'f64', 'f128', 'void', 'noreturn', 'type',
+              'anyerror', 'promise', 'i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64',
+              'u64', 'i128', 'u128', 'isize', 'usize', 'c_short', 'c_ushort',
+              'c_int', 'c_uint', 'c_long', 'c_ulong', 'c_longlong', 'c_ulonglong',
+              'c_longdouble', 'c_void'],
+    'line_comment': '//',
+    'multiline': [('/*', '*/', 'comment')],
+    'definitions': {'fn': 'function', 'const': 'variable', 'var': 'variable'},
+}
+
+LANGUAGES = {
+    'ryton': RYTON,
+    'zig': ZIG,
+}
+
+BRACE_PAIRS = {'(': ')', '[': ']', '{': '}'}
+CLOSING_BRACES = {closing: opening for opening, closing in BRACE_PAIRS.items()}
+
+_lexers = {}
+
+def get_lexer(language):
+    """Возвращает лексер языка, компилируя грамматику при первом запросе"""
+    lexer = _lexers.get(language)
+    if lexer is None:
+        lexer = _lexers[language] = Lexer(LANGUAGES[language])
+    return lexer
+
+class Lexer:
+    """Однопроходный лексер на основе одного мастер-шаблона.
+
+    lex(text, state) разбирает одну строку (блок документа) и возвращает
+    список токенов (start, length, kind) и состояние конца строки:
+    0 - обычный текст, N > 0 - внутри N-й многострочной конструкции.
+    Виды токенов: keyword, builtin, type, identifier, number, string,
+    comment, brace, operator.
+    """
+    NORMAL = 0
+
+    def __init__(self, spec):
+        self.words = {}
+        for kind, key in (('keyword', 'keywords'), ('builtin', 'builtins'), ('type', 'types')):
+            for word in spec[key]:
+                self.words.setdefault(word, kind)
+        self.defining = spec['definitions']
+        self.multiline = spec['multiline']
+
+        parts = []
+        if spec['phrases']:
+            phrases = '|'.join(r'\b' + r'\s+'.join(map(re.escape, phrase.split())) + r'\b'
+                               for phrase in spec['phrases'])
+            parts.append(f'(?P<phrase>{phrases})')
+        parts.append(f"(?P<comment>{re.escape(spec['line_comment'])}.*)")
+        # Многострочные открытия идут раньше строк и операторов:
+        # '\"\"\"' не должно разбиваться на две строки, '</' - на операторы
+        for index, (opening, _, _) in enumerate(self.multiline):
+            parts.append(f'(?P<ml{index}>{re.escape(opening)})')
+        parts.append(r'''(?P<string>"[^"\\]*(?:\\.[^"\\]*)*"|'[^'\\]*(?:\\.[^'\\]*)*')''')
+        parts.append(r'(?P<number>\b\d+(?:\.\d+)?\b)')
+        parts.append(r'(?P<word>[^\W\d]\w*)')
+        parts.append(r'(?P<brace>[{}()\[\]])')
+        parts.append(r'(?P<operator>==|!=|<=|>=|->|[^\s\w])')
+
+        self.pattern = re.compile('|'.join(parts))
+        self.closers = [re.compile(re.escape(closing)) for _, closing, _ in self.multiline]
+
+    def lex(self, text, state):
+        tokens = []
+        pos = 0
+
+        # Продолжаем конструкцию, открытую в предыдущих строках
+        if state != self.NORMAL:
+            kind = self.multiline[state - 1][2]
+            closing = self.closers[state - 1].search(text)
+            if not closing:
+                if text:
+                    tokens.append((0, len(text), kind))
+                return tokens, state
+            tokens.append((0, closing.end(), kind))
+            pos = closing.end()
+
+        search = self.pattern.search
+        words = self.words
+        match = search(text, pos)
+        while match:
+            group = match.lastgroup
+            start = match.start()
+            end = match.end()
+
+            if group == 'word':
+                kind = words.get(match.group(), 'identifier')
+            elif group == 'phrase':
+                kind = 'keyword'
+            elif group[0] == 'm' and group[1] == 'l':
+                index = int(group[2:])
+                kind = self.multiline[index][2]
+                closing = self.closers[index].search(text, end)
+                if not closing:
+                    tokens.append((start, len(text) - start, kind))
+                    return tokens, index + 1
+                end = closing.end()
+            else:
+                kind = group
+
+            tokens.append((start, end - start, kind))
+            match = search(text, end)
+
+        return tokens, self.NORMAL
+
+    def definitions(self, tokens, text):
+        """Находит определения в строке: [(name, kind, column), ...]
+
+        Имя после определяющего ключевого слова (func, pack, fn, ...) и имя
+        слева от одиночного '=' считаются определениями.
+        """
+        result = []
+        count = len(tokens)
+        for index, (start, length, kind) in enumerate(tokens):
+            if kind != 'identifier':
+                continue
+            name = text[start:start + length]
+
+            if index > 0:
+                prev_start, prev_length, prev_kind = tokens[index - 1]
+                if prev_kind == 'keyword':
+                    defined = self.defining.get(text[prev_start:prev_start + prev_length])
+                    if defined:
+                        result.append((name, defined, start))
+                        continue
+
+            if index + 1 < count:
+                next_start, next_length, next_kind = tokens[index + 1]
+                if next_kind == 'operator' and text[next_start:next_start + next_length] == '=':
+                    result.append((name, 'variable', start))
+        return result
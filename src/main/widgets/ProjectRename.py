@@ -0,0 +1,192 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem,
+                             QDialogButtonBox, QMessageBox)
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
+
+from concurrent.futures.process import BrokenProcessPool
+import shutil
+import os
+
+from widgets.SymbolIndex import ProjectSymbolIndex, scan_sources, rename_in_file, rename_in_files
+from widgets.ProjectSearch import get_executor
+from widgets.FindBar import apply_edits
+
+# Сколько строк-совпадений показывать в предпросмотре для одного файла
+PREVIEW_LINES = 200
+
+def write_batch(changes):
+    """Записывает [(path, mtime, text), ...] одной пачкой.
+
+    Сначала все новые тексты пишутся во временные файлы рядом с
+    исходными; если хоть один файл изменился после расчёта или запись
+    не удалась, временные файлы удаляются и на диске ничего не меняется
+    (OSError). Затем файлы подменяются через os.replace.
+    """
+    written = []
+    try:
+        for path, mtime, text in changes:
+            if os.stat(path).st_mtime != mtime:
+                raise OSError(f"{path} изменён после расчёта переименования")
+            temporary = f"{path}.rename-tmp"
+            with open(temporary, 'w', encoding='utf-8', errors='surrogateescape', newline='') as f:
+                f.write(text)
+            written.append((temporary, path))
+            shutil.copymode(path, temporary)
+    except OSError:
+        for temporary, _ in written:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+        raise
+    for temporary, path in written:
+        os.replace(temporary, path)
+
+class RenameWorker(QThread):
+    """Считает переименование для файлов на диске в пуле процессов"""
+    # [(path, mtime, [(line, column, text), ...], новый текст), ...]
+    computed = pyqtSignal(list)
+
+    CHUNK = 16
+
+    def __init__(self, paths, old_name, new_name):
+        super().__init__()
+        self.paths = paths
+        self.old_name = old_name
+        self.new_name = new_name
+
+    def run(self):
+        paths = self.paths
+        try:
+            executor = get_executor()
+            futures = [executor.submit(rename_in_files, paths[start:start + self.CHUNK],
+                                       self.old_name, self.new_name)
+                       for start in range(0, len(paths), self.CHUNK)]
+            results = [result for future in futures for result in future.result()]
+        except (OSError, BrokenProcessPool):
+            results = [rename_in_file(path, self.old_name, self.new_name) for path in paths]
+        self.computed.emit([result for result in results if result[2]])
+
+class RenamePreviewDialog(QDialog):
+    """Предпросмотр переименования: файлы с флажками и строки с совпадениями"""
+    def __init__(self, root, old_name, new_name, files, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Переименовать {old_name} → {new_name}")
+        self.resize(700, 500)
+        layout = QVBoxLayout(self)
+
+        total = sum(len(occurrences) for _, occurrences in files)
+        layout.addWidget(QLabel(f"{total} вхождений в {len(files)} файлах"))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.items = {}
+        for path, occurrences in files:
+            item = QTreeWidgetItem([f"{os.path.relpath(path, root)} ({len(occurrences)})"])
+            item.setCheckState(0, Qt.CheckState.Checked)
+            item.setToolTip(0, path)
+            for line, column, text in occurrences[:PREVIEW_LINES]:
+                item.addChild(QTreeWidgetItem([f"{line + 1}: {text.strip()}"]))
+            self.tree.addTopLevelItem(item)
+            self.items[path] = item
+        if len(files) == 1:
+            self.tree.expandAll()
+        layout.addWidget(self.tree)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok |
+                                   QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def selected(self):
+        return {path for path, item in self.items.items()
+                if item.checkState(0) == Qt.CheckState.Checked}
+
+class ProjectRename(QObject):
+    """Переименование имени во всём проекте.
+
+    Файлы-кандидаты берутся из индекса символов (все, где имя встречается
+    как идентификатор), без индекса - все исходники проекта. Открытые во
+    вкладках файлы правятся прямо в документе (apply_edits, одна отмена),
+    остальные считаются в пуле процессов и пишутся одной пачкой
+    (write_batch) после подтверждения в предпросмотре.
+    """
+    finished = pyqtSignal(str)
+
+    def __init__(self, editor, old_name, new_name):
+        super().__init__()
+        self.editor = editor
+        self.window = editor.window()
+        self.old_name = old_name
+        self.new_name = new_name
+        self.worker = None
+        # Открытые файлы: {путь: вхождения для предпросмотра}
+        self.buffers = {}
+
+        index = ProjectSymbolIndex.instance()
+        self.root = index.project_path if index is not None else os.path.dirname(editor.file_path)
+
+    def open_editors(self):
+        if hasattr(self.window, 'open_editors'):
+            return self.window.open_editors()
+        return {self.editor.file_path: self.editor}
+
+    def start(self):
+        index = ProjectSymbolIndex.instance()
+        if index is not None:
+            paths = {path for path, _, _ in index.references(self.old_name)}
+            paths.update(path for path, _, _, _ in index.definitions(self.old_name))
+        else:
+            paths = set(scan_sources(self.root))
+
+        # Открытые файлы - по тексту в редакторе, он может быть не сохранён.
+        # Правки считаются заново в preview: пока идёт расчёт, текст ещё
+        # правится, а вкладку могут закрыть или выгрузить
+        for path, editor in self.open_editors().items():
+            _, occurrences = editor.refactoring.rename_edits(self.old_name, self.new_name)
+            if occurrences:
+                self.buffers[path] = occurrences
+            paths.discard(path)
+
+        self.worker = RenameWorker(sorted(paths), self.old_name, self.new_name)
+        self.worker.computed.connect(self.preview)
+        self.worker.start()
+
+    def preview(self, results):
+        files = list(self.buffers.items())
+        files += [(path, occurrences) for path, _, occurrences, _ in results]
+        if not files:
+            self.finished.emit(f"'{self.old_name}' не найден")
+            return
+
+        dialog = RenamePreviewDialog(self.root, self.old_name, self.new_name, files, self.window)
+        if not dialog.exec():
+            self.finished.emit("")
+            return
+        selected = dialog.selected()
+
+        editors = self.open_editors()
+        changes = [(path, mtime, text) for path, mtime, _, text in results if path in selected]
+        for path in self.buffers:
+            if path in selected and path not in editors:
+                # Вкладка закрыта, пока шёл расчёт, - файл правится на диске
+                _, mtime, occurrences, text = rename_in_file(path, self.old_name, self.new_name)
+                if occurrences:
+                    changes.append((path, mtime, text))
+        try:
+            write_batch(changes)
+        except OSError as error:
+            QMessageBox.warning(self.window, "Переименование", f"Файлы не изменены: {error}")
+            self.finished.emit("")
+            return
+        for path in self.buffers:
+            if path in selected and path in editors:
+                editor = editors[path]
+                edits, _ = editor.refactoring.rename_edits(self.old_name, self.new_name)
+                apply_edits(editor.document(), edits)
+
+        index = ProjectSymbolIndex.instance()
+        if index is not None:
+            index.refresh()
+        count = sum(len(occurrences) for path, occurrences in files if path in selected)
+        self.finished.emit(f"Переименовано {count} вхождений в {len(selected)} файлах")
@@ -0,0 +1,518 @@
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QToolButton,
+                             QLabel, QListView)
+from PyQt6.QtCore import Qt, QThread, QTimer, QSettings, QAbstractListModel, QModelIndex, pyqtSignal
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import fnmatch
+import mmap
+import time
+import os
+import re
+
+from widgets.SymbolIndex import IGNORED_DIRS
+
+# Файлы больше этого размера не просматриваются (дампы, сборки)
+MAX_FILE_SIZE = 64 * 1024 * 1024
+# Сколько строк с совпадениями брать из одного файла
+MAX_LINES_PER_FILE = 1000
+MAX_LINE_LENGTH = 300
+
+def compile_query(query, regex=False, whole_word=False, case_sensitive=False):
+    """Регулярное выражение запроса по тексту файла, декодированному как
+    UTF-8 (см. search_file): регистр и границы слов - по Unicode, так что
+    кириллица сравнивается так же, как латиница; ^ и $ - границы строк.
+    Ошибка синтаксиса - re.error"""
+    pattern = query if regex else re.escape(query)
+    if whole_word:
+        pattern = r'(?<!\w)(?:' + pattern + r')(?!\w)'
+    return re.compile(pattern, re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+
+def query_prefilter(query, regex=False, whole_word=False, case_sensitive=False):
+    """Байты, без которых в файле нет совпадения, или None. Только для
+    обычного поиска с учётом регистра и без целых слов: тогда совпадение -
+    ровно эти байты UTF-8, и файл без них можно не декодировать"""
+    if regex or whole_word or not case_sensitive:
+        return None
+    return query.encode('utf-8')
+
+def read_gitignore(directory):
+    """Шаблоны .gitignore каталога: [(шаблон, только каталоги, с путём)]"""
+    patterns = []
+    try:
+        with open(os.path.join(directory, '.gitignore'), 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return patterns
+    for line in lines:
+        line = line.strip()
+        # Отрицания (!) не поддерживаются - такой файл просто будет пропущен
+        if not line or line.startswith('#') or line.startswith('!'):
+            continue
+        directory_only = line.endswith('/')
+        line = line.strip('/')
+        if line:
+            patterns.append((line, directory_only, '/' in line))
+    return patterns
+
+def gitignore_rules(root, directory):
+    """Правила .gitignore от корня проекта до directory включительно,
+    в том виде, в каком их накапливает iter_project_files"""
+    rules = []
+    relative = os.path.relpath(directory, root)
+    current = root
+    for part in ([] if relative == '.' else relative.split(os.sep)) + [None]:
+        patterns = read_gitignore(current)
+        if patterns:
+            rules.append((current, patterns))
+        if part is not None:
+            current = os.path.join(current, part)
+    return rules
+
+def is_ignored(rules, path, name, is_dir):
+    for base, patterns in rules:
+        relative = None
+        for pattern, directory_only, anchored in patterns:
+            if directory_only and not is_dir:
+                continue
+            if anchored:
+                if relative is None:
+                    relative = os.path.relpath(path, base).replace(os.sep, '/')
+                if fnmatch.fnmatch(relative, pattern):
+                    return True
+            elif fnmatch.fnmatch(name, pattern):
+                return True
+    return False
+
+def iter_project_files(root, rules=()):
+    """Файлы проекта без служебных каталогов и того, что в .gitignore.
+    rules - правила .gitignore родительских каталогов, если root - подкаталог"""
+    stack = [(root, list(rules))]
+    while stack:
+        directory, rules = stack.pop()
+        patterns = read_gitignore(directory)
+        if patterns:
+            rules = rules + [(directory, patterns)]
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if is_dir and (entry.name in IGNORED_DIRS or entry.name.startswith('.')):
+                    continue
+                if rules and is_ignored(rules, entry.path, entry.name, is_dir):
+                    continue
+                if is_dir:
+                    stack.append((entry.path, rules))
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path
+
+def search_file(compiled, path, prefilter=None):
+    """[(line, column, text), ...] строк файла с совпадениями.
+
+    Файл отображается через mmap; двоичные файлы (NUL в первых 8 КБ) и
+    файлы без байтов prefilter отсеиваются прямо по отображению, остальные
+    декодируются как UTF-8 (неверные байты - surrogateescape) и
+    просматриваются регулярным выражением.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or size > MAX_FILE_SIZE:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b'\0', 0, 8192) != -1:
+                    return []
+                if prefilter is not None and data.find(prefilter) == -1:
+                    return []
+                text = data[:].decode('utf-8', 'surrogateescape')
+    except (OSError, ValueError):
+        return []
+    return collect_lines(compiled, text)
+
+def collect_lines(compiled, data):
+    lines = []
+    line = 0
+    counted = 0
+    position = 0
+    while len(lines) < MAX_LINES_PER_FILE:
+        match = compiled.search(data, position)
+        if match is None:
+            break
+        start = match.start()
+        line += data.count('\n', counted, start)
+        line_start = data.rfind('\n', 0, start) + 1
+        line_end = data.find('\n', start)
+        if line_end == -1:
+            line_end = len(data)
+
+        # Колонка в единицах UTF-16, как позиции QTextDocument
+        column = len(data[line_start:start].encode('utf-16-le', 'surrogatepass')) // 2
+        text = data[line_start:min(line_end, line_start + MAX_LINE_LENGTH)]
+        text = text.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace')
+        lines.append((line, column, text.rstrip('\r')))
+
+        # Одна строка - один результат: продолжаем со следующей
+        counted = start
+        position = line_end + 1
+        if position >= len(data):
+            break
+    return lines
+
+def search_files(pattern, flags, paths, prefilter=None):
+    """Выполняется в пуле: [(path, [(line, column, text), ...]), ...]"""
+    compiled = re.compile(pattern, flags)
+    results = []
+    for path in paths:
+        lines = search_file(compiled, path, prefilter)
+        if lines:
+            results.append((path, lines))
+    return results
+
+_executor = None
+
+def get_executor():
+    """Общий для всех поисков пул процессов: регулярные выражения держат
+    GIL, поэтому потоки не дали бы параллельности"""
+    global _executor
+    if _executor is None:
+        try:
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        except (OSError, ValueError):
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _executor
+
+class SearchWorker(QThread):
+    """Обходит проект и раздаёт файлы пачками в пул, пересылая результаты
+    по мере готовности. Отмена перестаёт выдавать новые пачки, а уже
+    посчитанные результаты старого поколения панель отбрасывает.
+
+    Если передан paths (кандидаты из триграммного индекса), проверяются
+    только они, без обхода дерева."""
+    # поколение, [(path, line, column, text), ...]
+    results_ready = pyqtSignal(int, list)
+    # поколение, просмотрено файлов
+    progress = pyqtSignal(int, int)
+    # поколение, просмотрено файлов
+    search_finished = pyqtSignal(int, int)
+
+    CHUNK = 128
+    EMIT_INTERVAL = 0.05
+
+    def __init__(self, root, compiled, generation, paths=None, prefilter=None):
+        super().__init__()
+        self.root = root
+        self.paths = paths
+        self.pattern = compiled.pattern
+        self.flags = compiled.flags
+        self.prefilter = prefilter
+        self.generation = generation
+        self.cancelled = False
+        self.scanned = 0
+        self.batch = []
+        self.last_emit = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        global _executor
+        try:
+            self.search(get_executor())
+        except BrokenProcessPool:
+            # Процессы пула недоступны - продолжаем в потоках
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+            self.scanned = 0
+            self.search(_executor)
+        self.flush(force=True)
+        self.search_finished.emit(self.generation, self.scanned)
+
+    def search(self, executor):
+        in_flight = {}
+        limit = 4 * (getattr(executor, '_max_workers', None) or 4)
+        chunk = []
+
+        def submit():
+            future = executor.submit(search_files, self.pattern, self.flags, list(chunk),
+                                     self.prefilter)
+            in_flight[future] = len(chunk)
+            chunk.clear()
+
+        paths = self.paths if self.paths is not None else iter_project_files(self.root)
+        for path in paths:
+            if self.cancelled:
+                break
+            chunk.append(path)
+            if len(chunk) == self.CHUNK:
+                submit()
+                if len(in_flight) >= limit:
+                    self.collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+        if chunk and not self.cancelled:
+            submit()
+
+        while in_flight:
+            if self.cancelled:
+                for future in in_flight:
+                    future.cancel()
+                return
+            done = wait(in_flight, timeout=0.1, return_when=FIRST_COMPLETED).done
+            self.collect(in_flight, done)
+
+    def collect(self, in_flight, done):
+        for future in done:
+            self.scanned += in_flight.pop(future)
+            if future.cancelled():
+                continue
+            for path, lines in future.result():
+                self.batch.extend((path, line, column, text) for line, column, text in lines)
+        self.flush()
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if self.cancelled or not (force or now - self.last_emit >= self.EMIT_INTERVAL):
+            return
+        self.last_emit = now
+        if self.batch:
+            self.results_ready.emit(self.generation, self.batch)
+            self.batch = []
+        self.progress.emit(self.generation, self.scanned)
+
+class SearchResultsModel(QAbstractListModel):
+    """Плоский список результатов; QListView с одинаковой высотой строк
+    рисует только видимые строки, так что размер списка не важен"""
+    LocationRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.rows = []
+        self.files = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path, line, column, text = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{os.path.relpath(path, self.root)}:{line + 1}  {text.strip()}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == self.LocationRole:
+            return path, line, column
+        return None
+
+    def append(self, rows):
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.files.update(row[0] for row in rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.files = set()
+        self.endResetModel()
+
+class ProjectSearchPanel(QWidget):
+    """Поиск по всем файлам проекта.
+
+    Новый запрос отменяет текущий поиск; результаты подгружаются в список
+    по мере готовности. Активация строки открывает файл на совпадении
+    через Editor.open_location.
+
+    Режим files/search_index: 'scan' - всегда обходить дерево, 'index' -
+    сужать поиск триграммным индексом, 'auto' - завести индекс, когда
+    проект оказался большим (или снимок индекса уже есть).
+    """
+    DELAY = 250
+    MAX_RESULTS = 100000
+    # С какого числа файлов режим 'auto' включает индекс
+    INDEX_THRESHOLD = 5000
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.generation = 0
+        self.worker = None
+        self.workers = set()
+        self.index = None
+        self.index_status = ""
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("Search in files")
+        self.input.textChanged.connect(self.schedule_search)
+        self.input.returnPressed.connect(self.start_search)
+        layout.addWidget(self.input)
+
+        options = QHBoxLayout()
+        self.case_button = self.add_toggle(options, "Aa", "Match case")
+        self.word_button = self.add_toggle(options, "W", "Whole word")
+        self.regex_button = self.add_toggle(options, ".*", "Regular expression")
+        options.addStretch()
+        layout.addLayout(options)
+
+        self.status = QLabel()
+        layout.addWidget(self.status)
+
+        self.model = SearchResultsModel(root)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.view.activated.connect(self.open_result)
+        self.view.clicked.connect(self.open_result)
+        layout.addWidget(self.view)
+
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.start_search)
+
+        mode = self.index_mode()
+        if mode == 'index' or (mode == 'auto' and self.has_index_snapshot()):
+            self.start_index()
+
+    def index_mode(self):
+        settings = QSettings('RytonStudio Beta', 'Editor')
+        return settings.value("files/search_index", "auto")
+
+    def has_index_snapshot(self):
+        from widgets.TrigramIndex import TrigramIndex
+        return TrigramIndex.exists(self.root)
+
+    def start_index(self):
+        # TrigramIndex сам импортирует этот модуль
+        from widgets.TrigramIndex import TrigramIndex
+        if self.index is not None:
+            return
+        self.index = TrigramIndex(self.root)
+        self.index.status_changed.connect(self.show_index_status)
+        self.index.start()
+
+    def stop_index(self):
+        if self.index is not None:
+            self.index.stop()
+            self.index = None
+            self.index_status = ""
+
+    def apply_index_mode(self):
+        """Вызывается после изменения настроек"""
+        mode = self.index_mode()
+        if mode == 'scan':
+            self.stop_index()
+        elif mode == 'index':
+            self.start_index()
+
+    def show_index_status(self, text):
+        self.index_status = text
+        if self.worker is None and not self.input.text():
+            self.status.setText(text)
+
+    def file_saved(self, path):
+        if self.index is not None:
+            self.index.update_files([path])
+
+    def shutdown(self):
+        self.cancel_search()
+        # Отменённые потоки доходят до конца пачки - дожидаемся их
+        for worker in list(self.workers):
+            worker.cancel()
+            worker.wait()
+        self.stop_index()
+
+    def add_toggle(self, layout, text, tooltip):
+        button = QToolButton()
+        button.setText(text)
+        button.setToolTip(tooltip)
+        button.setCheckable(True)
+        button.toggled.connect(self.schedule_search)
+        layout.addWidget(button)
+        return button
+
+    def focus_input(self):
+        self.input.setFocus()
+        self.input.selectAll()
+
+    def schedule_search(self):
+        self.search_timer.start(self.DELAY)
+
+    def cancel_search(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+    def start_search(self):
+        self.search_timer.stop()
+        self.cancel_search()
+        self.generation += 1
+        self.model.clear()
+
+        query = self.input.text()
+        if not query:
+            self.status.clear()
+            return
+        options = (self.regex_button.isChecked(), self.word_button.isChecked(),
+                   self.case_button.isChecked())
+        try:
+            compiled = compile_query(query, *options)
+        except re.error as error:
+            self.status.setText(f"Invalid regex: {error}")
+            return
+
+        paths = None
+        if self.index is not None:
+            paths = self.index.candidates(query, self.regex_button.isChecked(),
+                                          self.case_button.isChecked())
+
+        worker = SearchWorker(self.root, compiled, self.generation, paths,
+                              query_prefilter(query, *options))
+        worker.results_ready.connect(self.add_results)
+        worker.progress.connect(self.show_progress)
+        worker.search_finished.connect(self.search_finished)
+        # Отменённые потоки дорабатывают сами; держим ссылки до их завершения
+        self.workers.add(worker)
+        worker.finished.connect(lambda: self.workers.discard(worker))
+        self.worker = worker
+        self.status.setText("Searching...")
+        worker.start()
+
+    def add_results(self, generation, rows):
+        if generation != self.generation:
+            return
+        room = self.MAX_RESULTS - len(self.model.rows)
+        self.model.append(rows[:room])
+        if len(rows) >= room:
+            self.cancel_search()
+            self.status.setText(f"{len(self.model.rows)} results in {len(self.model.files)} files "
+                                f"(limit reached)")
+
+    def show_progress(self, generation, scanned):
+        if generation == self.generation and self.worker is not None:
+            self.status.setText(f"{len(self.model.rows)} results in {len(self.model.files)} files, "
+                                f"{scanned} files searched...")
+
+    def search_finished(self, generation, scanned):
+        if generation == self.generation and self.worker is not None:
+            indexed = self.worker.paths is not None
+            self.worker = None
+            self.status.setText(f"{len(self.model.rows)} results in {len(self.model.files)} files "
+                                f"({scanned} files searched{', indexed' if indexed else ''})")
+            if not indexed and scanned >= self.INDEX_THRESHOLD and self.index_mode() == 'auto':
+                self.start_index()
+
+    def open_result(self, index):
+        path, line, column = index.data(SearchResultsModel.LocationRole)
+        window = self.window()
+        if hasattr(window, 'open_location'):
+            window.open_location(path, line, column)
@@ -0,0 +1,408 @@
+from PyQt6.QtWidgets import QFrame, QVBoxLayout, QLineEdit, QListView
+from PyQt6.QtCore import (Qt, QObject, QThread, QTimer, QEvent, QFileSystemWatcher,
+                          QAbstractListModel, QModelIndex, pyqtSignal)
+
+import heapq
+import time
+import os
+
+from widgets.ProjectSearch import iter_project_files, gitignore_rules, is_ignored
+from widgets.SymbolIndex import IGNORED_DIRS
+
+class FileListLoader(QThread):
+    """Обходит дерево (или поддерево) проекта в фоне"""
+    # корень обхода, [пути файлов]
+    loaded = pyqtSignal(str, list)
+
+    def __init__(self, root, rules=()):
+        super().__init__()
+        self.root = root
+        self.rules = rules
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        paths = []
+        for path in iter_project_files(self.root, self.rules):
+            if self.cancelled:
+                return
+            paths.append(path)
+        self.loaded.emit(self.root, paths)
+
+class ProjectFileList(QObject):
+    """Список файлов проекта в памяти.
+
+    Строится один раз в фоне, дальше QFileSystemWatcher по каталогам
+    сообщает об изменениях, и пересматривается только изменившийся
+    каталог (новый подкаталог обходится целиком, тоже в фоне). Номер
+    version растёт при каждом изменении - по нему потребители понимают,
+    что их кэши устарели.
+    """
+    changed = pyqtSignal()
+
+    DEBOUNCE = 300
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.by_dir = {}
+        self.version = 0
+        self.ready = False
+        self.flat = None
+        self.loaders = set()
+        self.stopped = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.changed_dirs = set()
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.timeout.connect(self.flush_changes)
+
+    def start(self):
+        self.load(self.root)
+
+    def stop(self):
+        """Останавливает наблюдение и дожидается фоновых обходов (при
+        закрытии окна)"""
+        self.stopped = True
+        self.change_timer.stop()
+        self.watcher.directoryChanged.disconnect(self.directory_changed)
+        for loader in list(self.loaders):
+            loader.cancel()
+            loader.wait()
+        self.loaders.clear()
+
+    def load(self, root, rules=()):
+        if self.stopped:
+            return
+        loader = FileListLoader(root, rules)
+        loader.loaded.connect(self.merge)
+        self.loaders.add(loader)
+        loader.finished.connect(lambda: self.loaders.discard(loader))
+        loader.start()
+
+    def merge(self, root, paths):
+        directories = {root}
+        for path in paths:
+            directory = os.path.dirname(path)
+            self.by_dir.setdefault(directory, set()).add(path)
+            # Родители до корня обхода тоже наблюдаем: в них могут появиться файлы
+            while directory not in directories and directory.startswith(root):
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        for directory in directories:
+            self.by_dir.setdefault(directory, set())
+        known = set(self.watcher.directories())
+        new = [directory for directory in directories if directory not in known]
+        if new:
+            self.watcher.addPaths(new)
+        if root == self.root:
+            self.ready = True
+        self.touch()
+
+    def touch(self):
+        self.version += 1
+        self.flat = None
+        self.changed.emit()
+
+    def paths(self):
+        """Все файлы проекта; список кэшируется до следующего изменения"""
+        if self.flat is None:
+            self.flat = [path for paths in self.by_dir.values() for path in paths]
+        return self.flat
+
+    def directory_changed(self, directory):
+        self.changed_dirs.add(directory)
+        self.change_timer.start(self.DEBOUNCE)
+
+    def flush_changes(self):
+        directories = self.changed_dirs
+        self.changed_dirs = set()
+        for directory in sorted(directories):
+            if directory in self.by_dir:
+                self.rescan(directory)
+        self.touch()
+
+    def remove_tree(self, directory):
+        prefix = directory + os.sep
+        for known in [known for known in self.by_dir if known == directory or known.startswith(prefix)]:
+            del self.by_dir[known]
+        watched = [path for path in self.watcher.directories()
+                   if path == directory or path.startswith(prefix)]
+        if watched:
+            self.watcher.removePaths(watched)
+
+    def rescan(self, directory):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            self.remove_tree(directory)
+            return
+        rules = gitignore_rules(self.root, directory)
+        files = set()
+        subdirectories = set()
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if is_dir and (entry.name in IGNORED_DIRS or entry.name.startswith('.')):
+                continue
+            if rules and is_ignored(rules, entry.path, entry.name, is_dir):
+                continue
+            if is_dir:
+                subdirectories.add(entry.path)
+                if entry.path not in self.by_dir:
+                    self.by_dir[entry.path] = set()
+                    self.load(entry.path, rules)
+            elif entry.is_file(follow_symlinks=False):
+                files.add(entry.path)
+        self.by_dir[directory] = files
+        for known in [known for known in self.by_dir
+                      if os.path.dirname(known) == directory and known not in subdirectories]:
+            self.remove_tree(known)
+
+SEPARATORS = '/\\_-. '
+
+def fuzzy_score(query, lower, base):
+    """Очки совпадения query как подпоследовательности пути lower (оба в
+    нижнем регистре) или None. base - начало имени файла в lower.
+
+    Сплошное вхождение в имя файла оценивается выше любого разбросанного
+    совпадения; иначе символы ищутся жадно, с бонусами за соседство,
+    начало слова и попадание в имя файла."""
+    position = lower.find(query, base)
+    if position != -1:
+        score = 1000 + (500 if position == base else 0)
+        return score - len(lower) / 64
+
+    score = 0
+    previous = -1
+    find = lower.find
+    for char in query:
+        position = find(char, previous + 1)
+        if position == -1:
+            return None
+        if position == previous + 1:
+            score += 5
+        if position == 0 or lower[position - 1] in SEPARATORS:
+            score += 8
+        if position >= base:
+            score += 3
+        previous = position
+    return score - len(lower) / 64
+
+class FileMatcher:
+    """Нечёткий поиск по списку путей порциями.
+
+    Поиск начинается с begin(query) и продвигается вызовами step(budget),
+    каждый из которых тратит не больше budget секунд, так что первые
+    результаты видны в пределах кадра при любом размере проекта. Если
+    новый запрос продолжает предыдущий, проверяются только его совпадения
+    и ещё не просмотренные им пути - даже если он не успел закончиться.
+    Лучшие limit путей держит heap.
+    """
+    CHUNK = 512
+
+    def __init__(self, root, limit=100):
+        self.root = root
+        self.limit = limit
+        self.version = None
+        self.lowered = []
+        self.bases = []
+        self.paths = []
+        self.query = ""
+        self.candidates = []
+        self.position = 0
+        self.heap = []
+        self.matched = []
+        self.narrowable = False
+
+    def set_paths(self, paths, version):
+        """Пересобирает строки для сравнения, если список изменился"""
+        if version == self.version:
+            return
+        self.version = version
+        self.paths = paths
+        prefix = len(self.root) + 1
+        self.lowered = [path[prefix:].lower() for path in paths]
+        self.bases = [lower.rfind(os.sep) + 1 for lower in self.lowered]
+        self.narrowable = False
+
+    def begin(self, query):
+        query = query.lower().replace(' ', '')
+        if self.narrowable and query.startswith(self.query):
+            # Совпадение с новым запросом - всегда совпадение и со старым
+            self.candidates = self.matched + list(self.candidates[self.position:])
+        else:
+            self.candidates = range(len(self.paths))
+        self.query = query
+        self.position = 0
+        self.heap = []
+        self.matched = []
+        self.narrowable = True
+
+    def done(self):
+        return self.position >= len(self.candidates)
+
+    def step(self, budget):
+        """Оценивает очередную порцию кандидатов; True, если поиск закончен"""
+        query = self.query
+        candidates = self.candidates
+        lowered = self.lowered
+        bases = self.bases
+        heap = self.heap
+        matched = self.matched
+        limit = self.limit
+        deadline = time.perf_counter() + budget
+        position = self.position
+        end = len(candidates)
+
+        while position < end:
+            stop = min(position + self.CHUNK, end)
+            for index in candidates[position:stop]:
+                score = fuzzy_score(query, lowered[index], bases[index])
+                if score is None:
+                    continue
+                matched.append(index)
+                item = (score, -index)
+                if len(heap) < limit:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+            position = stop
+            if time.perf_counter() >= deadline:
+                break
+        self.position = position
+        return position >= end
+
+    def results(self):
+        return [self.paths[-index] for _, index in sorted(self.heap, reverse=True)]
+
+class QuickOpenModel(QAbstractListModel):
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{os.path.basename(path)}    {os.path.relpath(os.path.dirname(path), self.root)}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        return None
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+class QuickOpenPalette(QFrame):
+    """Палитра быстрого открытия файла (Ctrl+P).
+
+    Пути берутся из ProjectFileList, поиск идёт порциями по таймеру
+    (FileMatcher), список обновляется после каждой порции. Enter открывает
+    выбранный файл через Editor.open_path.
+    """
+    # Время на порцию поиска, чтобы окно не теряло отзывчивость
+    STEP_BUDGET = 0.008
+    WIDTH = 600
+    HEIGHT = 400
+
+    def __init__(self, file_list, parent=None):
+        super().__init__(parent, Qt.WindowType.Popup)
+        self.file_list = file_list
+        self.matcher = FileMatcher(file_list.root)
+        self.setFrameShape(QFrame.Shape.StyledPanel)
+        self.resize(self.WIDTH, self.HEIGHT)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("Go to file")
+        self.input.textChanged.connect(self.start_search)
+        self.input.installEventFilter(self)
+        layout.addWidget(self.input)
+
+        self.model = QuickOpenModel(file_list.root)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.view.activated.connect(self.open_selected)
+        self.view.clicked.connect(self.open_selected)
+        layout.addWidget(self.view)
+
+        self.step_timer = QTimer(self)
+        self.step_timer.timeout.connect(self.search_step)
+        file_list.changed.connect(self.files_changed)
+
+    def popup(self):
+        parent = self.parentWidget()
+        if parent is not None:
+            top_left = parent.mapToGlobal(parent.rect().topLeft())
+            self.move(top_left.x() + (parent.width() - self.width()) // 2, top_left.y() + 40)
+        self.show()
+        self.input.setFocus()
+        self.input.selectAll()
+        self.start_search()
+
+    def files_changed(self):
+        if self.isVisible():
+            self.start_search()
+
+    def start_search(self):
+        self.matcher.set_paths(self.file_list.paths(), self.file_list.version)
+        query = self.input.text()
+        if not query.strip():
+            self.step_timer.stop()
+            self.model.set_rows([])
+            return
+        self.matcher.begin(query)
+        self.search_step()
+        if not self.matcher.done():
+            self.step_timer.start(0)
+
+    def search_step(self):
+        if self.matcher.step(self.STEP_BUDGET):
+            self.step_timer.stop()
+        self.model.set_rows(self.matcher.results())
+        self.select_first()
+
+    def select_first(self):
+        if self.model.rows:
+            self.view.setCurrentIndex(self.model.index(0))
+
+    def eventFilter(self, obj, event):
+        if obj is self.input and event.type() == QEvent.Type.KeyPress:
+            key = event.key()
+            if key in (Qt.Key.Key_Up, Qt.Key.Key_Down, Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+                self.view.keyPressEvent(event)
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                self.open_selected(self.view.currentIndex())
+                return True
+            if key == Qt.Key.Key_Escape:
+                self.hide()
+                return True
+        return super().eventFilter(obj, event)
+
+    def open_selected(self, index):
+        if not index.isValid():
+            return
+        path = self.model.rows[index.row()]
+        self.hide()
+        window = self.parentWidget()
+        if window is not None and hasattr(window, 'open_path'):
+            window.open_path(path)
+
+    def hideEvent(self, event):
+        self.step_timer.stop()
+        super().hideEvent(event)
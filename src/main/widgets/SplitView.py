@@ -0,0 +1,87 @@
+from PyQt6.QtWidgets import QSplitter
+from PyQt6.QtCore import QTimer
+
+from widgets.ToolTabs import CodeEditor
+
+class EditorSplitter(QSplitter):
+    """Узел дерева разделённой вкладки: виды одного документа и вложенные
+    разделители другой ориентации"""
+
+def split_view(editor, orientation):
+    """Открывает рядом с editor ещё один вид того же документа и
+    возвращает его. editor должен лежать в QSplitter; если ориентация
+    другая, на месте editor появляется вложенный разделитель.
+
+    Вид подключается к QTextDocument основного редактора вкладки (см.
+    CodeEditor source): текст, подсветка и индексы не копируются.
+    """
+    primary = editor.source or editor
+    view = CodeEditor(primary.file_path, source=primary)
+    view.setTextCursor(editor.textCursor())
+    scroll = editor.verticalScrollBar().value()
+
+    parent = editor.parentWidget()
+    index = parent.indexOf(editor)
+    sizes = parent.sizes()
+    if parent.orientation() == orientation:
+        parent.insertWidget(index + 1, view)
+        if sizes[index]:
+            half = sizes[index] // 2
+            sizes[index:index + 1] = [sizes[index] - half, half]
+        else:
+            # Разделитель ещё не разложен: размеры работают как веса
+            sizes = [1] * parent.count()
+        parent.setSizes(sizes)
+    else:
+        nested = EditorSplitter(orientation)
+        parent.replaceWidget(index, nested)
+        nested.addWidget(editor)
+        nested.addWidget(view)
+        editor.show()
+        parent.setSizes(sizes)
+        nested.setSizes([1, 1])
+
+    # Диапазон прокрутки появится после раскладки нового вида
+    QTimer.singleShot(0, lambda: view.verticalScrollBar().setValue(scroll))
+    view.setFocus()
+    return view
+
+def close_view(view):
+    """Убирает вид из разделённой вкладки; разделитель с одним оставшимся
+    виджетом заменяется этим виджетом"""
+    parent = view.parentWidget()
+    view.hide()
+    view.setParent(None)
+    view.deleteLater()
+    while isinstance(parent, EditorSplitter) and parent.count() == 1 and \
+            isinstance(parent.parentWidget(), QSplitter):
+        outer = parent.parentWidget()
+        sizes = outer.sizes()
+        child = parent.widget(0)
+        outer.replaceWidget(outer.indexOf(parent), child)
+        child.show()
+        outer.setSizes(sizes)
+        parent.deleteLater()
+        parent = outer
+
+# Направление -> (dx, dy)
+DIRECTIONS = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}
+
+def neighbour_view(view, root, direction):
+    """Ближайший к view вид в root в направлении direction или None"""
+    dx, dy = DIRECTIONS[direction]
+    center = view.mapTo(root, view.rect().center())
+    best = None
+    best_distance = None
+    for other in root.findChildren(CodeEditor):
+        if other is view or not other.isVisible():
+            continue
+        point = other.mapTo(root, other.rect().center())
+        along = (point.x() - center.x()) * dx + (point.y() - center.y()) * dy
+        if along <= 0:
+            continue
+        across = abs((point.x() - center.x()) * dy) + abs((point.y() - center.y()) * dx)
+        distance = along + 2 * across
+        if best is None or distance < best_distance:
+            best, best_distance = other, distance
+    return best
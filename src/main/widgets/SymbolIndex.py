@@ -0,0 +1,308 @@
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import hashlib
+import sqlite3
+import os
+
+from widgets.Lexer import get_lexer
+
+INDEX_DIR = os.path.expanduser("~/RytonStudio/index")
+
+# Расширение файла -> язык лексера
+SOURCE_LANGUAGES = {'.ry': 'ryton', '.zig': 'zig'}
+IGNORED_DIRS = {'.git', '__pycache__', 'node_modules', 'zig-cache', '.zig-cache', 'zig-out'}
+
+# Увеличивается при изменении схемы: старая база пересоздаётся целиком
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL COLLATE NOCASE,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_path ON refs (path);
+"""
+
+def index_file(path):
+    """Определения и упоминания имён в файле:
+    (path, [(name, kind, line, column), ...], [(name, line, column), ...]).
+
+    Выполняется в процессах пула, поэтому не трогает ни Qt, ни базу.
+    """
+    lexer = get_lexer(SOURCE_LANGUAGES[os.path.splitext(path)[1].lower()])
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError:
+        return path, [], []
+
+    symbols = []
+    refs = []
+    state = lexer.NORMAL
+    for number, line in enumerate(text.splitlines()):
+        tokens, state = lexer.lex(line, state)
+        for name, kind, column in lexer.definitions(tokens, line):
+            symbols.append((name, kind, number, column))
+        for start, length, kind in tokens:
+            if kind == 'identifier':
+                refs.append((line[start:start + length], number, start))
+    return path, symbols, refs
+
+def rename_in_file(path, old_name, new_name):
+    """Переименование по токенам лексера: строки и комментарии не
+    затрагиваются. (path, mtime, [(line, column, текст строки), ...], новый текст).
+
+    Файл читается с surrogateescape и без перевода концов строк, чтобы
+    запись вернула все прочие байты как были. Выполняется в процессах пула.
+    """
+    lexer = get_lexer(SOURCE_LANGUAGES[os.path.splitext(path)[1].lower()])
+    try:
+        with open(path, 'r', encoding='utf-8', errors='surrogateescape', newline='') as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            text = f.read()
+    except OSError:
+        return path, 0, [], None
+
+    occurrences = []
+    parts = []
+    state = lexer.NORMAL
+    for number, line in enumerate(text.splitlines(keepends=True)):
+        content = line.rstrip('\r\n')
+        tokens, state = lexer.lex(content, state)
+        last = 0
+        for start, length, kind in tokens:
+            if kind == 'identifier' and content[start:start + length] == old_name:
+                occurrences.append((number, start, content))
+                parts.append(line[last:start])
+                parts.append(new_name)
+                last = start + length
+        parts.append(line[last:])
+    if not occurrences:
+        return path, mtime, [], None
+    return path, mtime, occurrences, ''.join(parts)
+
+def rename_in_files(paths, old_name, new_name):
+    return [rename_in_file(path, old_name, new_name) for path in paths]
+
+def scan_sources(root):
+    """{путь: (mtime, size)} исходников Ryton и Zig проекта"""
+    sources = {}
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS and not entry.name.startswith('.'):
+                        stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in SOURCE_LANGUAGES:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    sources[entry.path] = (stat.st_mtime, stat.st_size)
+    return sources
+
+class ProjectSymbolIndex:
+    """Индекс определений (func, pack, переменные) и упоминаний имён
+    во всех файлах проекта.
+
+    Хранится в SQLite в ~/RytonStudio/index, по базе на проект; файл
+    переиндексируется, только если изменились его mtime или размер.
+    Индексацию ведёт SymbolIndexer в фоне, GUI-поток только читает базу
+    (WAL позволяет читать во время записи).
+    """
+    _instance = None
+
+    def __init__(self, project_path, db_path=None):
+        self.project_path = os.path.abspath(project_path)
+        if db_path is None:
+            digest = hashlib.sha1(self.project_path.encode('utf-8')).hexdigest()[:16]
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            db_path = os.path.join(INDEX_DIR, f"{digest}.sqlite")
+        self.db_path = db_path
+        self.connection = self.connect()
+        self.indexer = None
+        self.refresh_requested = False
+        self.listeners = []
+
+    @classmethod
+    def instance(cls):
+        """Индекс открытого проекта или None"""
+        return cls._instance
+
+    @classmethod
+    def open(cls, project_path):
+        if cls._instance is not None:
+            cls._instance.close()
+        cls._instance = cls(project_path)
+        return cls._instance
+
+    def connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            connection.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS symbols; "
+                                     "DROP TABLE IF EXISTS refs;")
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def refresh(self):
+        """Запускает фоновую переиндексацию изменённых файлов"""
+        if self.indexer is not None:
+            self.refresh_requested = True
+            return
+        self.indexer = SymbolIndexer(self)
+        for listener in self.listeners:
+            self.indexer.progress.connect(listener)
+        self.indexer.indexed.connect(self.indexer_done)
+        self.indexer.start()
+
+    def indexer_done(self, changed):
+        self.indexer = None
+        if self.refresh_requested:
+            self.refresh_requested = False
+            self.refresh()
+
+    def close(self):
+        if self.indexer is not None:
+            self.indexer.cancel()
+            self.indexer.wait()
+            self.indexer = None
+        self.connection.close()
+
+    def search(self, prefix, limit=50):
+        """Имена, начинающиеся с prefix (без учёта регистра), короткие первыми"""
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        rows = self.connection.execute(
+            "SELECT DISTINCT name FROM symbols WHERE name LIKE ? ESCAPE '\\' "
+            "ORDER BY length(name), name LIMIT ?", (pattern, limit))
+        return [name for name, in rows]
+
+    def definitions(self, name):
+        """[(path, line, column, kind), ...] определений имени"""
+        rows = self.connection.execute(
+            "SELECT path, line, column, kind FROM symbols "
+            "WHERE name = ?1 AND name = ?1 COLLATE BINARY ORDER BY path, line", (name,))
+        return rows.fetchall()
+
+    def references(self, name):
+        """[(path, line, column), ...] всех упоминаний имени"""
+        rows = self.connection.execute(
+            "SELECT path, line, column FROM refs WHERE name = ? ORDER BY path, line, column", (name,))
+        return rows.fetchall()
+
+class SymbolIndexer(QThread):
+    """Фоновая (пере)индексация проекта.
+
+    Сравнивает mtime/размер файлов с сохранёнными, удаляет исчезнувшие,
+    а изменённые разбирает в пуле процессов (лексер на чистом Python,
+    потоки упёрлись бы в GIL). Мелкие обновления идут прямо в потоке.
+    """
+    # обработано файлов, всего файлов
+    progress = pyqtSignal(int, int)
+    # число переиндексированных файлов
+    indexed = pyqtSignal(int)
+
+    POOL_THRESHOLD = 64
+    COMMIT_EVERY = 200
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        connection = self.index.connect()
+        try:
+            changed = self.update(connection)
+        finally:
+            connection.close()
+        self.indexed.emit(changed)
+
+    def update(self, connection):
+        sources = scan_sources(self.index.project_path)
+        stored = {path: (mtime, size) for path, mtime, size in
+                  connection.execute("SELECT path, mtime, size FROM files")}
+
+        removed = [path for path in stored if path not in sources]
+        with connection:
+            for path in removed:
+                connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+                connection.execute("DELETE FROM refs WHERE path = ?", (path,))
+                connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+        changed = [path for path, meta in sources.items() if stored.get(path) != meta]
+        if not changed:
+            return 0
+
+        done = 0
+        for path, symbols, refs in self.parse(changed):
+            if self.cancelled:
+                break
+            mtime, size = sources[path]
+            connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+            connection.execute("DELETE FROM refs WHERE path = ?", (path,))
+            connection.executemany(
+                "INSERT INTO symbols (name, kind, path, line, column) VALUES (?, ?, ?, ?, ?)",
+                [(name, kind, path, line, column) for name, kind, line, column in symbols])
+            connection.executemany(
+                "INSERT INTO refs (name, path, line, column) VALUES (?, ?, ?, ?)",
+                [(name, path, line, column) for name, line, column in refs])
+            connection.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)",
+                               (path, mtime, size))
+            done += 1
+            if done % self.COMMIT_EVERY == 0:
+                connection.commit()
+                self.progress.emit(done, len(changed))
+        connection.commit()
+        self.progress.emit(done, len(changed))
+        return done
+
+    def parse(self, paths):
+        if len(paths) >= self.POOL_THRESHOLD:
+            try:
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                         mp_context=context) as pool:
+                    for result in pool.map(index_file, paths, chunksize=16):
+                        yield result
+                        if self.cancelled:
+                            pool.shutdown(cancel_futures=True)
+                            return
+                return
+            except (OSError, BrokenProcessPool):
+                # Пул недоступен (например, в замороженной сборке) - разбираем сами
+                pass
+        for path in paths:
+            if self.cancelled:
+                return
+            yield index_file(path)
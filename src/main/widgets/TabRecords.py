@@ -0,0 +1,205 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import QObject, QSettings, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+
+from widgets.ToolTabs import CodeEditor
+
+import os
+
+class TabRecord(QWidget):
+    """Страница вкладки файла без редактора: путь, позиция курсора и
+    прокрутки и несохранённый текст (None - текст берётся с диска).
+    Пустой виджет почти ничего не стоит; редактор создаётся при первом
+    переключении на вкладку (см. EditorTabs)."""
+    def __init__(self, file_path, position=0, anchor=0, scroll=0, text=None):
+        super().__init__()
+        self.file_path = file_path
+        self.position = position
+        self.anchor = anchor
+        self.scroll = scroll
+        self.text = text
+
+class EditorTabs(QObject):
+    """Ленивые вкладки файлов в QTabWidget.
+
+    Вкладка открывается записью TabRecord и получает редактор, только
+    когда становится текущей. Загруженные редакторы упорядочены по
+    последнему переключению; когда их больше files/loaded_tabs,
+    самые давние выгружаются обратно в записи. Выгружаются только
+    сохранённые файлы; курсор и прокрутка основного редактора страницы
+    остаются в записи, а разделение вида и превью Markdown при
+    следующем открытии собираются заново.
+
+    create_page(путь, текст) создаёт (редактор, страница вкладки); текст
+    None - прочитать файл, ошибки чтения (OSError) пробрасываются. Если
+    редактор дочитывает файл в фоне (editor.loader), отмена или ошибка
+    загрузки закрывают вкладку.
+    """
+    # путь, сообщение об ошибке
+    load_failed = pyqtSignal(str, str)
+
+    LOADED_TABS = 20
+
+    def __init__(self, tabs, create_page):
+        super().__init__()
+        self.tabs = tabs
+        self.create_page = create_page
+        # Загруженные страницы, от давно открытой к текущей
+        self.used = []
+        self.replacing = False
+        self.limit = self.LOADED_TABS
+        self.apply_limit()
+        tabs.currentChanged.connect(self.current_changed)
+
+    def apply_limit(self):
+        settings = QSettings('RytonStudio Beta', 'Editor')
+        self.limit = max(1, int(settings.value("files/loaded_tabs", self.LOADED_TABS)))
+        self.trim()
+
+    def find(self, file_path):
+        """Индекс вкладки файла (записи или редактора) или -1"""
+        for index in range(self.tabs.count()):
+            page = self.tabs.widget(index)
+            if isinstance(page, TabRecord):
+                if page.file_path == file_path:
+                    return index
+                continue
+            editor = self.primary_editor(page)
+            if editor is not None and editor.file_path == file_path:
+                return index
+        return -1
+
+    def primary_editor(self, page):
+        """Основной редактор страницы: сама страница, а у разделённого вида
+        и Markdown с превью - редактор внутри разделителя; иначе None"""
+        if isinstance(page, CodeEditor):
+            return page
+        for editor in page.findChildren(CodeEditor):
+            if editor.source is None:
+                return editor
+        return None
+
+    def open(self, file_path, activate=True, text=None):
+        """Вкладка файла (существующая или новая запись); индекс вкладки"""
+        index = self.find(file_path)
+        if index < 0:
+            index = self.tabs.addTab(TabRecord(file_path, text=text), os.path.basename(file_path))
+        if activate:
+            if self.tabs.currentIndex() == index:
+                self.current_changed(index)
+            else:
+                self.tabs.setCurrentIndex(index)
+        return index
+
+    def close(self, index):
+        page = self.tabs.widget(index)
+        self.tabs.removeTab(index)
+        if page in self.used:
+            self.used.remove(page)
+        page.deleteLater()
+
+    def close_page(self, page):
+        index = self.tabs.indexOf(page)
+        if index >= 0:
+            self.close(index)
+
+    def replace(self, index, page):
+        """Меняет страницу вкладки, сохраняя заголовок и текущую вкладку"""
+        tabs = self.tabs
+        current = tabs.currentIndex()
+        title = tabs.tabText(index)
+        tip = tabs.tabToolTip(index)
+        old = tabs.widget(index)
+        self.replacing = True
+        try:
+            tabs.removeTab(index)
+            tabs.insertTab(index, page, title)
+            tabs.setTabToolTip(index, tip)
+            tabs.setCurrentIndex(current)
+        finally:
+            self.replacing = False
+        return old
+
+    def current_changed(self, index):
+        if self.replacing or index < 0:
+            return
+        page = self.tabs.widget(index)
+        if isinstance(page, TabRecord):
+            page = self.materialize(index)
+            if page is None:
+                return
+        if page in self.used:
+            self.used.remove(page)
+        self.used.append(page)
+        self.trim()
+
+    def materialize(self, index):
+        record = self.tabs.widget(index)
+        try:
+            editor, page = self.create_page(record.file_path, record.text)
+        except OSError as error:
+            self.close(index)
+            self.load_failed.emit(record.file_path, str(error))
+            return None
+        if record.text is not None:
+            editor.document().setModified(True)
+        position = (record.anchor, record.position, record.scroll)
+        if editor.loader is not None:
+            # Большой файл дочитывается в фоне (см. DocumentLoader)
+            path = record.file_path
+            editor.loader.loaded.connect(lambda *_: self.restore_position(editor, *position))
+            editor.loader.cancelled.connect(lambda: self.close_page(page))
+            editor.loader.failed.connect(lambda error: (self.close_page(page),
+                                                        self.load_failed.emit(path, error)))
+        else:
+            self.restore_position(editor, *position)
+        self.replace(index, page)
+        record.deleteLater()
+        editor.setFocus()
+        return page
+
+    def restore_position(self, editor, anchor, position, scroll):
+        cursor = editor.textCursor()
+        length = editor.document().characterCount() - 1
+        cursor.setPosition(min(anchor, length))
+        cursor.setPosition(min(position, length), QTextCursor.MoveMode.KeepAnchor)
+        editor.setTextCursor(cursor)
+        if scroll:
+            # Диапазон прокрутки появится после раскладки редактора
+            QTimer.singleShot(0, lambda: editor.verticalScrollBar().setValue(scroll))
+
+    def unloadable(self, page):
+        editor = self.primary_editor(page)
+        return (editor is not None and bool(editor.file_path)
+                and editor.loader is None and not editor.document().isModified())
+
+    def unload(self, index):
+        page = self.tabs.widget(index)
+        editor = self.primary_editor(page)
+        cursor = editor.textCursor()
+        record = TabRecord(editor.file_path, cursor.position(), cursor.anchor(),
+                           editor.verticalScrollBar().value())
+        self.replace(index, record)
+        if page in self.used:
+            self.used.remove(page)
+        page.deleteLater()
+
+    def trim(self):
+        """Выгружает давние сохранённые редакторы сверх лимита"""
+        tabs = self.tabs
+        loaded = [tabs.widget(index) for index in range(tabs.count())
+                  if not isinstance(tabs.widget(index), TabRecord)]
+        excess = len(loaded) - self.limit
+        if excess <= 0:
+            return
+        # Страницы, добавленные мимо open (новый файл), считаются самыми давними
+        self.used = [page for page in self.used if page in loaded]
+        order = [page for page in loaded if page not in self.used] + self.used
+        current = tabs.currentWidget()
+        for page in order:
+            if excess <= 0:
+                break
+            if page is current or not self.unloadable(page):
+                continue
+            self.unload(tabs.indexOf(page))
+            excess -= 1
@@ -1,21 +1,38 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, QPlainTextEdit,
                             QTreeView, QTextEdit, QCompleter, QInputDialog, QPushButton,
                             QInputDialog, QMenu, QLineEdit, QMessageBox, QHBoxLayout,
-                            QVBoxLayout, QTreeWidget, QTreeWidgetItem, QLabel, QSplitter)
-from PyQt6.QtCore import Qt, QUrl, QDir, QProcess, QStringListModel, QTimer, QPoint, QEvent, QDir,QSize
+                            QVBoxLayout, QTreeWidget, QTreeWidgetItem, QLabel, QSplitter, QToolTip)
+from PyQt6.QtCore import Qt, QUrl, QDir, QProcess, QStringListModel, QTimer, QPoint, QEvent, QDir,QSize, pyqtSignal, QRectF
 from PyQt6.QtGui import (QSyntaxHighlighter, QTextCursor, QTextCharFormat, QColor, QFont,
                         QStandardItemModel, QStandardItem, QPainter, QFontDatabase,
-                        QKeySequence, QShortcut, QPixmap, QFileSystemModel, QIcon)
+                        QKeySequence, QShortcut, QPixmap, QFileSystemModel, QIcon, QTextLayout,
+                        QTextBlockUserData, QImage)
 
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage, QWebEngineSettings
 
 from git import Repo
 
+from widgets.Highlighting import TokenizeWorker, TokenCache
+from widgets.Lexer import get_lexer, BRACE_PAIRS, CLOSING_BRACES, ZIG
+from widgets.LanguageModes import LanguageMode, register_mode, mode_for_path
+from widgets.CompletionIndex import CompletionIndex
+from widgets.SymbolIndex import ProjectSymbolIndex
+from widgets.FindBar import FindBar, apply_edits, minimal_edit, ASTRAL
+from widgets.ProjectRename import ProjectRename
+from widgets.CloneDetection import CloneDetector, ClonesDialog
+from widgets.Diagnostics import DiagnosticsService
+from widgets.BraceIndex import BraceIndex
+from widgets.Gutter import Gutter
+from widgets.GitChanges import LineChanges
+from widgets.FileLoader import DocumentLoader, read_text, encode_text
+
 import platform
 import os
 import re
 
+from collections import Counter
+
 def show_error(self, title, message):
     QMessageBox.critical(self, title, message)
 
@@ -269,6 +286,15 @@ class GitWidget(QWidget):
             self.repo.index.commit(self.commit_msg.text())
             self.commit_msg.clear()
             self.refresh_status()
+            self.refresh_editors()
+
+    def refresh_editors(self):
+        # HEAD сдвинулся - метки изменений открытых файлов считаются заново
+        window = self.window()
+        if hasattr(window, 'open_editors'):
+            for editor in window.open_editors().values():
+                if editor.changes is not None:
+                    editor.changes.refresh()
 
     def sync_repository(self):
         # Pull
@@ -277,6 +303,7 @@ class GitWidget(QWidget):
         # Push
         origin.push()
         self.refresh_status()
+        self.refresh_editors()
 
     def show_diff(self, item):
         file_path = item.text(0)
@@ -335,105 +362,241 @@ class GitWidget(QWidget):
         """)
         return btn
 
-class RytonHighlighter(QSyntaxHighlighter):
+class BlockData(QTextBlockUserData):
+    """Токены блока, посчитанные подсветчиком.
+
+    Подсветка, автодополнение, проверки рефакторинга и поиск парных скобок
+    читают их отсюда вместо собственных проходов регулярками по тексту.
+    """
+    def __init__(self, tokens):
+        super().__init__()
+        self.tokens = tokens
+
+class StatefulHighlighter(QSyntaxHighlighter):
+    """Подсветчик поверх общего лексера (widgets/Lexer.py).
+
+    Состояние блока: 0 - обычный текст, N > 0 - внутри N-й многострочной
+    конструкции языка. Qt сам продолжает подсветку следующих блоков только
+    пока их конечное состояние меняется, поэтому правка перекрашивает лишь
+    затронутый участок, а не весь документ. Токены блока сохраняются в
+    BlockData для остальных возможностей редактора.
+    """
+    NORMAL = 0
+    # Язык лексера, он же ключ в общем TokenCache
+    LANGUAGE = None
+    # Документы длиннее этого числа строк токенизируются в фоновом потоке
+    ASYNC_THRESHOLD = 2000
+    # Сколько блоков применять за один проход таймера
+    APPLY_SLICE = 300
+
+    # Номера первого и последнего перекрашенных блоков; сигнал собирает все
+    # перекраски одного прохода цикла событий, включая продолжение
+    # многострочных конструкций и фоновую подсветку
+    blocks_formatted = pyqtSignal(int, int)
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.highlighting_rules = []
+        self.lexer = get_lexer(self.LANGUAGE)
+        # вид токена -> формат; токены без формата не раскрашиваются
+        self.formats = {}
+
+        # Фоновая токенизация больших документов
+        self.worker = None
+        self.generation = 0
+        self.loading = False
+        self.precomputed = {}
+        self.pending = []
+        self.apply_timer = QTimer()
+        self.apply_timer.timeout.connect(self.apply_pending)
+
+        self.formatted_range = None
+        self.notify_timer = QTimer()
+        self.notify_timer.setSingleShot(True)
+        self.notify_timer.timeout.connect(self.notify_formatted)
+
+    def add_format(self, name, color):
+        text_format = QTextCharFormat()
+        text_format.setForeground(QColor(color))
+        self.formats[name] = text_format
+
+    def mark_formatted(self, first, last):
+        if self.formatted_range is None:
+            self.formatted_range = (first, last)
+        else:
+            self.formatted_range = (min(first, self.formatted_range[0]),
+                                    max(last, self.formatted_range[1]))
+        if not self.notify_timer.isActive():
+            self.notify_timer.start(0)
+
+    def notify_formatted(self):
+        if self.formatted_range is not None:
+            first, last = self.formatted_range
+            self.formatted_range = None
+            self.blocks_formatted.emit(first, last)
+
+    def tokenize(self, text, state):
+        """Возвращает токены (start, length, kind) строки и состояние её конца"""
+        return TokenCache.instance().tokenize(self.LANGUAGE, self.lexer.lex, text, state)
+
+    def prepare_text(self, text, visible_lines):
+        """Готовит фоновую подсветку текста, который сейчас будет загружен.
+
+        Для больших документов запускает TokenizeWorker и переводит подсветчик
+        в режим загрузки: пока он включён, highlightBlock не токенизирует блоки
+        в GUI-потоке. Сначала считаются видимые строки, остальные догружаются
+        по мере готовности.
+        """
+        self.stop_worker()
+        lines = text.split('\n')
+        if len(lines) < self.ASYNC_THRESHOLD:
+            return
 
+        self.generation += 1
+        self.loading = True
+        self.worker = TokenizeWorker(self.tokenize, lines, self.generation)
+        self.worker.results_ready.connect(self.store_results)
+        self.worker.tokenized.connect(self.worker_done)
+        self.worker.prioritize(0, visible_lines)
+        self.worker.start()
+
+    def finish_loading(self):
+        self.loading = False
+
+    def prioritize(self, first, last):
+        """Поднимает приоритет видимых строк, пока документ ещё токенизируется"""
+        if self.worker and self.worker.isRunning():
+            self.worker.prioritize(first, last)
+
+    def stop_worker(self):
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+        self.precomputed.clear()
+        self.pending.clear()
+        self.apply_timer.stop()
+
+    def busy(self):
+        """Идёт ли ещё фоновая подсветка документа"""
+        return self.worker is not None or bool(self.pending)
+
+    def worker_done(self, generation):
+        if generation == self.generation:
+            self.worker = None
+
+    def store_results(self, generation, first, batch):
+        if generation != self.generation:
+            return
+        for text, state, spans, end_state in batch:
+            self.precomputed[(state, text)] = (spans, end_state)
+        self.pending.append([first, first + len(batch)])
+        if not self.apply_timer.isActive():
+            self.apply_timer.start(0)
+
+    def apply_pending(self):
+        """Применяет готовые результаты порциями прямо в форматы QTextLayout.
+
+        Состояние блока хранится в userState, как и у самого QSyntaxHighlighter,
+        поэтому дальнейшая инкрементальная подсветка продолжает работать.
+        """
+        budget = self.APPLY_SLICE
+        document = self.document()
+
+        while budget > 0 and self.pending and document:
+            span = self.pending[0]
+            block = document.findBlockByNumber(span[0])
+            first_block = span[0]
+            start = block.position()
+            end = start
+            while budget > 0 and span[0] < span[1] and block.isValid():
+                self.apply_block(block)
+                end = block.position() + block.length()
+                block = block.next()
+                span[0] += 1
+                budget -= 1
+            if end > start:
+                document.markContentsDirty(start, end - start)
+                self.mark_formatted(first_block, span[0] - 1)
+            if span[0] >= span[1] or not block.isValid():
+                self.pending.pop(0)
+
+        if not self.pending:
+            self.apply_timer.stop()
+            if self.worker is None:
+                self.precomputed.clear()
+
+    def apply_block(self, block):
+        previous = block.previous()
+        state = previous.userState() if previous.isValid() else self.NORMAL
+        if state < 0:
+            state = self.NORMAL
+
+        result = self.precomputed.get((state, block.text()))
+        if result is None:
+            # Текст или входное состояние поменялись - считаем как обычно
+            self.rehighlightBlock(block)
+            return
 
-        # VSCode dark theme colors
-        keyword_format = QTextCharFormat()
-        keyword_format.setForeground(QColor("#569cd6"))  # Blue for keywords
-        
-        builtin_format = QTextCharFormat()
-        builtin_format.setForeground(QColor("#4ec9b0"))  # Teal for built-ins
-        
-        string_format = QTextCharFormat()
-        string_format.setForeground(QColor("#ce9178"))  # Orange for strings
-        
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(QColor("#6a9955"))  # Green for comments
-
-        keywords = ['init', 'infinit', 'repeat', 'void', 'module import',
-                   'func', 'pack', 'if', 'else', 'elif', 'while', 'for', 'in', 
-                   'return', 'true', 'false', 'none', 'noop', 'private']
-        for word in keywords:
-            pattern = f'\\b{word}\\b'
-            self.highlighting_rules.append((re.compile(pattern), keyword_format))
-
-        builtin_format = QTextCharFormat()
-        builtin_format.setForeground(QColor("#A6E22E"))
-        builtins = ['debug', 'error', 'or', 'not', 'and', 'print', 'input', 
-                    'Main', 'Sub', 'this']
-        for word in builtins:
-            pattern = f'\\b{word}\\b'
-            self.highlighting_rules.append((re.compile(pattern), builtin_format))
-
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(QColor("#75715E"))
-        self.highlighting_rules.append((re.compile('//[^\n]*'), comment_format))
-        self.highlighting_rules.append((re.compile('</.*?/>'), comment_format))
-
-        string_format = QTextCharFormat()
-        string_format.setForeground(QColor("#E6DB74"))
-        self.highlighting_rules.append((re.compile('"[^"\\\\]*(\\\\.[^"\\\\]*)*"'), string_format))
-        self.highlighting_rules.append((re.compile("'[^'\\\\]*(\\\\.[^'\\\\]*)*'"), string_format))
+        tokens, end_state = result
+        ranges = []
+        for start, length, kind in tokens:
+            text_format = self.formats.get(kind)
+            if text_format is None:
+                continue
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = text_format
+            ranges.append(format_range)
+        block.layout().setFormats(ranges)
+        block.setUserState(end_state)
+        block.setUserData(BlockData(tokens))
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlighting_rules:
-            for match in pattern.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
+        state = self.previousBlockState()
+        if state < 0:
+            state = self.NORMAL
+
+        result = self.precomputed.get((state, text))
+        if result is None:
+            if self.loading:
+                # Блок подсветит фоновый поток, пока только передаём состояние
+                self.setCurrentBlockState(state)
+                return
+            result = self.tokenize(text, state)
+
+        tokens, state = result
+        formats = self.formats
+        for start, length, kind in tokens:
+            text_format = formats.get(kind)
+            if text_format is not None:
+                self.setFormat(start, length, text_format)
+        self.setCurrentBlockState(state)
+        self.setCurrentBlockUserData(BlockData(tokens))
+        number = self.currentBlock().blockNumber()
+        self.mark_formatted(number, number)
+
+class RytonHighlighter(StatefulHighlighter):
+    LANGUAGE = 'ryton'
 
-class ZigHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.highlighting_rules = []
-
-        # Zig keywords
-        keyword_format = QTextCharFormat()
-        keyword_format.setForeground(QColor("#569cd6"))
-        keywords = [
-            'const', 'var', 'extern', 'packed', 'export', 'pub', 'noalias',
-            'inline', 'comptime', 'nakedcc', 'stdcallcc', 'volatile', 'align',
-            'linksection', 'struct', 'enum', 'union', 'break', 'return',
-            'continue', 'asm', 'defer', 'errdefer', 'unreachable', 'try', 'catch',
-            'async', 'await', 'suspend', 'resume', 'cancel', 'if', 'else', 'switch',
-            'and', 'or', 'orelse', 'while', 'for', 'fn', 'usingnamespace', 'test'
-        ]
-        for word in keywords:
-            pattern = f'\\b{word}\\b'
-            self.highlighting_rules.append((re.compile(pattern), keyword_format))
-
-        # Types
-        type_format = QTextCharFormat()
-        type_format.setForeground(QColor("#4ec9b0"))
-        types = [
-            'bool', 'f16', 'f32', 'f64', 'f128', 'void', 'noreturn', 'type',
-            'anyerror', 'promise', 'i8', 'u8', 'i16', 'u16', 'i32', 'u32', 'i64',
-            'u64', 'i128', 'u128', 'isize', 'usize', 'c_short', 'c_ushort',
-            'c_int', 'c_uint', 'c_long', 'c_ulong', 'c_longlong', 'c_ulonglong',
-            'c_longdouble', 'c_void'
-        ]
-        for word in types:
-            pattern = f'\\b{word}\\b'
-            self.highlighting_rules.append((re.compile(pattern), type_format))
-
-        # Strings
-        string_format = QTextCharFormat()
-        string_format.setForeground(QColor("#ce9178"))
-        self.highlighting_rules.append((re.compile('"[^"\\\\]*(\\\\.[^"\\\\]*)*"'), string_format))
-        self.highlighting_rules.append((re.compile("'[^'\\\\]*(\\\\.[^'\\\\]*)*'"), string_format))
-
-        # Comments
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(QColor("#6a9955"))
-        self.highlighting_rules.append((re.compile('//[^\n]*'), comment_format))
-        self.highlighting_rules.append((re.compile('/\\*[^*]*\\*+(?:[^/*][^*]*\\*+)*/'), comment_format))
 
-    def highlightBlock(self, text):
-        for pattern, format in self.highlighting_rules:
-            for match in pattern.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
+        # VSCode dark theme colors
+        self.add_format('keyword', "#569cd6")  # Blue for keywords
+        self.add_format('builtin', "#A6E22E")
+        self.add_format('comment', "#75715E")
+        self.add_format('string', "#E6DB74")
+
+class ZigHighlighter(StatefulHighlighter):
+    LANGUAGE = 'zig'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.add_format('keyword', "#569cd6")
+        self.add_format('type', "#4ec9b0")
+        self.add_format('string', "#ce9178")
+        self.add_format('comment', "#6a9955")
 
 class ZigSnippets:
     def __init__(self):
@@ -465,83 +628,6 @@ class ZigSnippets:
             }
         }
 
-class LineNumberArea(QWidget):
-    def __init__(self, editor):
-        super().__init__(editor)
-        self.editor = editor
-
-    def sizeHint(self):
-        return QSize(self.editor.lineNumberAreaWidth(), 0)
-
-    def paintEvent(self, event):
-        self.editor.lineNumberAreaPaintEvent(event)
-
-class RefactoringManager:
-    def __init__(self, editor):
-        self.editor = editor
-        self.suggestions = []
-
-    def suggest_improvements(self):
-        """Анализирует код и предлагает улучшения"""
-        cursor = self.editor.textCursor()
-        text = self.editor.toPlainText()
-        line = cursor.blockNumber() + 1
-        
-        # Анализ длинных функций
-        self.check_function_length(text, line)
-        # Анализ сложных условий
-        self.check_complex_conditions(text, line)
-        # Анализ повторяющегося кода
-        self.check_code_duplication(text)
-        
-        return self.suggestions
-
-    def rename_symbol(self, old_name, new_name):
-        """Переименовывает переменную/функцию во всем файле"""
-        text = self.editor.toPlainText()
-        cursor = self.editor.textCursor()
-        
-        # Сохраняем позицию курсора
-        position = cursor.position()
-        
-        # Находим все вхождения символа
-        pattern = r'\b' + old_name + r'\b'
-        new_text = re.sub(pattern, new_name, text)
-        
-        # Обновляем текст
-        self.editor.setPlainText(new_text)
-        
-        # Восстанавливаем позицию курсора
-        cursor.setPosition(position)
-        self.editor.setTextCursor(cursor)
-
-    def extract_method(self, start_line, end_line, new_name):
-        """Извлекает выделенный код в отдельную функцию"""
-        cursor = self.editor.textCursor()
-        
-        # Получаем выделенный текст
-        cursor.movePosition(QTextCursor.MoveOperation.Start)
-        cursor.movePosition(QTextCursor.MoveOperation.Down, n=start_line-1)
-        start = cursor.position()
-        cursor.movePosition(QTextCursor.MoveOperation.Down, n=end_line-start_line+1)
-        end = cursor.position()
-        
-        cursor.setPosition(start)
-        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
-        selected_code = cursor.selectedText()
-        
-        # Создаем новую функцию
-        indent = "    "
-        new_function = f"\nfunc {new_name} {{\n{indent}{selected_code}\n}}\n"
-        
-        # Вставляем функцию и заменяем старый код вызовом
-        cursor.removeSelectedText()
-        cursor.insertText(f"{new_name}()")
-        
-        # Добавляем определение функции в конец файла
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        cursor.insertText(new_function)
-
 class CodeSnippets:
     def __init__(self):
         self.snippets = {
@@ -573,85 +659,232 @@ class CodeSnippets:
         }
 
 class CodeCompleter(QCompleter):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, keywords=(), shared=None):
         super().__init__(parent)
-        self.keywords = [
-            'this', 'init', 'infinit', 'repeat', 'void', 'module import',
-            'func', 'pack', 'if', 'else', 'elif', 'while', 'for', 'in',
-            'return', 'true', 'false', 'none', 'noop', 'debug', 'error',
-            'or', 'not', 'and', 'print', 'input', 'sub', 'pylib:', 
-            'jvmlib:', 'private'
-        ]
-
-        self.dynamic_words = set()
+        # Словарь языка берётся из языкового режима редактора
+        self.keywords = list(keywords)
+
+        # Слова из определений в документе -> число определяющих их блоков.
+        # Вид разделённого окна берёт слова у подсказок основного редактора
+        # (shared), свой у него только список подсказок
+        if shared is not None:
+            self.dynamic_words = shared.dynamic_words
+            self.index = shared.index
+        else:
+            self.dynamic_words = Counter()
+            self.index = CompletionIndex(self.keywords)
         self.setModel(QStringListModel())
         self.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.update_model()
-
-    def calculate_similarity(self, pattern, word):
-        if not pattern or not word:
-            return 0
-        
-        pattern = pattern.lower()
-        word = word.lower()
-        
-        # Находим последовательные совпадения
-        i = 0
-        j = 0
-        matches = 0
-        
-        while i < len(pattern) and j < len(word):
-            if pattern[i] == word[j]:
-                matches += 1
-                i += 1
-            j += 1
-            
-        # Вычисляем процент совпадения
-        similarity = (matches / len(pattern)) * 100
-        
-        # Бонус за совпадение в начале слова
-        if word.startswith(pattern):
-            similarity += 20
-            
-        return similarity
-
-    def update_model(self):
-        all_words = list(set(self.keywords + list(self.dynamic_words)))
-        self.model().setStringList(sorted(all_words))
+        # Отбор и ранжирование делает индекс, модель хранит только подсказки
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+
+    def suggestions(self, pattern, limit=50):
+        """Слова документа и языка, затем определения из других файлов проекта"""
+        words = self.index.search(pattern, limit)
+        project = ProjectSymbolIndex.instance()
+        if project is not None and len(words) < limit:
+            seen = set(words)
+            for name in project.search(pattern, limit):
+                if name not in seen:
+                    words.append(name)
+                    if len(words) == limit:
+                        break
+        return words
+
+    def add_words(self, words):
+        for word in words:
+            self.dynamic_words[word] += 1
+            if self.dynamic_words[word] == 1:
+                self.index.add(word)
+
+    def remove_words(self, words):
+        """Снимает по одной ссылке; слово уходит из подсказок вместе
+        с последним определением"""
+        for word in words:
+            count = self.dynamic_words[word] - 1
+            if count > 0:
+                self.dynamic_words[word] = count
+                continue
+            del self.dynamic_words[word]
+            if word not in self.keywords:
+                self.index.discard(word)
 
 class MinimapWidget(QWidget):
+    """Миниатюра документа в кэшированном QImage.
+
+    Каждая строка - полоска высотой LINE_HEIGHT, где непробельные токены
+    нарисованы цветом подсветки. Изображение размером с виджет хранит только
+    видимые в миниатюре строки; правка перерисовывает лишь изменённые строки
+    (по contentsChange и blocks_formatted подсветчика), а прокрутка и
+    вставка строк сдвигают уже нарисованное вместо полной перерисовки.
+    """
+    LINE_HEIGHT = 2
+    CHAR_WIDTH = 0.5
+    BACKGROUND = QColor("#252526")
+    TEXT_COLOR = QColor("#6e7681")
+    SLIDER_COLOR = QColor(255, 255, 255, 28)
+
     def __init__(self, editor):
         super().__init__()
         self.editor = editor
         self.setFixedWidth(60)
         self.setStyleSheet("background-color: #252526;")
-        
-        # Create preview text edit
-        self.preview = QPlainTextEdit()
-        self.preview.setReadOnly(True)
-        self.preview.setFont(QFont("Victor Mono Medium", 2))
-        self.preview.setStyleSheet("""
-            QPlainTextEdit {
-                background-color: transparent;
-                color: #6e7681;
-                border: none;
-            }
-        """)
-        
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(self.preview)
-        
+
+        self.image = QImage()
+        self.first_line = 0
+        self.line_count = editor.document().blockCount()
+        self.dirty = None
+
+        self.colors = {}
+        highlighter = editor.highlighter
+        if isinstance(highlighter, StatefulHighlighter):
+            for kind, text_format in highlighter.formats.items():
+                self.colors[kind] = text_format.foreground().color()
+            highlighter.blocks_formatted.connect(self.mark_dirty)
+
+        self.flush_timer = QTimer()
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+
         # Connect signals
         self.editor.verticalScrollBar().valueChanged.connect(self.sync_scroll)
-        self.editor.textChanged.connect(self.update_content)
-        
+        self.editor.document().contentsChange.connect(self.on_contents_change)
+
+    def capacity(self):
+        return max(1, self.height() // self.LINE_HEIGHT)
+
+    def target_first_line(self):
+        """Первая строка миниатюры: прокручивается пропорционально редактору"""
+        spare = self.editor.document().blockCount() - self.capacity()
+        if spare <= 0:
+            return 0
+        bar = self.editor.verticalScrollBar()
+        ratio = bar.value() / bar.maximum() if bar.maximum() else 0
+        return int(ratio * spare)
+
     def sync_scroll(self):
-        ratio = self.editor.verticalScrollBar().value() / self.editor.verticalScrollBar().maximum()
-        self.preview.verticalScrollBar().setValue(int(ratio * self.preview.verticalScrollBar().maximum()))
-        
-    def update_content(self):
-        self.preview.setPlainText(self.editor.toPlainText())
+        first = self.target_first_line()
+        if first != self.first_line:
+            self.shift_rows(self.first_line - first, 0)
+            exposed = first - self.first_line
+            self.first_line = first
+            if exposed > 0:
+                self.render_lines(first + self.capacity() - exposed, first + self.capacity() - 1)
+            else:
+                self.render_lines(first, first - exposed - 1)
+        self.update()
+
+    def shift_rows(self, lines, from_line):
+        """Сдвигает нарисованные строки начиная с from_line на lines строк"""
+        if self.image.isNull() or not lines:
+            return
+        top = max(0, (from_line - self.first_line) * self.LINE_HEIGHT)
+        shifted = self.image.copy()
+        painter = QPainter(shifted)
+        painter.fillRect(0, top, shifted.width(), shifted.height() - top, self.BACKGROUND)
+        painter.setClipRect(0, top, shifted.width(), shifted.height() - top)
+        painter.drawImage(0, lines * self.LINE_HEIGHT, self.image)
+        painter.end()
+        self.image = shifted
+
+    def on_contents_change(self, position, removed, added):
+        document = self.editor.document()
+        first = document.findBlock(position).blockNumber()
+        end_block = document.findBlock(position + added)
+        last = end_block.blockNumber() if end_block.isValid() else document.blockCount() - 1
+
+        delta = document.blockCount() - self.line_count
+        self.line_count = document.blockCount()
+        if delta:
+            # Строки ниже правки уже нарисованы - сдвигаем их
+            self.shift_rows(delta, last - delta + 1)
+            if delta < 0:
+                bottom = self.first_line + self.capacity()
+                self.mark_dirty(bottom + delta, bottom - 1)
+        self.mark_dirty(first, last)
+
+    def mark_dirty(self, first, last):
+        if self.dirty is None:
+            self.dirty = (first, last)
+        else:
+            self.dirty = (min(first, self.dirty[0]), max(last, self.dirty[1]))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(0)
+
+    def flush(self):
+        if self.dirty is not None:
+            first, last = self.dirty
+            self.dirty = None
+            self.render_lines(first, last)
+        # Изменение числа строк могло сдвинуть окно миниатюры
+        self.sync_scroll()
+
+    def render_lines(self, first, last):
+        if self.image.isNull():
+            return
+        first = max(first, self.first_line)
+        last = min(last, self.first_line + self.capacity() - 1)
+        if first > last:
+            return
+
+        document = self.editor.document()
+        block = document.findBlockByNumber(first)
+        painter = QPainter(self.image)
+        width = self.image.width()
+        bar_height = max(1, self.LINE_HEIGHT - 1)
+
+        for line in range(first, last + 1):
+            y = (line - self.first_line) * self.LINE_HEIGHT
+            painter.fillRect(0, y, width, self.LINE_HEIGHT, self.BACKGROUND)
+            if not block.isValid():
+                continue
+
+            text = block.text()
+            tokens = self.editor.block_tokens(block)
+            if tokens:
+                runs = ((start, length, self.colors.get(kind, self.TEXT_COLOR))
+                        for start, length, kind in tokens)
+            else:
+                runs = ((match.start(), match.end() - match.start(), self.TEXT_COLOR)
+                        for match in re.finditer(r'\S+', text))
+            for start, length, color in runs:
+                x = start * self.CHAR_WIDTH
+                if x >= width:
+                    break
+                painter.fillRect(QRectF(x, y, max(1.0, length * self.CHAR_WIDTH), bar_height), color)
+            block = block.next()
+        painter.end()
+
+    def render_all(self):
+        self.image = QImage(self.size(), QImage.Format.Format_ARGB32_Premultiplied)
+        self.image.fill(self.BACKGROUND)
+        self.first_line = self.target_first_line()
+        self.render_lines(self.first_line, self.first_line + self.capacity() - 1)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.render_all()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self.image)
+
+        # Рамка видимой в редакторе области
+        first = self.editor.firstVisibleBlock().blockNumber()
+        visible = self.editor.viewport().height() // max(1, self.editor.fontMetrics().height())
+        y = (first - self.first_line) * self.LINE_HEIGHT
+        painter.fillRect(0, y, self.width(), visible * self.LINE_HEIGHT, self.SLIDER_COLOR)
+
+    def mousePressEvent(self, event):
+        self.scroll_editor_to(event.position().y())
+
+    def mouseMoveEvent(self, event):
+        self.scroll_editor_to(event.position().y())
+
+    def scroll_editor_to(self, y):
+        line = self.first_line + int(y) // self.LINE_HEIGHT
+        visible = self.editor.viewport().height() // max(1, self.editor.fontMetrics().height())
+        self.editor.verticalScrollBar().setValue(max(0, line - visible // 2))
 
 class GhostTextOverlay(QWidget):
     def __init__(self, editor):
@@ -683,102 +916,112 @@ class GhostTextOverlay(QWidget):
 class RefactoringManager:
     def __init__(self, editor):
         self.editor = editor
-        self.suggestions = []
-
-    def check_function_length(self, text, line):
-        """Проверяет длину функций"""
-        functions = re.finditer(r'func\s+(\w+)\s*{([^}]*)}', text)
-        for func in functions:
-            lines = func.group(2).count('\n')
-            if lines > 20:
-                self.suggestions.append(
-                    f"Функция '{func.group(1)}' слишком длинная ({lines} строк). Рекомендуется разбить на части."
-                )
-
-    def check_complex_conditions(self, text, line):
-        """Проверяет сложность условий"""
-        conditions = re.finditer(r'if\s+([^{]+){', text)
-        for cond in conditions:
-            condition = cond.group(1)
-            if condition.count('and') + condition.count('or') > 2:
-                self.suggestions.append(
-                    f"Сложное условие. Рекомендуется упростить: {condition}"
-                )
-
-    def check_code_duplication(self, text):
-        """Проверяет повторяющийся код"""
-        lines = text.split('\n')
-        for i in range(len(lines)):
-            for j in range(i + 1, len(lines)):
-                if len(lines[i]) > 20 and lines[i] == lines[j]:
-                    self.suggestions.append(
-                        f"Обнаружен повторяющийся код в строках {i+1} и {j+1}"
-                    )
 
     def suggest_improvements(self):
-        """Анализирует код и предлагает улучшения"""
-        cursor = self.editor.textCursor()
-        text = self.editor.toPlainText()
-        line = cursor.blockNumber() + 1
-        
-        # Анализ длинных функций
-        self.check_function_length(text, line)
-        # Анализ сложных условий
-        self.check_complex_conditions(text, line)
-        # Анализ повторяющегося кода
-        self.check_code_duplication(text)
-        
-        return self.suggestions
+        """Предложения по улучшению кода из последней фоновой диагностики
+        (DiagnosticsService); сам анализ здесь не выполняется"""
+        if self.editor.diagnostics is None:
+            return []
+        return self.editor.diagnostics.messages()
+
+    def rename_edits(self, old_name, new_name):
+        """Правки переименования по токенам документа и вхождения для
+        предпросмотра: ([(start, end, text), ...], [(line, column, text), ...]).
+        Строки и комментарии не затрагиваются."""
+        edits = []
+        occurrences = []
+        block = self.editor.document().begin()
+        while block.isValid():
+            text = block.text()
+            astral = ASTRAL.search(text) is not None
+            for start, length, kind in self.editor.block_tokens(block):
+                if kind != 'identifier' or text[start:start + length] != old_name:
+                    continue
+                # Позиции документа - в единицах UTF-16
+                offset = len(text[:start].encode('utf-16-le')) // 2 if astral else start
+                position = block.position() + offset
+                edits.append((position, position + len(old_name.encode('utf-16-le')) // 2, new_name))
+                occurrences.append((block.blockNumber(), start, text))
+            block = block.next()
+        return edits, occurrences
 
     def rename_symbol(self, old_name, new_name):
-        """Переименовывает переменную/функцию во всем файле"""
-        text = self.editor.toPlainText()
-        cursor = self.editor.textCursor()
-        
-        # Сохраняем позицию курсора
-        position = cursor.position()
-        
-        # Находим все вхождения символа
-        pattern = r'\b' + old_name + r'\b'
-        new_text = re.sub(pattern, new_name, text)
-        
-        # Обновляем текст
-        self.editor.setPlainText(new_text)
-        
-        # Восстанавливаем позицию курсора
-        cursor.setPosition(position)
-        self.editor.setTextCursor(cursor)
+        """Переименовывает переменную/функцию во всем файле.
+
+        Замены идут правками курсора одной транзакцией: история отмены
+        сохраняется, курсор остаётся на месте.
+        """
+        edits, _ = self.rename_edits(old_name, new_name)
+        apply_edits(self.editor.document(), edits)
 
     def extract_method(self, start_line, end_line, new_name):
-        """Извлекает выделенный код в отдельную функцию"""
-        cursor = self.editor.textCursor()
-        
-        # Получаем выделенный текст
-        cursor.movePosition(QTextCursor.MoveOperation.Start)
-        cursor.movePosition(QTextCursor.MoveOperation.Down, n=start_line-1)
-        start = cursor.position()
-        cursor.movePosition(QTextCursor.MoveOperation.Down, n=end_line-start_line+1)
-        end = cursor.position()
-        
-        cursor.setPosition(start)
-        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
-        selected_code = cursor.selectedText()
-        
-        # Создаем новую функцию
-        indent = "    "
-        new_function = f"\nfunc {new_name} {{\n{indent}{selected_code}\n}}\n"
-        
-        # Вставляем функцию и заменяем старый код вызовом
-        cursor.removeSelectedText()
-        cursor.insertText(f"{new_name}()")
-        
-        # Добавляем определение функции в конец файла
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        cursor.insertText(new_function)
+        """Извлекает строки start_line..end_line (с нуля) в отдельную функцию.
+
+        Границы берутся по индексу скобок: если в строках есть скобка,
+        парная которой снаружи, захватываются строки до неё, так что блок
+        не разрезается. Функция вставляется перед внешним блоком, где был
+        код (в конец файла, если код не внутри блока), код заменяется
+        вызовом; всё одной правкой.
+        """
+        editor = self.editor
+        document = editor.document()
+        start_line, end_line = editor.balanced_lines(start_line, end_line)
+        first = document.findBlockByNumber(start_line)
+        last = document.findBlockByNumber(end_line)
+
+        lines = []
+        block = first
+        while block.isValid() and block.blockNumber() <= end_line:
+            lines.append(block.text())
+            block = block.next()
+        indent = lines[0][:len(lines[0]) - len(lines[0].lstrip())]
+        body = []
+        for line in lines:
+            if not line.strip():
+                body.append("")
+            elif line.startswith(indent):
+                body.append("    " + line[len(indent):])
+            else:
+                body.append("    " + line.lstrip())
+        new_function = f"func {new_name} {{\n" + "\n".join(body) + "\n}\n"
+
+        edits = [(first.position(), last.position() + last.length() - 1, f"{indent}{new_name}()")]
+        enclosing = [(start, end) for start, end in editor.braces.enclosing(start_line, editor.block_braces)
+                     if start < start_line]
+        if enclosing:
+            position = document.findBlockByNumber(enclosing[0][0]).position()
+            edits.append((position, position, new_function + "\n"))
+        else:
+            position = document.characterCount() - 1
+            edits.append((position, position, "\n" + new_function))
+        apply_edits(document, edits)
+
+# Языковые режимы: расширение файла -> подсветка, сниппеты, словарь, комментарий
+register_mode(LanguageMode(
+    'ryton', ['.ry'], RytonHighlighter, CodeSnippets,
+    keywords=[
+        'this', 'init', 'infinit', 'repeat', 'void', 'module import',
+        'func', 'pack', 'if', 'else', 'elif', 'while', 'for', 'in',
+        'return', 'true', 'false', 'none', 'noop', 'debug', 'error',
+        'or', 'not', 'and', 'print', 'input', 'sub', 'pylib:', 
+        'jvmlib:', 'private'
+    ],
+    comment='//'))
+register_mode(LanguageMode(
+    'zig', ['.zig'], ZigHighlighter, ZigSnippets,
+    keywords=ZIG['keywords'] + ZIG['types'],
+    comment='//'))
+register_mode(LanguageMode('markdown', ['.md'], MarkdownHighlighter))
 
 class CodeEditor(QPlainTextEdit):
-    def __init__(self):
+    def __init__(self, file_path=None, source=None):
         super().__init__()
+        # Вид разделённого окна (source - основной редактор вкладки): тот же
+        # QTextDocument, подсветка и службы документа, свои курсор,
+        # прокрутка и поле номеров строк
+        self.source = source
+        if source is not None:
+            self.setDocument(source.document())
         font_id = QFontDatabase.addApplicationFont("/usr/local/share/ryton-studio/fonts/JetBrainsMono.ttf")
         font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
         
@@ -795,11 +1038,49 @@ class CodeEditor(QPlainTextEdit):
         """)
         self.installEventFilter(self)
         self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
-        self.highlighter = RytonHighlighter(self.document())
+
+        # Языковой режим определяется по расширению файла: вкладка платит
+        # только за язык, который в ней открыт
+        self.file_path = file_path
+        self.language = mode_for_path(file_path)
+        if source is not None:
+            self.highlighter = source.highlighter
+        else:
+            self.highlighter = self.language.create_highlighter(self.document())
+        self.verticalScrollBar().valueChanged.connect(self.prioritize_visible_blocks)
         self.refactoring = RefactoringManager(self)
+
+        # Дополнительные выделения: результаты поиска и парные скобки
+        self.search_selections = []
+        self.brace_selections = []
+        self.find_bar = None
+        self.clone_detector = None
+
+        # Фоновое открытие большого файла (см. load_text); кодировка и
+        # перевод строки файла, определённые при открытии, - с ними файл
+        # и сохраняется (write_file). lossy - при открытии были байты, не
+        # декодированные в этой кодировке и заменённые на U+FFFD
+        self.loader = None
+        self.encoding = 'utf-8'
+        self.newline = '\n'
+        self.lossy = False
+
+        # Индекс скобок: подсветка парной скобки, сворачивание и границы
+        # блоков для рефакторинга
+        if source is not None:
+            self.braces = source.braces
+        else:
+            self.braces = BraceIndex(self.document().blockCount())
+            self.document().contentsChange.connect(self.track_braces)
+            if isinstance(self.highlighter, StatefulHighlighter):
+                self.highlighter.blocks_formatted.connect(self.braces.invalidate)
+
+        self.cursorPositionChanged.connect(self.match_braces)
         
-        # Добавляем виджет для номеров строк
-        self.line_numbers = LineNumberArea(self)
+        # Поле слева от текста: номера строк, сворачивание, диагностика и
+        # изменения относительно HEAD ({номер блока: вид изменения})
+        self.line_changes = {}
+        self.line_numbers = Gutter(self)
         
         # Подключаем обновление области номеров строк
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
@@ -811,21 +1092,55 @@ class CodeEditor(QPlainTextEdit):
         
         # Дефолтный код остаётся без изменений
         default_code = ''''''
-        self.setPlainText(default_code)
+        if source is None:
+            self.setPlainText(default_code)
 
-        self.completer = CodeCompleter(self)
+        self.completer = CodeCompleter(self, self.language.keywords,
+                                       source.completer if source is not None else None)
         self.completer.setWidget(self)
         self.completer.activated.connect(self.insertCompletion)
-        
-        # Таймер для обновления подсказок
-        self.update_timer = QTimer()
-        self.update_timer.setSingleShot(True)
-        self.update_timer.timeout.connect(self.update_completions)
+
+        # Таблица символов: определения каждого блока (None - блок ещё не
+        # разобран). Правки пересчитывают только затронутые блоки. Вид
+        # разделённого окна пользуется таблицей и таймером основного редактора
+        if source is not None:
+            self.update_timer = source.update_timer
+            self.block_symbols = source.block_symbols
+        else:
+            # Таймер для обновления подсказок
+            self.update_timer = QTimer()
+            self.update_timer.setSingleShot(True)
+            self.update_timer.timeout.connect(self.update_completions)
+
+            self.block_symbols = [None] * self.document().blockCount()
+            if isinstance(self.highlighter, StatefulHighlighter):
+                self.document().contentsChange.connect(self.track_symbols)
+                self.highlighter.blocks_formatted.connect(self.invalidate_symbols)
+
+        # Фоновая диагностика: волнистые подчёркивания и метки у номеров строк
+        self.diagnostics = None
+        self.diagnostic_selections = []
+        self.diagnostic_severities = []
+        if source is not None:
+            self.diagnostics = source.diagnostics
+        elif isinstance(self.highlighter, StatefulHighlighter):
+            self.diagnostics = DiagnosticsService(self.document(), self.highlighter)
+        if self.diagnostics is not None:
+            self.diagnostics.diagnostics_changed.connect(self.show_diagnostics)
+
+        # Изменения строк относительно HEAD (см. line_changes)
+        self.changes = None
+        if source is not None:
+            self.changes = source.changes
+        elif file_path:
+            self.changes = LineChanges(self.document(), file_path)
+        if self.changes is not None:
+            self.changes.changes_changed.connect(self.show_line_changes)
         
         # Подключаем обработчик изменения текста
         self.textChanged.connect(self.handle_text_changed)
 
-        self.snippets = CodeSnippets()
+        self.snippets = self.language.create_snippets()
         self.ghost_text = None
         self.ghost_visible = False
         self.ghost_format = QTextCharFormat()
@@ -842,6 +1157,279 @@ class CodeEditor(QPlainTextEdit):
 
         self.setupShortcuts()
 
+        if source is not None:
+            # Метки уже посчитаны для основного вида
+            if self.diagnostics is not None:
+                self.show_diagnostics()
+            if self.changes is not None:
+                self.show_line_changes()
+
+    def setPlainText(self, text):
+        # Большие файлы подсвечиваются в фоне, начиная с видимой области
+        highlighter = getattr(self, 'highlighter', None)
+        if isinstance(highlighter, StatefulHighlighter):
+            line_height = max(1, self.fontMetrics().height())
+            visible_lines = self.viewport().height() // line_height + 1
+            highlighter.prepare_text(text, visible_lines)
+            super().setPlainText(text)
+            highlighter.finish_loading()
+        else:
+            super().setPlainText(text)
+        if getattr(self, 'changes', None) is not None:
+            self.changes.refresh()
+
+    def write_file(self, file_path):
+        """Сохраняет текст в file_path в кодировке и с переводами строк
+        файла. False - сохранение отменено пользователем."""
+        if self.source is not None:
+            # Кодировку и флаги файла хранит основной редактор вкладки
+            return self.source.write_file(file_path)
+        if self.lossy:
+            answer = QMessageBox.warning(
+                self, "Сохранение",
+                f"При открытии часть байтов не декодировалась как {self.encoding} "
+                f"и заменена на �. Сохранение запишет эти замены вместо исходных байтов.\n\n"
+                f"Всё равно сохранить?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No)
+            if answer != QMessageBox.StandardButton.Yes:
+                return False
+        try:
+            data = encode_text(self.toPlainText(), self.encoding, self.newline)
+        except UnicodeEncodeError:
+            answer = QMessageBox.question(
+                self, "Сохранение",
+                f"Текст содержит символы, которых нет в {self.encoding}. Сохранить файл в UTF-8?")
+            if answer != QMessageBox.StandardButton.Yes:
+                return False
+            self.encoding = 'utf-8'
+            data = encode_text(self.toPlainText(), self.encoding, self.newline)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        self.lossy = False
+        self.document().setModified(False)
+        return True
+
+    def load_text(self, file_path):
+        """Открывает большой файл в фоне (см. DocumentLoader); текст
+        появляется порциями. Возвращает загрузчик для его сигналов."""
+        self.loader = DocumentLoader(self, file_path)
+        self.loader.start()
+        return self.loader
+
+    def loading(self):
+        """Документ ещё дописывается загрузкой (у вида - загрузкой основного
+        редактора) или подсвечивается в фоне: индекс скобок пока не
+        собирается, иначе он токенизировал бы весь файл в GUI-потоке"""
+        if (self.source or self).loader is not None:
+            return True
+        return isinstance(self.highlighter, StatefulHighlighter) and self.highlighter.busy()
+
+    def begin_loading(self):
+        highlighter = self.highlighter
+        if isinstance(highlighter, StatefulHighlighter):
+            # Блоки пока только передают состояние, подсветка - после загрузки
+            highlighter.stop_worker()
+            highlighter.loading = True
+        super().setPlainText('')
+        self.document().setUndoRedoEnabled(False)
+        self.setReadOnly(True)
+
+    def append_text(self, text):
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+
+    def finish_loading(self):
+        highlighter = self.highlighter
+        if isinstance(highlighter, StatefulHighlighter):
+            line_height = max(1, self.fontMetrics().height())
+            visible_lines = self.viewport().height() // line_height + 1
+            highlighter.prepare_text(self.toPlainText(), visible_lines)
+            highlighter.finish_loading()
+            if not highlighter.busy():
+                # Короткий текст фоновый поток не берёт
+                highlighter.rehighlight()
+        document = self.document()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        self.setReadOnly(False)
+        if self.changes is not None:
+            self.changes.refresh()
+
+    def prioritize_visible_blocks(self):
+        if not isinstance(self.highlighter, StatefulHighlighter):
+            return
+        first = self.firstVisibleBlock().blockNumber()
+        line_height = max(1, self.fontMetrics().height())
+        self.highlighter.prioritize(first, first + self.viewport().height() // line_height + 1)
+
+    def block_tokens(self, block):
+        """Токены блока из общего лексера (см. BlockData)"""
+        data = block.userData()
+        if isinstance(data, BlockData):
+            return data.tokens
+        if not isinstance(self.highlighter, StatefulHighlighter):
+            return ()
+
+        # Блок ещё не подсвечен (например, идёт фоновая загрузка)
+        previous = block.previous()
+        state = previous.userState() if previous.isValid() else StatefulHighlighter.NORMAL
+        return self.highlighter.tokenize(block.text(), max(state, StatefulHighlighter.NORMAL))[0]
+
+    def refresh_extra_selections(self):
+        self.setExtraSelections(self.diagnostic_selections + self.search_selections +
+                                self.brace_selections)
+
+    DIAGNOSTIC_COLORS = {'error': "#f44747", 'warning': "#cca700", 'info': "#3794ff"}
+
+    def show_diagnostics(self):
+        """Переводит диагностики в выделения. Курсоры выделений сами
+        сдвигаются при правках, пока не придёт следующий анализ"""
+        selections = []
+        severities = []
+        document = self.document()
+        for line, column, length, severity, message in self.diagnostics.diagnostics:
+            block = document.findBlockByNumber(line)
+            if not block.isValid():
+                continue
+            selection = QTextEdit.ExtraSelection()
+            selection.format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.WaveUnderline)
+            selection.format.setUnderlineColor(QColor(self.DIAGNOSTIC_COLORS[severity]))
+            selection.format.setToolTip(message)
+            cursor = QTextCursor(block)
+            cursor.setPosition(block.position() + min(column, block.length() - 1))
+            cursor.setPosition(block.position() + min(column + length, block.length() - 1),
+                               QTextCursor.MoveMode.KeepAnchor)
+            selection.cursor = cursor
+            selections.append(selection)
+            severities.append(severity)
+        self.diagnostic_selections = selections
+        self.diagnostic_severities = severities
+        self.refresh_extra_selections()
+        self.line_numbers.update()
+
+    def show_line_changes(self):
+        self.line_changes = self.changes.markers
+        self.line_numbers.update()
+
+    def viewportEvent(self, event):
+        # Подсказка с текстом диагностики под указателем
+        if event.type() == QEvent.Type.ToolTip and self.diagnostic_selections:
+            position = self.cursorForPosition(event.pos()).position()
+            messages = [selection.format.toolTip() for selection in self.diagnostic_selections
+                        if selection.cursor.selectionStart() <= position <= selection.cursor.selectionEnd()]
+            if messages:
+                QToolTip.showText(event.globalPos(), "\n".join(dict.fromkeys(messages)), self.viewport())
+            else:
+                QToolTip.hideText()
+            return True
+        return super().viewportEvent(event)
+
+    def diagnostic_markers(self):
+        """{номер блока: важность} для поля номеров строк; из нескольких
+        диагностик строки берётся самая важная"""
+        markers = {}
+        order = list(self.DIAGNOSTIC_COLORS)
+        for selection, severity in zip(self.diagnostic_selections, self.diagnostic_severities):
+            number = selection.cursor.blockNumber()
+            current = markers.get(number)
+            if current is None or order.index(severity) < order.index(current):
+                markers[number] = severity
+        return markers
+
+    def block_braces(self, number):
+        """Скобки блока для индекса скобок: ((колонка, скобка), ...)"""
+        block = self.document().findBlockByNumber(number)
+        text = block.text()
+        return tuple((start, text[start]) for start, _, kind in self.block_tokens(block)
+                     if kind == 'brace')
+
+    def track_braces(self, position, removed, added):
+        """Сдвигает индекс скобок под правку и помечает изменённые блоки"""
+        document = self.document()
+        first = document.findBlock(position).blockNumber()
+        end = document.findBlock(position + added)
+        last = end.blockNumber() if end.isValid() else document.blockCount() - 1
+        old_last = last - (document.blockCount() - len(self.braces.blocks))
+        self.braces.changed(first, old_last, last, document.blockCount())
+
+        # Свёрнутый блок в изменённых строках: метка переходит на видимую
+        # строку, за которой начинаются скрытые
+        for number in [number for number in self.braces.folded if first <= number <= last]:
+            self.braces.folded.discard(number)
+            block = document.findBlockByNumber(last)
+            while block.isValid() and block.blockNumber() >= first:
+                if block.isVisible() and block.next().isValid() and not block.next().isVisible():
+                    self.braces.folded.add(block.blockNumber())
+                    break
+                block = block.previous()
+
+    def brace_position(self, number, column):
+        """Позиция в документе (единицы UTF-16) колонки блока"""
+        block = self.document().findBlockByNumber(number)
+        text = block.text()
+        if ASTRAL.search(text) is not None:
+            column = len(text[:column].encode('utf-16-le')) // 2
+        return block.position() + column
+
+    def match_braces(self):
+        """Подсвечивает скобку у курсора и парную ей (по индексу скобок)"""
+        if self.loading():
+            return
+        cursor = self.textCursor()
+        number = cursor.blockNumber()
+        column = cursor.positionInBlock()
+        text = cursor.block().text()
+        if ASTRAL.search(text) is not None:
+            column = len(text.encode('utf-16-le')[:column * 2].decode('utf-16-le', 'ignore'))
+
+        # Закрывающая слева от курсора или открывающая справа
+        brace = None
+        if 0 < column <= len(text) and text[column - 1] in CLOSING_BRACES:
+            brace = column - 1
+        elif column < len(text) and text[column] in BRACE_PAIRS:
+            brace = column
+
+        selections = []
+        if brace is not None and (brace, text[brace]) in self.braces.braces_of(number, self.block_braces):
+            brace_format = QTextCharFormat()
+            brace_format.setBackground(QColor("#3b514d"))
+            positions = [self.brace_position(number, brace)]
+            partner = self.braces.partner(number, brace, self.block_braces)
+            if partner is not None:
+                positions.append(self.brace_position(*partner))
+            for position in positions:
+                selection = QTextEdit.ExtraSelection()
+                selection.format = brace_format
+                selection.cursor = QTextCursor(self.document())
+                selection.cursor.setPosition(position)
+                selection.cursor.movePosition(QTextCursor.MoveOperation.Right,
+                                              QTextCursor.MoveMode.KeepAnchor)
+                selections.append(selection)
+
+        if selections or self.brace_selections:
+            self.brace_selections = selections
+            self.refresh_extra_selections()
+
+        if not cursor.block().isVisible():
+            self.unfold_block(number)
+
+    def balanced_lines(self, first, last):
+        """Расширяет диапазон строк так, чтобы он не разрезал пары скобок"""
+        changed = True
+        while changed:
+            changed = False
+            for number in range(first, last + 1):
+                for column, _ in self.braces.braces_of(number, self.block_braces):
+                    partner = self.braces.partner(number, column, self.block_braces)
+                    if partner is None or first <= partner[0] <= last:
+                        continue
+                    first = min(first, partner[0])
+                    last = max(last, partner[0])
+                    changed = True
+        return first, last
+
     def setupShortcuts(self):
         # VSCode shortcuts
         QShortcut(QKeySequence("Ctrl+S"), self, self.save_file)
@@ -854,6 +1442,8 @@ class CodeEditor(QPlainTextEdit):
         QShortcut(QKeySequence("Ctrl+`"), self, self.toggle_terminal)
         QShortcut(QKeySequence("F5"), self, self.run_code)
         QShortcut(QKeySequence("Ctrl+Space"), self, self.trigger_suggestions)
+        QShortcut(QKeySequence("F12"), self, self.goto_definition)
+        QShortcut(QKeySequence("Shift+F12"), self, self.find_references)
         
         # Neovim-style shortcuts
         QShortcut(QKeySequence("Ctrl+W+V"), self, self.split_vertical)
@@ -862,6 +1452,7 @@ class CodeEditor(QPlainTextEdit):
         QShortcut(QKeySequence("Ctrl+W+L"), self, lambda: self.focus_split('right'))
         QShortcut(QKeySequence("Ctrl+W+J"), self, lambda: self.focus_split('down'))
         QShortcut(QKeySequence("Ctrl+W+K"), self, lambda: self.focus_split('up'))
+        QShortcut(QKeySequence("Ctrl+W+Q"), self, self.close_split)
         
         # Additional useful shortcuts
         QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.show_command_palette)
@@ -872,29 +1463,91 @@ class CodeEditor(QPlainTextEdit):
         QShortcut(QKeySequence("Ctrl+Shift+F"), self, self.find_in_files)
 
 
+    # Разделением окна управляет главное окно: оно знает вкладки
+
     def split_vertical(self):
-        # Реализация вертикального разделения окна
-        pass
+        window = self.window()
+        if hasattr(window, 'split_vertical') and window is not self:
+            window.split_vertical()
 
     def split_horizontal(self):
-        # Реализация горизонтального разделения окна
-        pass
+        window = self.window()
+        if hasattr(window, 'split_horizontal') and window is not self:
+            window.split_horizontal()
 
     def focus_split(self, direction):
-        # Переключение между разделенными окнами
-        pass
+        window = self.window()
+        if hasattr(window, 'focus_split') and window is not self:
+            window.focus_split(direction)
+
+    def close_split(self):
+        window = self.window()
+        if hasattr(window, 'close_split') and window is not self:
+            window.close_split()
 
     def show_command_palette(self):
         # Показать командную палитру
         pass
 
     def fold_code(self):
-        # Свернуть блок кода
-        pass
+        """Сворачивает самый внутренний блок скобок вокруг курсора"""
+        number = self.textCursor().blockNumber()
+        for start, end in reversed(self.braces.enclosing(number, self.block_braces)):
+            if start not in self.braces.folded:
+                self.set_folded(start, True)
+                return
 
     def unfold_code(self):
-        # Развернуть блок кода
-        pass
+        """Разворачивает свёрнутый блок в строке курсора"""
+        number = self.textCursor().blockNumber()
+        if number in self.braces.folded:
+            self.set_folded(number, False)
+
+    def toggle_fold(self, number):
+        if number in self.braces.fold_ranges(self.block_braces):
+            self.set_folded(number, number not in self.braces.folded)
+
+    def unfold_block(self, number):
+        """Разворачивает все свёрнутые блоки, которые скрывают строку"""
+        for start, end in self.braces.enclosing(number, self.block_braces):
+            if start in self.braces.folded and start < number < end:
+                self.set_folded(start, False)
+
+    def set_folded(self, start, folded):
+        """Скрывает (или показывает) строки между скобками диапазона.
+
+        Скрытые блоки не раскладываются и не рисуются; вложенные свёрнутые
+        блоки при разворачивании внешнего остаются свёрнутыми.
+        """
+        ranges = self.braces.fold_ranges(self.block_braces)
+        end = ranges.get(start)
+        if end is None:
+            self.braces.folded.discard(start)
+            return
+        document = self.document()
+        first = document.findBlockByNumber(start + 1)
+        block = first
+        while block.isValid() and block.blockNumber() < end:
+            block.setVisible(not folded)
+            number = block.blockNumber()
+            if not folded and number in self.braces.folded and number in ranges:
+                block = document.findBlockByNumber(ranges[number])
+            else:
+                block = block.next()
+        if folded:
+            self.braces.folded.add(start)
+        else:
+            self.braces.folded.discard(start)
+
+        last = document.findBlockByNumber(end)
+        document.markContentsDirty(first.position(), last.position() - first.position())
+        if folded and start < self.textCursor().blockNumber() < end:
+            cursor = self.textCursor()
+            cursor.setPosition(document.findBlockByNumber(start).position())
+            cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+            self.setTextCursor(cursor)
+        self.viewport().update()
+        self.line_numbers.update()
 
     def goto_line(self):
         # Переход к строке
@@ -903,22 +1556,128 @@ class CodeEditor(QPlainTextEdit):
             cursor = QTextCursor(self.document().findBlockByLineNumber(line - 1))
             self.setTextCursor(cursor)
 
+    def goto_position(self, line, column=0):
+        block = self.document().findBlockByNumber(line)
+        if not block.isValid():
+            return
+        cursor = QTextCursor(block)
+        cursor.setPosition(block.position() + min(column, block.length() - 1))
+        self.setTextCursor(cursor)
+        self.centerCursor()
+        self.setFocus()
+
+    def symbol_under_cursor(self):
+        cursor = self.textCursor()
+        block = cursor.block()
+        column = cursor.positionInBlock()
+        for start, length, kind in self.block_tokens(block):
+            if kind == 'identifier' and start <= column <= start + length:
+                return block.text()[start:start + length]
+        return None
+
+    def goto_definition(self):
+        """Переход к определению имени под курсором.
+
+        Текущий документ разбирается из таблицы символов (в нём могут быть
+        несохранённые правки), остальные файлы - из индекса проекта.
+        """
+        name = self.symbol_under_cursor()
+        if not name or not isinstance(self.highlighter, StatefulHighlighter):
+            return
+        lexer = self.highlighter.lexer
+        locations = []
+        block = self.document().begin()
+        for names in self.block_symbols:
+            if names and name in names:
+                for defined, _, column in lexer.definitions(self.block_tokens(block), block.text()):
+                    if defined == name:
+                        locations.append((self.file_path, block.blockNumber(), column))
+            block = block.next()
+
+        index = ProjectSymbolIndex.instance()
+        if index is not None:
+            locations += [(path, line, column) for path, line, column, _ in index.definitions(name)
+                          if path != self.file_path]
+        self.show_locations(locations)
+
+    def find_references(self):
+        name = self.symbol_under_cursor()
+        if not name:
+            return
+        locations = []
+        block = self.document().begin()
+        while block.isValid():
+            text = block.text()
+            if name in text:
+                for start, length, kind in self.block_tokens(block):
+                    if kind == 'identifier' and text[start:start + length] == name:
+                        locations.append((self.file_path, block.blockNumber(), start))
+            block = block.next()
+
+        index = ProjectSymbolIndex.instance()
+        if index is not None:
+            locations += [location for location in index.references(name)
+                          if location[0] != self.file_path]
+        self.show_locations(locations)
+
+    # Сколько мест показывать в меню результатов
+    MAX_LOCATIONS = 50
+
+    def show_locations(self, locations):
+        """Одно место открывает сразу, несколько - предлагает меню"""
+        if not locations:
+            return
+        if len(locations) == 1:
+            self.open_location(*locations[0])
+            return
+
+        menu = QMenu(self)
+        project = getattr(ProjectSymbolIndex.instance(), 'project_path', None)
+        for path, line, column in locations[:self.MAX_LOCATIONS]:
+            if path is None:
+                label = "untitled"
+            elif project and path.startswith(project):
+                label = os.path.relpath(path, project)
+            else:
+                label = os.path.basename(path)
+            action = menu.addAction(f"{label}:{line + 1}:{column + 1}")
+            action.triggered.connect(
+                lambda checked=False, location=(path, line, column): self.open_location(*location))
+        if len(locations) > self.MAX_LOCATIONS:
+            more = menu.addAction(f"... ещё {len(locations) - self.MAX_LOCATIONS}")
+            more.setEnabled(False)
+        menu.exec(self.mapToGlobal(self.cursorRect().bottomLeft()))
+
+    def open_location(self, path, line, column):
+        if path == self.file_path:
+            self.goto_position(line, column)
+            return
+        window = self.window()
+        if hasattr(window, 'open_location'):
+            window.open_location(path, line, column)
+
     def quick_open(self):
-        # Быстрое открытие файла
-        pass
+        # Быстрое открытие файла - палитра главного окна
+        window = self.window()
+        if hasattr(window, 'quick_open') and window is not self:
+            window.quick_open()
 
     def find_in_files(self):
-        # Поиск по всем файлам
-        pass
+        # Поиск по всем файлам - панель главного окна
+        window = self.window()
+        if hasattr(window, 'find_in_files') and window is not self:
+            window.find_in_files()
 
     def trigger_suggestions(self):
         # Вызов автодополнения
         self.showCompleter()
 
+    def snippet_table(self):
+        return self.snippets.snippets if self.snippets else {}
+
     def set_file_type(self, file_path):
-        if file_path.endswith('.md'):
+        if mode_for_path(file_path).name == 'markdown':
             profile = QWebEngineProfile("markdown_profile")
-            self.highlighter = MarkdownHighlighter(self.document())
             splitter = QSplitter(Qt.Orientation.Horizontal)
             splitter.addWidget(self)
             self.preview = MarkdownPreview()
@@ -955,9 +1714,7 @@ class CodeEditor(QPlainTextEdit):
                     self.current_project,
                     "Ryton files (*.ry);;Python files (*.py);;All Files (*.*);;MarkDown files (*.md);;Zig files(*.zig)"
                 )
-                if file_path:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(current_editor.toPlainText())
+                if file_path and current_editor.write_file(file_path):
                     self.editor_tabs.setTabText(
                         self.editor_tabs.currentIndex(), 
                         os.path.basename(file_path)
@@ -966,9 +1723,8 @@ class CodeEditor(QPlainTextEdit):
             # Если файл уже существует
             else:
                 file_path = os.path.join(self.current_project, "src", current_tab_text)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(current_editor.toPlainText())
-                self.status_bar.showMessage(f"Saved: {file_path}", 3000)
+                if current_editor.write_file(file_path):
+                    self.status_bar.showMessage(f"Saved: {file_path}", 3000)
 
     def run_code(self):
         current_editor = self.editor_tabs.currentWidget()
@@ -987,17 +1743,10 @@ class CodeEditor(QPlainTextEdit):
             self.editor_tabs.removeTab(index)
 
     def load_file(self, file_path):
-        try:
-            with open(file_path, 'r') as f:
-                content = f.read()
-            new_editor = CodeEditor()
-            new_editor.setPlainText(content)
-            self.editor_tabs.addTab(new_editor, os.path.basename(file_path))
-            self.editor_tabs.setCurrentWidget(new_editor)
-            self.current_file = file_path
-            self.status_bar.showMessage(f"Opened: {file_path}")
-        except Exception as e:
-            self.status_bar.showMessage(f"Error opening file: {str(e)}")
+        # Вкладки файлов и их загрузку ведёт главное окно
+        window = self.window()
+        if hasattr(window, 'load_file') and window is not self:
+            window.load_file(file_path)
 
     def insert_function(self):
         cursor = self.textCursor()
@@ -1038,36 +1787,60 @@ class CodeEditor(QPlainTextEdit):
         cursor.movePosition(QTextCursor.MoveOperation.Right, n=7)
         self.setTextCursor(cursor)
         
-    def toggle_comment(self):
+    def selected_lines(self):
+        """Первая и последняя строки выделения (или строка курсора); строка,
+        на начале которой выделение кончается, не считается"""
         cursor = self.textCursor()
-        if cursor.hasSelection():
-            start = cursor.selectionStart()
-            end = cursor.selectionEnd()
-            cursor.setPosition(start)
-            first_line = cursor.blockNumber()
-            cursor.setPosition(end)
-            last_line = cursor.blockNumber()
-            
-            cursor.beginEditBlock()
-            for line in range(first_line, last_line + 1):
-                cursor.movePosition(QTextCursor.MoveOperation.Start)
-                cursor.movePosition(QTextCursor.MoveOperation.Down, n=line)
-                cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-                if cursor.block().text().startswith("//"):
-                    cursor.movePosition(QTextCursor.MoveOperation.Right, 
-                                     QTextCursor.MoveMode.KeepAnchor, 2)
-                    cursor.removeSelectedText()
-                else:
-                    cursor.insertText("//")
-            cursor.endEditBlock()
-        else:
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            if cursor.block().text().startswith("//"):
-                cursor.movePosition(QTextCursor.MoveOperation.Right, 
-                                 QTextCursor.MoveMode.KeepAnchor, 2)
-                cursor.removeSelectedText()
-            else:
-                cursor.insertText("//")
+        document = self.document()
+        first = document.findBlock(cursor.selectionStart()).blockNumber()
+        end = document.findBlock(cursor.selectionEnd())
+        last = end.blockNumber()
+        if last > first and cursor.selectionEnd() == end.position():
+            last -= 1
+        return first, last
+
+    def line_edit(self, block, text, new_text):
+        """Правка для apply_edits, меняющая текст text с начала блока на
+        new_text, или None"""
+        edit = minimal_edit(text, new_text, 0)
+        if edit is None:
+            return None
+        start, end, inserted = edit
+        if ASTRAL.search(text) is not None:
+            # Позиции документа - в единицах UTF-16
+            start = len(text[:start].encode('utf-16-le')) // 2
+            end = len(text[:end].encode('utf-16-le')) // 2
+        return block.position() + start, block.position() + end, inserted
+
+    def edit_lines(self, first, last, change):
+        """Меняет строки first..last: change(текст строки) отдаёт новый текст
+        или None, если строку менять не нужно.
+
+        Блоки обходятся напрямую, без перемещений курсора, а все правки
+        идут одним edit block (apply_edits): одна отмена, и каждый
+        затронутый блок раскладывается и подсвечивается один раз.
+        """
+        block = self.document().findBlockByNumber(first)
+        edits = []
+        for _ in range(last - first + 1):
+            if not block.isValid():
+                break
+            text = block.text()
+            new_text = change(text)
+            if new_text is not None:
+                edit = self.line_edit(block, text, new_text)
+                if edit is not None:
+                    edits.append(edit)
+            block = block.next()
+        return apply_edits(self.document(), edits)
+
+    def toggle_comment(self):
+        comment = self.language.comment
+        if not comment:
+            return
+        first, last = self.selected_lines()
+        self.edit_lines(first, last, lambda text: text[len(comment):] if text.startswith(comment)
+                        else comment + text)
 
     def show_context_menu(self, position):
         menu = self.createStandardContextMenu(position)
@@ -1076,11 +1849,21 @@ class CodeEditor(QPlainTextEdit):
         # Добавляем опции рефакторинга
         refactor_menu = menu.addMenu("Рефакторинг")
         
+        definition_action = menu.addAction("Перейти к определению")
+        definition_action.triggered.connect(self.goto_definition)
+        references_action = menu.addAction("Найти ссылки")
+        references_action.triggered.connect(self.find_references)
+
         rename_action = refactor_menu.addAction("Переименовать")
         rename_action.triggered.connect(self.rename_current_symbol)
         
         extract_action = refactor_menu.addAction("Извлечь метод")
         extract_action.triggered.connect(self.extract_selected_code)
+
+        clones_action = refactor_menu.addAction("Найти повторяющийся код в проекте")
+        clones_action.triggered.connect(self.find_project_clones)
+        clones_action.setEnabled(ProjectSymbolIndex.instance() is not None
+                                 and self.clone_detector is None)
         
         # Показываем подсказки по улучшению кода
         suggestions = self.refactoring.suggest_improvements()
@@ -1092,6 +1875,8 @@ class CodeEditor(QPlainTextEdit):
         
         menu.exec(self.mapToGlobal(position))
 
+    IDENTIFIER = re.compile(r'[^\W\d]\w*')
+
     def rename_current_symbol(self):
         cursor = self.textCursor()
         cursor.select(QTextCursor.SelectionType.WordUnderCursor)
@@ -1102,15 +1887,51 @@ class CodeEditor(QPlainTextEdit):
                                               "Переименовать", 
                                               "Новое имя:", 
                                               text=old_name)
-            if ok and new_name:
+            if not ok or not new_name or new_name == old_name:
+                return
+            if not self.IDENTIFIER.fullmatch(new_name):
+                QMessageBox.warning(self, "Переименовать", f"'{new_name}' - не идентификатор")
+                return
+            if self.file_path:
+                # Во всём проекте, с предпросмотром
+                self.project_rename = ProjectRename(self, old_name, new_name)
+                self.project_rename.finished.connect(self.show_status_message)
+                self.project_rename.start()
+            else:
                 self.refactoring.rename_symbol(old_name, new_name)
 
+    def find_project_clones(self):
+        """Ищет клоны во всём проекте в фоне и показывает группы"""
+        index = ProjectSymbolIndex.instance()
+        if index is None or self.clone_detector is not None:
+            return
+        self.clone_detector = CloneDetector(index.project_path)
+        self.clone_detector.clones_found.connect(
+            lambda groups, root=index.project_path: self.show_clones(root, groups))
+        self.clone_detector.finished.connect(self.clone_detector_finished)
+        self.show_status_message("Поиск повторяющегося кода...")
+        self.clone_detector.start()
+
+    def clone_detector_finished(self):
+        self.clone_detector = None
+
+    def show_clones(self, root, groups):
+        self.show_status_message(f"Найдено групп повторяющегося кода: {len(groups)}")
+        if groups:
+            self.clones_dialog = ClonesDialog(root, groups, self)
+            self.clones_dialog.show()
+
+    def show_status_message(self, message):
+        window = self.window()
+        if message and hasattr(window, 'status_bar'):
+            window.status_bar.showMessage(message, 5000)
+
     def extract_selected_code(self):
         cursor = self.textCursor()
         if cursor.hasSelection():
-            start_line = cursor.blockNumber()
-            cursor.setPosition(cursor.selectionEnd())
-            end_line = cursor.blockNumber()
+            document = self.document()
+            start_line = document.findBlock(cursor.selectionStart()).blockNumber()
+            end_line = document.findBlock(cursor.selectionEnd()).blockNumber()
             
             new_name, ok = QInputDialog.getText(self,
                                               "Извлечь метод",
@@ -1131,9 +1952,11 @@ class CodeEditor(QPlainTextEdit):
             text = block.text()
             pos_in_block = cursor.positionInBlock()
             
-            # Проверяем символы слева и справа от курсора
-            if (pos_in_block > 0 and pos_in_block < len(text) and 
-                text[pos_in_block-1] == '{' and text[pos_in_block] == '}'):
+            # Слева от курсора '{', справа - её парная '}' (не в строке и не в комментарии)
+            if (pos_in_block > 0 and pos_in_block < len(text) and
+                text[pos_in_block-1] == '{' and text[pos_in_block] == '}' and
+                self.braces.partner(block.blockNumber(), pos_in_block - 1, self.block_braces) ==
+                    (block.blockNumber(), pos_in_block)):
                 # Получаем текущий отступ
                 indent = ''
                 for char in text:
@@ -1184,188 +2007,192 @@ class CodeEditor(QPlainTextEdit):
             main_window.save_file()
 
     def find(self):
-        search_text, ok = QInputDialog.getText(self, "Find", "Search for:")
-        if ok and search_text:
-            cursor = self.textCursor()
-            # Сохраняем форматирование для подсветки
-            format = QTextCharFormat()
-            format.setBackground(QColor("#666666"))
-            format.setForeground(QColor("#FFFFFF"))
-            
-            # Очищаем предыдущие подсветки
-            self.setExtraSelections([])
-            extra_selections = []
-            
-            # Ищем все вхождения
-            while cursor.movePosition(QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor):
-                if cursor.selectedText() == search_text:
-                    selection = QTextEdit.ExtraSelection()
-                    selection.format = format
-                    selection.cursor = QTextCursor(cursor)
-                    extra_selections.append(selection)
-                cursor.movePosition(QTextCursor.MoveOperation.Right)
-                
-            self.setExtraSelections(extra_selections)
+        # Панель поиска создаётся при первом Ctrl+F
+        if self.find_bar is None:
+            self.find_bar = FindBar(self)
+        self.find_bar.open_bar()
 
     def replace(self):
-        find_text, ok = QInputDialog.getText(self, "Replace", "Find:")
-        if ok and find_text:
-            replace_text, ok = QInputDialog.getText(self, "Replace", "Replace with:")
-            if ok:
-                text = self.toPlainText()
-                new_text = text.replace(find_text, replace_text)
-                self.setPlainText(new_text)
+        if self.find_bar is None:
+            self.find_bar = FindBar(self)
+        self.find_bar.open_bar(replace=True)
 
     def duplicate_line(self):
         cursor = self.textCursor()
         if cursor.hasSelection():
-            text = cursor.selectedText()
-            cursor.insertText(text + "\n" + text)
+            # Копия выделения вставляется после него, выделение остаётся на месте
+            anchor, position = cursor.anchor(), cursor.position()
+            end = cursor.selectionEnd()
+            apply_edits(self.document(), [(end, end, "\n" + cursor.selection().toPlainText())])
+            cursor.setPosition(anchor)
+            cursor.setPosition(position, QTextCursor.MoveMode.KeepAnchor)
+            self.setTextCursor(cursor)
         else:
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine, QTextCursor.MoveMode.KeepAnchor)
-            text = cursor.selectedText()
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine)
-            cursor.insertText("\n" + text)
+            block = cursor.block()
+            end = block.position() + block.length() - 1
+            column = cursor.positionInBlock()
+            apply_edits(self.document(), [(end, end, "\n" + block.text())])
+            cursor.setPosition(block.position() + column)
+            self.setTextCursor(cursor)
+
+    def move_lines(self, step):
+        """Сдвигает строки выделения (или строку курсора) на строку вверх
+        (step = -1) или вниз (step = 1) одной правкой"""
+        first, last = self.selected_lines()
+        document = self.document()
+        if first + step < 0 or last + step >= document.blockCount():
+            return
+        top = document.findBlockByNumber(min(first, first + step))
+        bottom = document.findBlockByNumber(max(last, last + step))
+        lines = []
+        block = top
+        while True:
+            lines.append(block.text())
+            if block == bottom:
+                break
+            block = block.next()
+        if step < 0:
+            moved = lines[1:] + lines[:1]
+            shift = -top.length()
+        else:
+            moved = lines[-1:] + lines[:-1]
+            shift = bottom.length()
 
-    def move_line_up(self):
         cursor = self.textCursor()
-        if cursor.blockNumber() > 0:
-            current_line = cursor.block().text()
-            cursor.movePosition(QTextCursor.MoveOperation.Up)
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine, QTextCursor.MoveMode.KeepAnchor)
-            prev_line = cursor.selectedText()
-            cursor.removeSelectedText()
-            cursor.insertText(current_line)
-            cursor.movePosition(QTextCursor.MoveOperation.Down)
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine)
-            cursor.removeSelectedText()
-            cursor.insertText(prev_line)
-            cursor.movePosition(QTextCursor.MoveOperation.Up)
+        anchor, position = cursor.anchor(), cursor.position()
+        edit = self.line_edit(top, "\n".join(lines), "\n".join(moved))
+        if edit is not None:
+            apply_edits(document, [edit])
+        cursor.setPosition(anchor + shift)
+        cursor.setPosition(position + shift, QTextCursor.MoveMode.KeepAnchor)
+        self.setTextCursor(cursor)
+
+    def move_line_up(self):
+        self.move_lines(-1)
 
     def move_line_down(self):
-        cursor = self.textCursor()
-        if cursor.block().next().isValid():
-            current_line = cursor.block().text()
-            cursor.movePosition(QTextCursor.MoveOperation.Down)
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine, QTextCursor.MoveMode.KeepAnchor)
-            next_line = cursor.selectedText()
-            cursor.removeSelectedText()
-            cursor.insertText(current_line)
-            cursor.movePosition(QTextCursor.MoveOperation.Up)
-            cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-            cursor.movePosition(QTextCursor.MoveOperation.EndOfLine)
-            cursor.removeSelectedText()
-            cursor.insertText(next_line)
-            cursor.movePosition(QTextCursor.MoveOperation.Down)
+        self.move_lines(1)
 
     def indent(self):
         cursor = self.textCursor()
         if cursor.hasSelection():
-            start = cursor.selectionStart()
-            end = cursor.selectionEnd()
-            cursor.setPosition(start)
-            first_line = cursor.blockNumber()
-            cursor.setPosition(end)
-            last_line = cursor.blockNumber()
-            
-            cursor.beginEditBlock()
-            for line in range(first_line, last_line + 1):
-                cursor.movePosition(QTextCursor.MoveOperation.Start)
-                cursor.movePosition(QTextCursor.MoveOperation.Down, n=line)
-                cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-                cursor.insertText("    ")
-            cursor.endEditBlock()
+            first, last = self.selected_lines()
+            self.edit_lines(first, last, lambda text: "    " + text)
         else:
             cursor.insertText("    ")
 
     def unindent(self):
-        cursor = self.textCursor()
-        if cursor.hasSelection():
-            start = cursor.selectionStart()
-            end = cursor.selectionEnd()
-            cursor.setPosition(start)
-            first_line = cursor.blockNumber()
-            cursor.setPosition(end)
-            last_line = cursor.blockNumber()
-            
-            cursor.beginEditBlock()
-            for line in range(first_line, last_line + 1):
-                cursor.movePosition(QTextCursor.MoveOperation.Start)
-                cursor.movePosition(QTextCursor.MoveOperation.Down, n=line)
-                cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
-                cursor.movePosition(QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor, 4)
-                if cursor.selectedText() == "    ":
-                    cursor.removeSelectedText()
-            cursor.endEditBlock()
+        if self.textCursor().hasSelection():
+            first, last = self.selected_lines()
+            self.edit_lines(first, last, lambda text: text[4:] if text.startswith("    ") else None)
 
 
     def handle_text_changed(self):
+        if (self.source or self).loader is not None:
+            # Текст дописывается загрузкой, подсказки - после неё
+            return
         self.update_timer.start(280)  # Уменьшаем задержку до 300 мс
         
         current_word = self.textUnderCursor()
         if len(current_word) >= 1:  # Показываем уже при 1 символе
             self.show_suggestions(current_word)
 
+    def track_symbols(self, position, removed, added):
+        """Сдвигает таблицу символов под правку и помечает изменённые блоки"""
+        document = self.document()
+        first = document.findBlock(position).blockNumber()
+        end = document.findBlock(position + added)
+        last = end.blockNumber() if end.isValid() else document.blockCount() - 1
+        old_last = last - (document.blockCount() - len(self.block_symbols))
+
+        for names in self.block_symbols[first:old_last + 1]:
+            if names:
+                self.completer.remove_words(names)
+        self.block_symbols[first:old_last + 1] = [None] * (last - first + 1)
+
+        if len(self.block_symbols) != document.blockCount():
+            for names in self.block_symbols:
+                if names:
+                    self.completer.remove_words(names)
+            # Тот же список: на него ссылаются виды разделённого окна
+            self.block_symbols[:] = [None] * document.blockCount()
+
+    def invalidate_symbols(self, first, last):
+        # Подсветка изменилась (например, открылся многострочный комментарий) -
+        # определения этих блоков нужно пересобрать
+        symbols = self.block_symbols
+        for number in range(max(0, first), min(last + 1, len(symbols))):
+            if symbols[number]:
+                self.completer.remove_words(symbols[number])
+            symbols[number] = None
+        if not self.update_timer.isActive():
+            self.update_timer.start(280)
+
+    # Сколько блоков разбирать на определения за один проход таймера
+    SYMBOL_SLICE = 2000
+
     def update_completions(self):
-        # Собираем все слова из текста
-        text = self.toPlainText()
-        # Ищем функции
-        functions = re.findall(r'func\s+([a-zA-Z_]\w*)', text)
-        # Ищем классы
-        classes = re.findall(r'pack\s+([a-zA-Z_]\w*)', text)
-        # Ищем переменные
-        variables = re.findall(r'\b([a-zA-Z_]\w*)\s*=', text)
-        
-        # Обновляем список динамических слов
-        self.completer.dynamic_words.update(functions + classes + variables)
-        self.completer.update_model()
+        # Собираем определения (func, pack, присваивания) из токенов
+        # неразобранных блоков, не больше SYMBOL_SLICE за проход
+        if not isinstance(self.highlighter, StatefulHighlighter):
+            return
+        if self.highlighter.busy():
+            # Токены блоков ещё пересчитываются в фоне
+            self.update_timer.start(280)
+            return
+        lexer = self.highlighter.lexer
+        symbols = self.block_symbols
+        document = self.document()
+        budget = self.SYMBOL_SLICE
+        number = 0
+
+        while budget > 0:
+            try:
+                number = symbols.index(None, number)
+            except ValueError:
+                return
+            block = document.findBlockByNumber(number)
+            while budget > 0 and block.isValid() and symbols[number] is None:
+                names = tuple(name for name, _, _ in
+                              lexer.definitions(self.block_tokens(block), block.text()))
+                symbols[number] = names
+                self.completer.add_words(names)
+                number += 1
+                budget -= 1
+                block = block.next()
+            if number >= len(symbols):
+                return
+
+        # Остальное - следующим проходом, не блокируя ввод
+        self.update_timer.start(0)
 
     def show_suggestions(self, current_word):
         if current_word:
-            # Получаем все доступные слова
-            all_words = self.completer.model().stringList()
-            
-            # Проверяем точное совпадение
-            if current_word in all_words:
+            # Точное совпадение - подсказывать нечего
+            if current_word in self.completer.index:
                 self.completer.popup().hide()
                 return
-                
-            # Вычисляем совпадения с процентами
-            matches = []
-            for word in all_words:
-                similarity = self.completer.calculate_similarity(current_word, word)
-                if similarity >= 40:  # Минимальный порог совпадения
-                    matches.append((word, similarity))
-            
-            # Если нет совпадений, скрываем подсказки
-            if not matches:
+
+            matching_words = self.completer.suggestions(current_word)
+            if not matching_words:
                 self.completer.popup().hide()
                 return
-                
-            # Сортируем и показываем подсказки
-            matches.sort(key=lambda x: x[1], reverse=True)
-            matching_words = [word for word, _ in matches]
-            
-            if matching_words:
-                self.completer.model().setStringList(matching_words)
-                self.completer.setCompletionPrefix(current_word)
-                popup = self.completer.popup()
-                popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
-                
-                cr = self.cursorRect()
-                cr.setWidth(self.completer.popup().sizeHintForColumn(0) + 
-                        self.completer.popup().verticalScrollBar().sizeHint().width())
-                self.completer.complete(cr)
+
+            self.completer.model().setStringList(matching_words)
+            self.completer.setCompletionPrefix(current_word)
+            popup = self.completer.popup()
+            popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
+
+            cr = self.cursorRect()
+            cr.setWidth(self.completer.popup().sizeHintForColumn(0) + 
+                    self.completer.popup().verticalScrollBar().sizeHint().width())
+            self.completer.complete(cr)
 
     def checkForSnippets(self):
         cursor = self.textCursor()
         line = cursor.block().text()[:cursor.positionInBlock()]
         
-        for name, snippet in self.snippets.snippets.items():
+        for name, snippet in self.snippet_table().items():
             if line.endswith(snippet['prefix']):
                 self.showGhostText(snippet['body'])
                 return
@@ -1457,7 +2284,7 @@ class CodeEditor(QPlainTextEdit):
         cursor = self.textCursor()
         current_word = cursor.block().text()[:cursor.positionInBlock()]
         
-        for name, snippet in self.snippets.snippets.items():
+        for name, snippet in self.snippet_table().items():
             if current_word.endswith(snippet['prefix']):
                 self.current_snippet = snippet
                 self.ghost_overlay.text = snippet['body'].replace(snippet['prefix'], '')
@@ -1475,6 +2302,7 @@ class CodeEditor(QPlainTextEdit):
     def showCompleter(self):
         text = self.textUnderCursor()
         if text:
+            self.completer.model().setStringList(self.completer.suggestions(text))
             self.completer.setCompletionPrefix(text)
             popup = self.completer.popup()
             popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
@@ -1486,16 +2314,14 @@ class CodeEditor(QPlainTextEdit):
 
 
     def lineNumberAreaWidth(self):
-        digits = len(str(self.blockCount()))
-        space = 10 + self.fontMetrics().horizontalAdvance('5') * digits
-        return space
+        return self.line_numbers.total_width()
 
     def updateLineNumberAreaWidth(self, _):
         self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
 
     def updateLineNumberArea(self, rect, dy):
         if dy:
-            self.line_numbers.scroll(0, dy)
+            self.line_numbers.scroll_rows(dy)
         else:
             self.line_numbers.update(0, rect.y(), self.line_numbers.width(), rect.height())
 
@@ -1503,31 +2329,15 @@ class CodeEditor(QPlainTextEdit):
         super().resizeEvent(event)
         cr = self.contentsRect()
         self.line_numbers.setGeometry(cr.left(), cr.top(), self.lineNumberAreaWidth(), cr.height())
-
-    def lineNumberAreaPaintEvent(self, event):
-        painter = QPainter(self.line_numbers)
-        painter.fillRect(event.rect(), QColor("#2F2F2F"))
-
-        block = self.firstVisibleBlock()
-        block_number = block.blockNumber()
-        top = round(self.blockBoundingGeometry(block).translated(self.contentOffset()).top())
-        bottom = top + round(self.blockBoundingRect(block).height())
-
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(block_number + 1)
-                painter.setPen(QColor("#7F7F7F"))
-                painter.drawText(0, top, self.line_numbers.width()-5, self.fontMetrics().height(),
-                               Qt.AlignmentFlag.AlignRight, number)
-
-            block = block.next()
-            top = bottom
-            bottom = top + round(self.blockBoundingRect(block).height())
-            block_number += 1
+        if self.find_bar is not None and self.find_bar.isVisible():
+            self.find_bar.reposition()
+            self.find_bar.update_selections()
+        if self.loader is not None:
+            self.loader.progress.reposition()
 
 class MarkdownEditor(CodeEditor):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, file_path=None):
+        super().__init__(file_path)
         # Создаем сплиттер и превью сразу при инициализации
         self.main_widget = QSplitter(Qt.Orientation.Horizontal)
         self.main_widget.addWidget(self)
@@ -1641,17 +2451,20 @@ class FileManagerTab(QWidget):
         file_path = self.model.filePath(index)
         if os.path.isfile(file_path):
             main_window = self.window()
+            if hasattr(main_window, 'open_path'):
+                # Вкладки файлов ведёт окно (см. EditorTabs)
+                main_window.open_path(file_path)
+                return
             
             if file_path.endswith('README.md'):
-                editor = MarkdownEditor()
+                editor = MarkdownEditor(file_path)
                 editor_widget = editor.get_widget()
             else:
-                editor = CodeEditor()
+                editor = CodeEditor(file_path)
                 editor_widget = editor
                 
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                editor.setPlainText(content)
+            content, editor.encoding, editor.newline, editor.lossy = read_text(file_path)
+            editor.setPlainText(content)
             
             # Получаем виджет с учетом типа файла    
             editor_widget = editor.set_file_type(file_path)
@@ -0,0 +1,496 @@
+from PyQt6.QtCore import QObject, QThread, QTimer, QFileSystemWatcher, pyqtSignal
+
+from concurrent.futures.process import BrokenProcessPool
+from array import array
+from bisect import bisect_left
+import threading
+import hashlib
+import marshal
+import queue
+import os
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from widgets.ProjectSearch import (iter_project_files, gitignore_rules, is_ignored, get_executor,
+                                  MAX_FILE_SIZE)
+from widgets.SymbolIndex import IGNORED_DIRS
+
+INDEX_DIR = os.path.expanduser("~/RytonStudio/index")
+SNAPSHOT_VERSION = 1
+
+TRIGRAMS = re.compile(b'(?=(...))', re.S)
+
+def file_trigrams(path):
+    """(path, mtime, size, отсортированные триграммы как bytes массива 'I').
+
+    Триграммы берутся из текста в нижнем регистре (ASCII), так что индекс
+    годится и для поиска без учёта регистра. Двоичные, пустые, слишком
+    большие и нечитаемые файлы возвращают None вместо триграмм.
+    """
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size == 0 or stat.st_size > MAX_FILE_SIZE:
+                return path, stat.st_mtime, stat.st_size, None
+            data = f.read()
+    except OSError:
+        return path, 0, 0, None
+    if b'\0' in data[:8192]:
+        return path, stat.st_mtime, stat.st_size, None
+
+    trigrams = set(TRIGRAMS.findall(data.lower()))
+    keys = array('I', sorted(int.from_bytes(trigram, 'big') for trigram in trigrams))
+    return path, stat.st_mtime, stat.st_size, keys.tobytes()
+
+def files_trigrams(paths):
+    """Выполняется в пуле процессов"""
+    return [file_trigrams(path) for path in paths]
+
+def required_literals(pattern):
+    """Строки, которые обязательно входят в любое совпадение регулярного
+    выражения: последовательные литералы верхнего уровня, групп и
+    повторов с минимумом от одного. Альтернативы и классы символов
+    прерывают строку."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return []
+    runs = []
+
+    def walk(items):
+        current = []
+        for op, value in items:
+            name = op.name
+            if name == 'LITERAL':
+                current.append(chr(value))
+                continue
+            if current:
+                runs.append(''.join(current))
+                current = []
+            if name == 'SUBPATTERN':
+                walk(value[-1])
+            elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') and value[0] >= 1:
+                walk(value[2])
+        if current:
+            runs.append(''.join(current))
+
+    walk(parsed)
+    return [run for run in runs if len(run) >= 3]
+
+def query_trigrams(query, regex=False, case_sensitive=False):
+    """Триграммы, которые обязаны быть в файле с совпадением; пустое
+    множество - запрос не сужает список файлов"""
+    literals = required_literals(query) if regex else [query]
+    keys = set()
+    for literal in literals:
+        data = literal.encode('utf-8').lower()
+        for trigram in TRIGRAMS.findall(data):
+            # Регистр не-ASCII символов bytes.lower() не меняет: без учёта
+            # регистра такие триграммы не гарантированы
+            if not case_sensitive and max(trigram) >= 0x80:
+                continue
+            keys.add(int.from_bytes(trigram, 'big'))
+    return keys
+
+class TrigramIndex(QObject):
+    """Персистентный триграммный индекс файлов проекта.
+
+    Для каждой триграммы хранится возрастающий список номеров файлов, в
+    которых она встречается; запрос пересекает списки своих триграмм и
+    отдаёт кандидатов, а совпадения проверяет обычный поиск. Индекс живёт в
+    памяти, снимок лежит в ~/RytonStudio/index и подгружается при открытии
+    проекта; изменения с прошлого раза, события QFileSystemWatcher по
+    каталогам, сохранения из редактора и периодическая сверка mtime
+    обновляют только затронутые файлы. Удалённые файлы помечаются, их номера выбрасываются при полной
+    синхронизации. Все изменения делает один фоновый поток.
+    """
+    # Текст для строки состояния панели поиска
+    status_changed = pyqtSignal(str)
+    # Каталоги, которые нужно добавить в QFileSystemWatcher (из фонового потока)
+    directories_found = pyqtSignal(list)
+
+    DEBOUNCE = 500
+    RESCAN_INTERVAL = 60000
+
+    def __init__(self, root, snapshot_path=None):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        if snapshot_path is None:
+            snapshot_path = self.snapshot_path(self.root)
+        self.path = snapshot_path
+        self.lock = threading.Lock()
+        self.ready = False
+        # Выставляется stop: текущее задание потока прерывается
+        self.stopping = False
+
+        self.paths = []
+        self.meta = []
+        self.ids = {}
+        self.by_dir = {}
+        self.known_dirs = set()
+        self.postings = {}
+        self.dead = 0
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.directories_found.connect(self.watch_directories)
+        self.changed_dirs = set()
+        self.change_timer = QTimer(self)
+        self.change_timer.setSingleShot(True)
+        self.change_timer.timeout.connect(self.flush_changes)
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.timeout.connect(lambda: self.jobs.put(('sync', None)))
+
+        self.jobs = queue.SimpleQueue()
+        self.updater = IndexUpdater(self)
+
+    @staticmethod
+    def snapshot_path(root):
+        digest = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(INDEX_DIR, f"{digest}.trigrams")
+
+    @classmethod
+    def exists(cls, root):
+        return os.path.exists(cls.snapshot_path(root))
+
+    def start(self):
+        self.jobs.put(('sync', None))
+        self.updater.start()
+        self.rescan_timer.start(self.RESCAN_INTERVAL)
+
+    def stop(self):
+        self.stopping = True
+        self.rescan_timer.stop()
+        self.change_timer.stop()
+        self.jobs.put(('stop', None))
+        self.updater.wait()
+
+    def update_files(self, paths):
+        self.jobs.put(('files', list(paths)))
+
+    def watch_directories(self, directories):
+        known = set(self.watcher.directories())
+        new = [directory for directory in directories if directory not in known]
+        if new:
+            self.watcher.addPaths(new)
+
+    def directory_changed(self, directory):
+        self.changed_dirs.add(directory)
+        self.change_timer.start(self.DEBOUNCE)
+
+    def flush_changes(self):
+        directories = self.changed_dirs
+        self.changed_dirs = set()
+        self.jobs.put(('dirs', directories))
+
+    def candidates(self, query, regex=False, case_sensitive=False):
+        """Пути файлов, где возможно совпадение, или None, если индекс
+        не готов или запрос не даёт триграмм"""
+        if not self.ready:
+            return None
+        keys = query_trigrams(query, regex, case_sensitive)
+        if not keys:
+            return None
+        with self.lock:
+            lists = []
+            for key in keys:
+                ids = self.postings.get(key)
+                if ids is None:
+                    return []
+                lists.append(ids)
+            lists.sort(key=len)
+
+            result = lists[0]
+            for ids in lists[1:]:
+                if not result:
+                    break
+                # Короткий список проверяем бисекцией по длинному
+                size = len(ids)
+                result = [item for item in result
+                          if (index := bisect_left(ids, item)) < size and ids[index] == item]
+            paths = self.paths
+            return [paths[item] for item in result if paths[item] is not None]
+
+    # Дальше - только из потока IndexUpdater
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                snapshot = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('root') != self.root:
+            return
+        with self.lock:
+            self.paths = snapshot['paths']
+            self.meta = snapshot['meta']
+            self.postings = {}
+            for key, data in snapshot['postings'].items():
+                ids = array('I')
+                ids.frombytes(data)
+                self.postings[key] = ids
+            self.rebuild_maps()
+
+    def rebuild_maps(self):
+        self.ids = {}
+        self.by_dir = {}
+        self.dead = 0
+        for number, path in enumerate(self.paths):
+            if path is None:
+                self.dead += 1
+                continue
+            self.ids[path] = number
+            self.by_dir.setdefault(os.path.dirname(path), set()).add(path)
+
+    def save(self):
+        with self.lock:
+            snapshot = {
+                'version': SNAPSHOT_VERSION,
+                'root': self.root,
+                'paths': list(self.paths),
+                'meta': list(self.meta),
+                'postings': {key: ids.tobytes() for key, ids in self.postings.items()},
+            }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            marshal.dump(snapshot, f)
+        os.replace(temporary, self.path)
+
+    def compact(self):
+        """Выбрасывает номера удалённых файлов из всех списков"""
+        with self.lock:
+            remap = array('i', [-1]) * len(self.paths)
+            paths = []
+            meta = []
+            for number, path in enumerate(self.paths):
+                if path is not None:
+                    remap[number] = len(paths)
+                    paths.append(path)
+                    meta.append(self.meta[number])
+            postings = {}
+            for key, ids in self.postings.items():
+                kept = array('I', [remap[item] for item in ids if remap[item] >= 0])
+                if kept:
+                    postings[key] = kept
+            self.paths = paths
+            self.meta = meta
+            self.postings = postings
+            self.rebuild_maps()
+
+    def remove(self, path):
+        number = self.ids.pop(path, None)
+        if number is None:
+            return
+        self.paths[number] = None
+        self.dead += 1
+        siblings = self.by_dir.get(os.path.dirname(path))
+        if siblings is not None:
+            siblings.discard(path)
+
+    def add(self, path, mtime, size, data):
+        """Новый номер файла больше всех прежних, поэтому списки
+        триграмм остаются отсортированными простым добавлением"""
+        self.remove(path)
+        number = len(self.paths)
+        self.paths.append(path)
+        self.meta.append((mtime, size))
+        self.ids[path] = number
+        self.by_dir.setdefault(os.path.dirname(path), set()).add(path)
+        if data:
+            keys = array('I')
+            keys.frombytes(data)
+            postings = self.postings
+            for key in keys:
+                ids = postings.get(key)
+                if ids is None:
+                    postings[key] = array('I', (number,))
+                else:
+                    ids.append(number)
+
+    def stat_files(self, paths):
+        """{путь: (mtime, size)}; пропавшие файлы не попадают"""
+        result = {}
+        for path in paths:
+            if self.stopping:
+                break
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            result[path] = (stat.st_mtime, stat.st_size)
+        return result
+
+    def reindex(self, paths, total=None):
+        """Заново разбирает файлы в пуле процессов и добавляет в индекс"""
+        chunk = 64
+        futures = []
+        try:
+            executor = get_executor()
+            futures = [executor.submit(files_trigrams, paths[start:start + chunk])
+                       for start in range(0, len(paths), chunk)]
+            batches = (future.result() for future in futures)
+        except (OSError, BrokenProcessPool):
+            batches = ([file_trigrams(path)] for path in paths)
+
+        done = set()
+        try:
+            for batch in batches:
+                if self.stopping:
+                    # Неразобранные файлы подхватит сверка при следующем открытии
+                    for future in futures:
+                        future.cancel()
+                    return
+                with self.lock:
+                    for path, mtime, size, data in batch:
+                        self.add(path, mtime, size, data)
+                        done.add(path)
+                if total:
+                    self.status_changed.emit(f"Indexing files: {len(done)}/{total}")
+        except BrokenProcessPool:
+            # Пул упал посреди работы - оставшиеся файлы разбираем здесь
+            for path in paths:
+                if self.stopping:
+                    return
+                if path not in done:
+                    result = file_trigrams(path)
+                    with self.lock:
+                        self.add(*result)
+
+    def sync(self):
+        """Сверяет индекс с диском: после открытия проекта (сначала
+        подгрузив снимок) и периодически, ловя правки файлов на месте,
+        о которых наблюдатель за каталогами не сообщает"""
+        first = not self.ready
+        if first:
+            self.load()
+        current = self.stat_files(iter_project_files(self.root))
+        if self.stopping:
+            # Обход не закончен: по неполному списку нельзя удалять файлы
+            return False
+        with self.lock:
+            removed = [path for path in self.ids if path not in current]
+            for path in removed:
+                self.remove(path)
+            changed = [path for path, meta in current.items()
+                       if self.ids.get(path) is None or self.meta[self.ids[path]] != meta]
+        if changed:
+            self.reindex(changed, total=len(changed) if first else None)
+        if self.dead > len(self.ids):
+            self.compact()
+        directories = self.directories_of(current)
+        if first or directories != self.known_dirs:
+            self.known_dirs = directories
+            self.directories_found.emit(sorted(directories))
+        self.ready = True
+        if first:
+            self.status_changed.emit(f"Index ready: {len(self.ids)} files")
+        return first or bool(changed or removed)
+
+    def directories_of(self, paths):
+        """Каталоги файлов вместе со всеми родителями до корня проекта"""
+        directories = {self.root}
+        for path in paths:
+            directory = os.path.dirname(path)
+            while directory not in directories and directory.startswith(self.root):
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        return directories
+
+    def remove_tree(self, directory):
+        prefix = directory + os.sep
+        with self.lock:
+            for path in [path for path in self.ids if path.startswith(prefix)]:
+                self.remove(path)
+        self.known_dirs = {known for known in self.known_dirs
+                           if known != directory and not known.startswith(prefix)}
+
+    def sync_directories(self, directories):
+        """Сверяет непосредственное содержимое изменившихся каталогов"""
+        changed = []
+        new_dirs = []
+        for directory in sorted(directories):
+            if directory not in self.known_dirs:
+                continue
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                self.remove_tree(directory)
+                continue
+            rules = gitignore_rules(self.root, directory)
+            present = set()
+            subdirectories = set()
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if is_dir and (entry.name in IGNORED_DIRS or entry.name.startswith('.')):
+                    continue
+                if rules and is_ignored(rules, entry.path, entry.name, is_dir):
+                    continue
+                if is_dir:
+                    subdirectories.add(entry.path)
+                    if entry.path not in self.known_dirs:
+                        # Новый каталог: все его файлы - новые
+                        files = list(iter_project_files(entry.path, rules))
+                        changed.extend(files)
+                        found = self.directories_of(files) | {entry.path}
+                        self.known_dirs |= found
+                        new_dirs.extend(found)
+                elif entry.is_file(follow_symlinks=False):
+                    present.add(entry.path)
+
+            for known in [known for known in self.known_dirs
+                          if os.path.dirname(known) == directory and known not in subdirectories]:
+                self.remove_tree(known)
+            stats = self.stat_files(present)
+            with self.lock:
+                for path in self.by_dir.get(directory, set()) - set(stats):
+                    self.remove(path)
+                for path, meta in stats.items():
+                    number = self.ids.get(path)
+                    if number is None or self.meta[number] != meta:
+                        changed.append(path)
+        if changed:
+            self.reindex(changed)
+        if new_dirs:
+            self.directories_found.emit(new_dirs)
+        return True
+
+    def sync_files(self, paths):
+        stats = self.stat_files(paths)
+        with self.lock:
+            for path in paths:
+                if path not in stats:
+                    self.remove(path)
+        changed = [path for path in stats if path.startswith(self.root)]
+        if changed:
+            self.reindex(changed)
+        return True
+
+class IndexUpdater(QThread):
+    """Единственный поток, изменяющий TrigramIndex: выполняет задания
+    из очереди по порядку и сохраняет снимок после каждого задания,
+    которое что-то изменило"""
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def run(self):
+        index = self.index
+        while True:
+            job, argument = index.jobs.get()
+            if job == 'stop':
+                return
+            if job == 'sync':
+                changed = index.sync()
+            elif not index.ready:
+                continue
+            elif job == 'dirs':
+                changed = index.sync_directories(argument)
+            else:
+                changed = index.sync_files(argument)
+            if changed and not index.stopping:
+                index.save()